@@ -0,0 +1,43 @@
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class StageTimer:
+    """Collects wall-clock durations per named stage."""
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - start)
+
+    def summary(self, items: int = None):
+        report = {}
+        for name, samples in self.samples.items():
+            values = np.asarray(samples) * 1000
+            total = float(values.sum()) / 1000
+            report[name] = {
+                "calls": len(samples),
+                "total_s": round(total, 4),
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p99_ms": round(float(np.percentile(values, 99)), 3),
+                "max_ms": round(float(values.max()), 3),
+            }
+            if items:
+                report[name]["items_per_sec"] = round(items / total, 1) if total else None
+        return report
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
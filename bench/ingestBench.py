@@ -0,0 +1,143 @@
+import argparse
+import configparser
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench.benchStats import StageTimer, peak_rss_mb
+from bench.stubEmbedServer import StubEmbedServer
+from bench.syntheticLogs import synthetic_logs
+from utils import Readconfig
+from vectorEmbeddings import RCAEmbedding
+from vectorEmbeddings.createDB import CreatePersistentDB
+from vectorEmbeddings.ingestDB import StreamingRecordReader, iter_chunks
+
+DEFAULT_DATASET = ROOT / "cleaned_amazon_metadata.json"
+
+
+def bench_config(base: configparser.ConfigParser, stub_url: str, persist_path: str, args) -> configparser.ConfigParser:
+    """Copy the repo config, pointed at the stub server and a throwaway Chroma directory."""
+    config = configparser.ConfigParser()
+    config.read_dict(base)
+    for section in ("Chroma", "Embedding", "EmbeddingCache"):
+        if not config.has_section(section):
+            config.add_section(section)
+
+    config.set("Chroma", "Persistent_Path", persist_path)
+    config.set("Embedding", "host", stub_url)
+    config.set("Embedding", "batch_size", str(args.batch_size))
+    config.set("Embedding", "concurrency", str(args.concurrency))
+    config.set("Embedding", "dedupe", args.dedupe)
+    config.set("EmbeddingCache", "enabled", str(args.cache).lower())
+    config.set("EmbeddingCache", "path", str(Path(persist_path) / "embedding_cache.sqlite"))
+    return config
+
+
+def run_ingest_bench(config: configparser.ConfigParser, name: str, records, chunk_size: int) -> dict:
+    """Push `records` through parse → embed → collection.add chunk by chunk and time every stage."""
+    db = CreatePersistentDB(config)
+    db.create_client()
+    try:
+        db.client.delete_collection(name=name)
+    except Exception:
+        pass
+    db.get_collection(name)
+
+    embedder = RCAEmbedding(config)
+    timer = StageTimer()
+    chunks = iter_chunks(records, chunk_size)
+    total = 0
+
+    started = time.perf_counter()
+    while True:
+        with timer.stage("parse"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        ids, documents, metadatas = chunk
+
+        with timer.stage("embed"):
+            embeddings = embedder.embed_texts(documents)
+            metadatas = embedder.annotate_templates(documents, metadatas)
+
+        with timer.stage("add"):
+            db.add_batch(ids, documents, metadatas, embeddings)
+        total += len(ids)
+    elapsed = time.perf_counter() - started
+
+    embedder.close()
+    return {
+        "workload": name,
+        "docs": total,
+        "chunk_size": chunk_size,
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(total / elapsed, 1) if elapsed else None,
+        "stages": timer.summary(total),
+        "peak_rss_mb": peak_rss_mb(),
+        "stored": db.collections.count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest throughput benchmark against an offline stub embedder")
+    parser.add_argument("--dataset", default=str(DEFAULT_DATASET), help="id/document/metadata JSON, NDJSON or CSV file")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the dataset N times with fresh ids")
+    parser.add_argument("--synthetic", type=int, default=0, help="also ingest N generated log lines")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--dedupe", choices=["exact", "template"], default="exact")
+    parser.add_argument("--cache", action="store_true", help="enable the embedding cache")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub seconds per request")
+    parser.add_argument("--per-item", type=float, default=0.0, help="stub seconds per embedded text")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    base = Readconfig(path=ROOT / "config.ini").read()
+    workdir = tempfile.mkdtemp(prefix="openlogrca-bench-")
+    results = []
+
+    try:
+        with StubEmbedServer(dim=args.dim, latency=args.latency, per_item=args.per_item) as stub:
+            config = bench_config(base, stub.url, workdir, args)
+
+            if args.dataset:
+                def replay():
+                    for round_ in range(args.repeat):
+                        for id_, document, metadata in StreamingRecordReader(args.dataset):
+                            yield (f"{id_}-{round_}" if args.repeat > 1 else id_), document, metadata
+
+                results.append(run_ingest_bench(config, "dataset", replay(), args.chunk_size))
+
+            if args.synthetic:
+                results.append(run_ingest_bench(config, "synthetic", synthetic_logs(args.synthetic), args.chunk_size))
+
+            embed_requests = stub.requests
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "benchmark": "ingest",
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "embed_requests": embed_requests,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return report
+
+
+# python -m bench.ingestBench --synthetic 100000 --output ingest.json
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench.benchStats import peak_rss_mb
+from bench.ingestBench import DEFAULT_DATASET, bench_config
+from bench.queryBench import load_corpus
+from bench.stubEmbedServer import StubEmbedServer
+from utils import Readconfig
+from vectorEmbeddings import RCAEmbedding
+from vectorEmbeddings.quantStore import RCAQuantizedClient
+
+
+def run_factor(collection, queries: np.ndarray, k: int, factor: int):
+    """recall@k and latency of the quantized store at one re-rank factor."""
+    collection.rerank_factor = factor
+    report = collection.recall_report(queries, k)
+
+    latencies = []
+    for q in range(len(queries)):
+        started = time.perf_counter()
+        collection.query(query_embeddings=queries[q:q + 1], n_results=k)
+        latencies.append(time.perf_counter() - started)
+
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "rerank_factor": factor,
+        f"recall@{k}_codes": report[f"recall@{k}_codes"],
+        f"recall@{k}_reranked": report[f"recall@{k}_reranked"],
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "qps": round(1000 / float(latencies.mean()), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recall and footprint of the int8 quantized vector store")
+    parser.add_argument("--vectors", help=".npy float32 matrix to index instead of embedding the dataset")
+    parser.add_argument("--dataset", default=str(DEFAULT_DATASET))
+    parser.add_argument("--synthetic", type=int, default=20000, help="generated log lines added to the corpus")
+    parser.add_argument("--corpus-size", type=int, default=0, help="cap on distinct documents, 0 = all")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--space", default="l2", choices=["l2", "cosine", "ip"])
+    parser.add_argument("--rerank-factor", default="1,2,4,8,16")
+    parser.add_argument("--full-dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Only the embedder settings of the ingest benchmark apply here
+    args.batch_size, args.concurrency, args.dedupe, args.cache = 500, 4, "exact", False
+
+    base = Readconfig(path=ROOT / "config.ini").read()
+    workdir = tempfile.mkdtemp(prefix="openlogrca-quantbench-")
+    rows = []
+
+    try:
+        if args.vectors:
+            corpus = np.load(args.vectors).astype(np.float32)
+            config = base
+        else:
+            with StubEmbedServer(dim=args.dim) as stub:
+                config = bench_config(base, stub.url, workdir, args)
+                embedder = RCAEmbedding(config)
+                _, corpus = load_corpus(embedder, args)
+                embedder.close()
+
+        if not config.has_section("Quantized"):
+            config.add_section("Quantized")
+        config.set("Quantized", "path", str(Path(workdir) / "quantized"))
+        config.set("Quantized", "full_dtype", args.full_dtype)
+
+        # Queries are corpus vectors with a little noise, like "find logs similar to this one"
+        rng = np.random.default_rng(args.seed)
+        picks = rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)
+        queries = corpus[picks] + rng.normal(0, 0.02, size=(len(picks), corpus.shape[1])).astype(np.float32)
+
+        client = RCAQuantizedClient(config)
+        collection = client.get_or_create_collection("bench_quantized", configuration={"hnsw": {"space": args.space}})
+        started = time.perf_counter()
+        step = client.get_max_batch_size()
+        for i in range(0, len(corpus), step):
+            collection.add(ids=[f"v{j}" for j in range(i, min(i + step, len(corpus)))], embeddings=corpus[i:i + step])
+        build_seconds = time.perf_counter() - started
+
+        for factor in [int(x) for x in args.rerank_factor.split(",")]:
+            rows.append(run_factor(collection, queries, args.k, factor))
+        footprint = collection.footprint()
+        client.delete_collection("bench_quantized")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "benchmark": "quantized",
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "corpus": len(corpus),
+        "build_s": round(build_seconds, 3),
+        "footprint": footprint,
+        "compression": round(footprint["float32_bytes"] / footprint["index_bytes"], 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "results": rows,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return report
+
+
+# python bench/quantBench.py --synthetic 50000 --rerank-factor 1,4,16 --output quant.json
+if __name__ == '__main__':
+    main()
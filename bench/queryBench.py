@@ -0,0 +1,176 @@
+import argparse
+import itertools
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench.benchStats import peak_rss_mb
+from bench.ingestBench import DEFAULT_DATASET, bench_config
+from bench.stubEmbedServer import StubEmbedServer
+from bench.syntheticLogs import synthetic_logs
+from utils import Readconfig
+from vectorEmbeddings import RCAEmbedding
+from vectorEmbeddings.createDB import CreatePersistentDB
+from vectorEmbeddings.ingestDB import StreamingRecordReader
+
+
+def exact_neighbours(corpus: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Brute-force top-k corpus rows per query, ordered like Chroma orders distances in `space`."""
+    if space == "l2":
+        # ||q - c||² = ||q||² - 2 q·c + ||c||², ||q||² doesn't change the ranking
+        scores = (corpus * corpus).sum(axis=1)[None, :] - 2 * queries @ corpus.T
+    elif space == "cosine":
+        c = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = -(q @ c.T)
+    else:
+        scores = -(queries @ corpus.T)
+
+    top = np.argpartition(scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def load_corpus(embedder: RCAEmbedding, args):
+    documents = []
+    if args.dataset:
+        documents.extend(doc for _, doc, _ in StreamingRecordReader(args.dataset))
+    if args.synthetic:
+        documents.extend(doc for _, doc, _ in synthetic_logs(args.synthetic, seed=1))
+
+    # Distinct texts only, duplicates would make "the" nearest neighbour ambiguous
+    documents = list(dict.fromkeys(documents))[:args.corpus_size or None]
+    return documents, embedder.embed_texts(documents)
+
+
+def run_setting(db: CreatePersistentDB, corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+                setting: dict, k: int):
+    # ef_search changes through modify() don't reach an index already loaded in this
+    # process, so every setting gets its own freshly built collection
+    name = "bench_" + "_".join(f"{key}{value}" for key, value in setting.items())
+    try:
+        db.client.delete_collection(name=name)
+    except Exception:
+        pass
+    collection = db.client.get_or_create_collection(name=name, configuration={"hnsw": dict(setting)})
+
+    ids = [f"v{i}" for i in range(len(corpus))]
+    step = db.get_max_batch_size()
+    started = time.perf_counter()
+    for i in range(0, len(corpus), step):
+        collection.add(ids=ids[i:i + step], embeddings=corpus[i:i + step])
+    build_seconds = time.perf_counter() - started
+
+    # Warm up so the first query doesn't pay for loading the index
+    collection.query(query_embeddings=queries[:1], n_results=k, include=[])
+
+    latencies, hits = [], 0
+    for q in range(len(queries)):
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=queries[q:q + 1], n_results=k, include=[])
+        latencies.append(time.perf_counter() - started)
+        found = {int(i[1:]) for i in result["ids"][0]}
+        hits += len(found & set(truth[q].tolist()))
+
+    db.client.delete_collection(name=name)
+
+    latencies = np.asarray(latencies) * 1000
+    return {
+        **setting,
+        "build_s": round(build_seconds, 3),
+        f"recall@{k}": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "qps": round(1000 / float(latencies.mean()), 1),
+    }
+
+
+def recommend(rows, k: int, target: float):
+    """Fastest setting (by p99) that reaches the target recall, or the most accurate one."""
+    key = f"recall@{k}"
+    good = [r for r in rows if r[key] >= target]
+    best = min(good, key=lambda r: r["p99_ms"]) if good else max(rows, key=lambda r: r[key])
+    return {name: best[name] for name in ("space", "ef_construction", "ef_search", "max_neighbors")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recall vs latency sweep over Chroma HNSW settings")
+    parser.add_argument("--dataset", default=str(DEFAULT_DATASET))
+    parser.add_argument("--synthetic", type=int, default=20000, help="generated log lines added to the corpus")
+    parser.add_argument("--corpus-size", type=int, default=0, help="cap on distinct documents, 0 = all")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--space", default="l2,cosine")
+    parser.add_argument("--max-neighbors", default="16,32")
+    parser.add_argument("--ef-construction", default="100,200")
+    parser.add_argument("--ef-search", default="10,50,100,200")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Only the embedder settings of the ingest benchmark apply here
+    args.batch_size, args.concurrency, args.dedupe, args.cache = 500, 4, "exact", False
+
+    base = Readconfig(path=ROOT / "config.ini").read()
+    workdir = tempfile.mkdtemp(prefix="openlogrca-qbench-")
+    rows = []
+
+    try:
+        with StubEmbedServer(dim=args.dim) as stub:
+            config = bench_config(base, stub.url, workdir, args)
+            embedder = RCAEmbedding(config)
+            documents, corpus = load_corpus(embedder, args)
+            embedder.close()
+
+        # Queries are corpus vectors with a little noise, like "find logs similar to this one"
+        rng = np.random.default_rng(args.seed)
+        picks = rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)
+        queries = corpus[picks] + rng.normal(0, 0.02, size=(len(picks), corpus.shape[1])).astype(np.float32)
+
+        db = CreatePersistentDB(config)
+        db.create_client()
+
+        spaces = args.space.split(",")
+        truths = {space: exact_neighbours(corpus, queries, args.k, space) for space in spaces}
+        for space, m, efc, efs in itertools.product(
+                spaces,
+                [int(x) for x in args.max_neighbors.split(",")],
+                [int(x) for x in args.ef_construction.split(",")],
+                [int(x) for x in args.ef_search.split(",")]):
+            setting = {"space": space, "max_neighbors": m, "ef_construction": efc, "ef_search": efs}
+            rows.append(run_setting(db, corpus, queries, truths[space], setting, args.k))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    best = recommend(rows, args.k, args.target_recall)
+    report = {
+        "benchmark": "query",
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "corpus": len(corpus),
+        "peak_rss_mb": peak_rss_mb(),
+        "results": rows,
+        "recommended": best,
+        "config_ini": "[HNSW]\n" + "\n".join(f"{key} = {value}" for key, value in best.items()),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return report
+
+
+# python bench/queryBench.py --synthetic 50000 --output query.json
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+
+def stub_vector(text: str, dim: int) -> np.ndarray:
+    """Deterministic unit vector for `text`, so repeated runs embed identically."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class StubEmbedServer:
+    """
+    Offline stand-in for Ollama's /api/embed used by the benchmarks.
+    `latency` seconds are added per request, plus `per_item` seconds per text,
+    to mimic model time on top of real JSON encoding of the vectors.
+    """
+
+    def __init__(self, dim: int = 768, latency: float = 0.0, per_item: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.dim = dim
+        self.latency = latency
+        self.per_item = per_item
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if self.path != "/api/embed":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+
+                time.sleep(stub.latency + stub.per_item * len(texts))
+                stub.requests += 1
+
+                payload = json.dumps({
+                    "model": body.get("model"),
+                    "embeddings": [stub_vector(t, stub.dim).tolist() for t in texts],
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-embed", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline /api/embed stub for benchmarks")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with StubEmbedServer(dim=args.dim, latency=args.latency, port=args.port) as stub:
+        print(f"Stub embedding server on {stub.url}")
+        stub.thread.join()
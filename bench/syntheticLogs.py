@@ -0,0 +1,56 @@
+import random
+import time
+
+SERVICES = ["payment", "checkout", "auth", "inventory", "search", "gateway"]
+LEVELS = ["INFO"] * 70 + ["WARN"] * 20 + ["ERROR"] * 9 + ["FATAL"]
+TEMPLATES = [
+    "Request {req} to /api/v1/orders/{num} completed in {ms} ms",
+    "Connection to {ip}:5432 timed out after {ms} ms",
+    "User {num} logged in from {ip}",
+    "Cache miss for key session:{hex}",
+    "Retrying job {req} (attempt {small}/5)",
+    "Payment {req} declined: insufficient funds",
+    "GC pause of {ms} ms exceeded threshold",
+    "Failed to publish event {req} to topic orders-{small}: broker not available",
+    "Pod {service}-{hex} restarted, exit code {small}",
+    "Slow query took {ms} ms: SELECT * FROM orders WHERE id = {num}",
+]
+STACK = (
+    "java.lang.NullPointerException: Cannot invoke \"Order.getId()\" because \"order\" is null\n"
+    "\tat com.shop.{service}.OrderService.process(OrderService.java:{small}{small})\n"
+    "\tat com.shop.{service}.OrderController.submit(OrderController.java:{num})\n"
+    "\tat java.base/java.lang.Thread.run(Thread.java:833)"
+)
+
+
+def synthetic_logs(count: int, seed: int = 0, start: float = None, span: float = 86400, stack_ratio: float = 0.01):
+    """
+    Yield `count` realistic-looking (id, document, metadata) log records.
+    Messages come from a small set of templates with variable fields, so they
+    are as repetitive as real logs; a fraction are multi-line stack traces.
+    """
+    rng = random.Random(seed)
+    start = time.time() - span if start is None else start
+
+    for i in range(count):
+        service = rng.choice(SERVICES)
+        fields = {
+            "req": f"{rng.getrandbits(64):016x}",
+            "num": rng.randint(1, 10 ** 6),
+            "ms": rng.randint(1, 30000),
+            "ip": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            "hex": f"{rng.getrandbits(40):010x}",
+            "small": rng.randint(1, 9),
+            "service": service,
+        }
+        template = STACK if rng.random() < stack_ratio else rng.choice(TEMPLATES)
+        yield (
+            f"syn-{seed}-{i}",
+            template.format(**fields),
+            {
+                "timestamp": start + span * i / max(count, 1),
+                "level": rng.choice(LEVELS),
+                "service": service,
+                "host": f"node-{rng.randint(1, 32)}",
+            },
+        )
@@ -0,0 +1,337 @@
+import argparse
+import configparser
+import json
+import sys
+import time
+from pathlib import Path
+
+# LOAD ROOT if RUN as py commands.py
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Only stdlib at module level, chromadb / rich / prompt_toolkit are imported
+# by the subcommand that needs them so `--help` and scripted runs start fast
+
+
+def emit(obj):
+    """One NDJSON line on stdout; logs go to stderr."""
+    from utils.RCAMetrics import span
+    with span("render"):
+        sys.stdout.write(json.dumps(obj, ensure_ascii=False, default=str) + "\n")
+        sys.stdout.flush()
+
+
+def read_config(args) -> configparser.ConfigParser:
+    from utils import Readconfig
+    return (Readconfig(path=Path(args.config)) if args.config else Readconfig()).read()
+
+
+def open_db(config: configparser.ConfigParser, args):
+    """One DB client + collection for the whole command, behind time partitions when enabled."""
+    from vectorEmbeddings.createDB import CreatePersistentDB, CreateHttpDB, CreateQuantizedDB
+
+    db = {"http": CreateHttpDB, "quantized": CreateQuantizedDB}.get(args.client, CreatePersistentDB)(config)
+    db.create_client()
+    if db.client is None:
+        raise ValueError("❌ Chroma client could not be created, check [Chroma] in config.ini")
+
+    if config.getboolean("Partition", "enabled", fallback=False):
+        from vectorEmbeddings.partitionDB import PartitionedVectorDB
+        db = PartitionedVectorDB(config, db)
+        db.get_collection(args.collection)
+        db.apply_retention()
+    else:
+        db.get_collection(args.collection)
+    return db
+
+
+def stdin_records():
+    """id/document/metadata records, one JSON object per stdin line."""
+    from vectorEmbeddings.ingestDB import normalize_record
+
+    for line_no, line in enumerate(sys.stdin, start=1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"❌ Invalid JSON on stdin line {line_no}: {e}")
+        yield normalize_record(entry)
+
+
+def cmd_ingest(args):
+    from vectorEmbeddings.embedding import RCAEmbedding
+    from vectorEmbeddings.ingestDB import iter_chunks
+    from vectorEmbeddings.ingestJob import RCAIngestJob, upsert_new
+
+    config = read_config(args)
+    if not config.has_section("Ingest"):
+        config.add_section("Ingest")
+    if args.chunk_size:
+        config.set("Ingest", "chunk_size", str(args.chunk_size))
+    if args.parallel and not args.paths:
+        raise ValueError("❌ --parallel needs files, directories or globs to read")
+
+    db = open_db(config, args)
+    embedder = RCAEmbedding(config)
+    try:
+        if args.parallel:
+            from vectorEmbeddings.parallelIngest import RCAParallelIngest
+
+            if args.workers:
+                config.set("Ingest", "parallel_workers", str(args.workers))
+            summary = RCAParallelIngest(config, db, embedder).run(
+                args.paths,
+                on_written=lambda n, total: emit({"event": "chunk", "written": total})
+            )
+            emit(dict(event="done", **summary))
+            return
+
+        for name in args.paths or ["-"]:
+            if name == "-":
+                chunk_size = int(config.get("Ingest", "chunk_size", fallback="2000").strip())
+                total = written = 0
+                for ids, documents, metadatas in iter_chunks(stdin_records(), chunk_size):
+                    ids, n = upsert_new(db, embedder, ids, documents, metadatas)
+                    total += len(ids)
+                    written += n
+                    emit({"event": "chunk", "source": "-", "records": total, "written": written,
+                          "skipped": total - written})
+                emit({"event": "done", "source": "-", "records": total, "written": written, "skipped": total - written})
+                continue
+
+            job = RCAIngestJob(config, db, embedder, name)
+            if args.restart:
+                job.reset()
+            checkpoint = job.run(on_chunk=lambda c: emit(dict(event="chunk", **c)))
+            emit(dict(event="done", **checkpoint))
+    finally:
+        embedder.close()
+
+
+def cmd_tail(args):
+    from rca_ingest.tailer import RCALogTailer
+    from vectorEmbeddings.embedding import RCAEmbedding
+
+    config = read_config(args)
+    db = open_db(config, args)
+    embedder = RCAEmbedding(config)
+    try:
+        tailer = RCALogTailer(config, db, embedder)
+        if args.interval:
+            tailer.poll_interval = args.interval
+        if not (args.paths or tailer.patterns):
+            raise ValueError("❌ No files to follow, pass paths/globs or set [Tailer] paths")
+        def on_poll(written):
+            if written:
+                emit({"event": "poll", "written": written, "files": len(tailer.state)})
+
+        tailer.run(args.paths or None, once=args.once, on_poll=on_poll)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        embedder.close()
+
+
+def query_groups(args):
+    """Query texts from the command line, else stdin lines grouped `--batch` at a time."""
+    if args.texts:
+        yield args.texts
+        return
+
+    group = []
+    for line in sys.stdin:
+        text = line.strip()
+        if not text:
+            continue
+        group.append(text)
+        if len(group) >= args.batch:
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+def cmd_query(args):
+    from utils import parse_window
+    from vectorEmbeddings.embedding import RCAEmbedding
+    from vectorEmbeddings.queryDB import RCAQueryEngine
+    from vectorEmbeddings.resultPages import RCAResultPages
+
+    config = read_config(args)
+    if args.snippet is not None:
+        if not config.has_section("Results"):
+            config.add_section("Results")
+        config.set("Results", "snippet_chars", str(args.snippet))
+    if args.hybrid:
+        # The collection opens its lexical index only when [Hybrid] is enabled
+        if not config.has_section("Hybrid"):
+            config.add_section("Hybrid")
+        config.set("Hybrid", "enabled", "true")
+    where = json.loads(args.where) if args.where else None
+    window = parse_window(args.since)
+
+    db = open_db(config, args)
+    embedder = RCAEmbedding(config)
+    engine = RCAQueryEngine(config, db, embedder)
+    try:
+        for texts in query_groups(args):
+            start = time.time() - window if window else None
+            results = engine.query(texts, n_results=args.k, where=where, start=start, hybrid=args.hybrid, lazy=args.rows)
+            for result in results:
+                if not args.rows:
+                    emit(result)
+                    continue
+                # One line per hit, the documents of each page fetched just before it is written
+                for row in RCAResultPages(config, db, result).rows():
+                    emit(dict(row, query=result["query"]))
+    finally:
+        embedder.close()
+
+
+def cmd_clusters(args):
+    from utils import parse_window
+    from vectorEmbeddings.logClusters import RCALogClusterer
+
+    config = read_config(args)
+    window = parse_window(args.since)
+    start = time.time() - window if window else None
+
+    db = open_db(config, args)
+    clusterer = RCALogClusterer(config, db)
+    if args.rebuild:
+        clusterer.reset(start)
+    clusterer.update(start)
+    for cluster in clusterer.top(args.top, start=start):
+        emit(cluster)
+
+
+def cmd_reembed(args):
+    from vectorEmbeddings.embedding import RCAEmbedding
+    from vectorEmbeddings.reembedJob import RCAReembedJob
+
+    config = read_config(args)
+    for section in ("Embedding", "Reembed"):
+        if not config.has_section(section):
+            config.add_section(section)
+    if args.model:
+        config.set("Embedding", "model", args.model)
+    if args.rate is not None:
+        config.set("Reembed", "max_rate", str(args.rate))
+    if args.keep_old:
+        config.set("Reembed", "keep_old", "true")
+
+    db = open_db(config, args)
+    embedder = RCAEmbedding(config)
+    job = RCAReembedJob(config, db, embedder)
+    try:
+        state = job.run(on_page=lambda progress: emit(dict(event="page", **progress)))
+        emit(dict(event="done", **state))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        embedder.close()
+
+
+def cmd_bench(args):
+    if args.which == "ingest":
+        from bench.ingestBench import main as bench_main
+    elif args.which == "quant":
+        from bench.quantBench import main as bench_main
+    else:
+        from bench.queryBench import main as bench_main
+    bench_main(args.args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="openlogrca",
+        description="Log ingest and semantic search over Chroma. Without a subcommand the interactive menu starts."
+    )
+    parser.add_argument("--config", help="config.ini to use (default: ../config.ini from the working directory)")
+    sub = parser.add_subparsers(dest="command")
+
+    def db_options(p):
+        p.add_argument("-c", "--collection", required=True)
+        p.add_argument("--client", choices=["persistent", "http", "quantized"], default="persistent",
+                       help="local PersistentClient, the [Chroma] HTTP server or the int8 [Quantized] store")
+
+    ingest = sub.add_parser("ingest", help="ingest JSON/NDJSON/CSV files, or NDJSON records from stdin ('-')")
+    ingest.add_argument("paths", nargs="*", help="data files, or directories/globs with --parallel; '-' or nothing reads stdin")
+    db_options(ingest)
+    ingest.add_argument("--chunk-size", type=int, help="override [Ingest] chunk_size")
+    ingest.add_argument("--restart", action="store_true", help="ignore existing checkpoints")
+    ingest.add_argument("--parallel", action="store_true",
+                        help="parse directories/globs in a process pool (upserts, no checkpoints)")
+    ingest.add_argument("--workers", type=int, help="parse processes for --parallel (default [Ingest] parallel_workers)")
+    ingest.set_defaults(func=cmd_ingest)
+
+    tail = sub.add_parser("tail", help="follow raw log files and ingest new lines as they are written")
+    tail.add_argument("paths", nargs="*", help="log files or globs (default [Tailer] paths)")
+    db_options(tail)
+    tail.add_argument("--once", action="store_true", help="ingest what is new and exit, e.g. from cron")
+    tail.add_argument("--interval", type=float, help="seconds between polls (default [Tailer] poll_interval)")
+    tail.set_defaults(func=cmd_tail)
+
+    query = sub.add_parser("query", help="one NDJSON result line per query text")
+    query.add_argument("texts", nargs="*", help="query texts; none reads one per stdin line")
+    db_options(query)
+    query.add_argument("-k", type=int, help="results per query (default [Query] n_results)")
+    query.add_argument("--where", help="Chroma metadata filter as JSON")
+    query.add_argument("--since", help="only documents newer than e.g. 15m, 1h, 2d (partitioned collections)")
+    query.add_argument("--batch", type=int, default=32, help="stdin queries embedded and searched together")
+    query.add_argument("--hybrid", action=argparse.BooleanOptionalAction,
+                       help="fuse BM25 and vector results (default [Hybrid] enabled)")
+    query.add_argument("--rows", action="store_true",
+                       help="one line per hit with a snippet; documents are fetched a page at a time")
+    query.add_argument("--snippet", type=int, help="--rows snippet length in characters, 0 = whole document "
+                                                   "(default [Results] snippet_chars)")
+    query.set_defaults(func=cmd_query)
+
+    clusters = sub.add_parser("clusters", help="group near-duplicate logs into incidents, largest first")
+    db_options(clusters)
+    clusters.add_argument("--since", help="only logs newer than e.g. 15m, 1h, 2d")
+    clusters.add_argument("-n", "--top", type=int, default=20, help="clusters to print")
+    clusters.add_argument("--rebuild", action="store_true", help="drop the saved clusters and start over")
+    clusters.set_defaults(func=cmd_clusters)
+
+    reembed = sub.add_parser("reembed", help="move a collection to the [Embedding] model, swapping it in when done")
+    db_options(reembed)
+    reembed.add_argument("--model", help="override [Embedding] model")
+    reembed.add_argument("--rate", type=float, help="documents per second at most (default [Reembed] max_rate)")
+    reembed.add_argument("--keep-old", action="store_true", help="keep the old vectors after the swap")
+    reembed.set_defaults(func=cmd_reembed)
+
+    bench = sub.add_parser("bench", help="run bench/ingestBench.py, queryBench.py or quantBench.py")
+    bench.add_argument("which", choices=["ingest", "query", "quant"])
+    bench.add_argument("args", nargs=argparse.REMAINDER, help="arguments for the benchmark")
+    bench.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command is None:
+        from cli.main import main as menu
+        return menu(read_config(args) if args.config else None)
+
+    from utils.RCAMetrics import get_metrics
+    try:
+        args.func(args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # Downstream closed early, e.g. `| head`
+        return 0
+    finally:
+        # Stage timings of this run: textfile, OTLP flush, summary on stderr
+        get_metrics().finish()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
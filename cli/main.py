@@ -1,5 +1,7 @@
+import asyncio
 import configparser
 import sys
+import time
 from pathlib import Path
 
 from vectorEmbeddings import RCAEmbedding
@@ -16,9 +18,18 @@ from rich.panel import Panel
 from rich.prompt import Prompt
 from prompt_toolkit import prompt
 from rich.table import Table
-
-from utils import RCAconfig
-from vectorEmbeddings.createDB import CreatePersistentDB, CreateHttpDB
+from rich.text import Text
+
+from utils import RCAconfig, parse_window
+from utils.RCAMetrics import span
+from vectorEmbeddings import RCAAsyncEmbedding
+from vectorEmbeddings.asyncIngest import async_ingest, async_query
+from vectorEmbeddings.createDB import CreatePersistentDB, CreateHttpDB, CreateHttpAsync
+from vectorEmbeddings.ingestDB import StreamingRecordReader, iter_chunks
+from vectorEmbeddings.ingestJob import RCAIngestJob
+from vectorEmbeddings.partitionDB import PartitionedVectorDB
+from vectorEmbeddings.queryDB import RCAQueryEngine
+from vectorEmbeddings.resultPages import RCAResultPages
 import json
 import csv
 
@@ -151,15 +162,16 @@ def create_template_files():
     console.print(f" - {json_path}")
 
 
-def collect_chroma_input_from_file(config: configparser.ConfigParser):
+def choose_data_file():
+    """Let the user pick a CSV/JSON/NDJSON file from the working directory, None if there is none."""
     console.print("[bold green]File Input Mode[/bold green]")
 
     # Ensure templates exist
     ensure_template_files_exist()
 
-    # Find .csv and .json files in CWD
+    # Find .csv, .json and .ndjson/.jsonl files in CWD
     cwd = Path.cwd()
-    files = list(cwd.glob("*.csv")) + list(cwd.glob("*.json"))
+    files = [f for pattern in ("*.csv", "*.json", "*.ndjson", "*.jsonl") for f in cwd.glob(pattern)]
 
     if not files:
         console.print("[bold red]No CSV or JSON files found.[/bold red]")
@@ -177,49 +189,40 @@ def collect_chroma_input_from_file(config: configparser.ConfigParser):
 
     file_path = files[int(choice) - 1]
     console.print(f"[bold cyan]Using file:[/bold cyan] {file_path.name}")
+    return file_path
 
-    ids, documents, metadatas = [], [], []
 
-    # --- Load JSON ---
-    if file_path.suffix.lower() == ".json":
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        for entry in data:
-            ids.append(str(entry["id"]))
-            documents.append(entry["document"])
-            metadatas.append(entry.get("metadata", {}))
+def collect_chroma_input_from_file(config: configparser.ConfigParser):
+    file_path = choose_data_file()
+    if file_path is None:
+        return None
 
-        # Ask for embeddings
-        embeddings = RCAEmbedding(config).embed_texts(documents)
+    try:
+        reader = StreamingRecordReader(file_path)
+    except ValueError as e:
+        console.print(f"[bold red]{e}[/bold red]")
+        return None
 
-        assert len(embeddings) == len(documents), \
-            "❌ Embedding count mismatch after embedding!"
-        return ids, documents, metadatas, embeddings
+    chunk_size = int(config.get("Ingest", "chunk_size", fallback="2000").strip())
+    console.print(f"[bold cyan]Streaming {reader.format.upper()} in chunks of {chunk_size}[/bold cyan]")
 
-    # --- Load CSV ---
-    if file_path.suffix.lower() == ".csv":
-        with open(file_path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
+    return iter_chunks(reader, chunk_size)
 
-            required = {"id", "document", "metadata"}
-            if not required <= set(reader.fieldnames):
-                console.print("[bold red]CSV must contain columns: id, document, metadata[/bold red]")
-                return None
 
-            for row in reader:
-                ids.append(row["id"])
-                documents.append(row["document"])
-                try:
-                    metadatas.append(json.loads(row["metadata"]))
-                except json.JSONDecodeError:
-                    console.print(f"[bold red]Invalid metadata JSON in row: {row}[/bold red]")
-                    return None
+def embed_chunks(config: configparser.ConfigParser, chunks):
+    """Embed (ids, documents, metadatas) chunks lazily so only one chunk is held in memory."""
+    embedder = RCAEmbedding(config)
 
-        return ids, documents, metadatas
+    try:
+        for ids, documents, metadatas in chunks:
+            embeddings = embedder.embed_texts(documents)
+            metadatas = embedder.annotate_templates(documents, metadatas)
 
-    console.print("[bold red]Unsupported file extension.[/bold red]")
-    return None
+            assert len(embeddings) == len(documents), \
+                "❌ Embedding count mismatch after embedding!"
+            yield ids, documents, metadatas, embeddings
+    finally:
+        embedder.close()
 
 
 def collect_chroma_input(config: configparser.ConfigParser):
@@ -237,7 +240,10 @@ def collect_chroma_input(config: configparser.ConfigParser):
             return result
         console.print("[bold red]Failed to load from file. Switching to manual input.[/bold red]")
 
-    # Manual entry
+    return collect_manual_input()
+
+
+def collect_manual_input():
     ids = prompt_list("IDs")
     documents = prompt_list("documents")
     metadatas = prompt_metadata_list()
@@ -245,13 +251,7 @@ def collect_chroma_input(config: configparser.ConfigParser):
     assert len(ids) == len(documents) == len(metadatas), \
         "❌ File parser returned misaligned ids/docs/metas!"
 
-    # Ask for embeddings
-    embeddings = RCAEmbedding(config).embed_texts(documents)
-
-    assert len(embeddings) == len(documents), \
-        "❌ Embedding count mismatch after embedding!"
-
-    return ids, documents, metadatas, embeddings
+    return [(ids, documents, metadatas)]
 
 
 def prompt_query_list():
@@ -278,38 +278,51 @@ def prompt_query_list():
         queries.append(q)
 
 
-def display_chroma_result(result):
-    ids = result["ids"][0]
-    docs = result["documents"][0]
-    metas = result["metadatas"][0]
-    distances = result["distances"][0]
+def display_chroma_result(result, query_index: int = 0, title: str = "Chroma Query Results",
+                          config: configparser.ConfigParser = None, query: str = ""):
+    """A Chroma QueryResult (payloads included) shown through the same pager as lazy results."""
+    one = {field: values[query_index] for field, values in result.items() if isinstance(values, list)}
+    one["query"] = query
+    display_result_pages(RCAResultPages(config or configparser.ConfigParser(), None, one), title)
 
-    # Make a table
-    table = Table(title="Chroma Query Results", show_lines=True)
 
-    table.add_column("Rank", style="bold cyan")
-    table.add_column("ID", style="bold yellow")
-    table.add_column("Distance", style="bold magenta")
-    table.add_column("Document", style="bold white")
-    table.add_column("Metadata", style="bold green")
-
-    # Sort by distance (ascending)
-    sorted_results = sorted(
-        zip(ids, docs, metas, distances),
-        key=lambda x: x[3]
-    )
+def display_result_pages(pages: RCAResultPages, title: str = "Chroma Query Results"):
+    """One Rich table per page of snippets; documents of later pages are only fetched when paged to."""
+    number = 0
+    while True:
+        with span("render"):
+            table = Table(title=f"{title} ({len(pages)} hits, page {number + 1}/{max(1, pages.page_count)})",
+                          show_lines=True)
+
+            table.add_column("Rank", style="bold cyan")
+            table.add_column("ID", style="bold yellow")
+            table.add_column("Distance", style="bold magenta")
+            table.add_column("Document", style="white")
+            table.add_column("Metadata", style="bold green")
+
+            # Rows come ranked: by distance, or by fused score for hybrid results
+            for row in pages.page(number) if len(pages) else []:
+                document = Text(row["snippet"] if row["snippet"] is not None else "(no longer stored)")
+                for begin, end in row["highlights"]:
+                    document.stylize("bold red", begin, end)
+                table.add_row(
+                    str(row["rank"]),
+                    row["id"],
+                    f"{row['distance']:.4f}" if row["distance"] is not None else "lexical",
+                    document,
+                    str(row["metadata"])
+                )
 
-    # Fill rows
-    for idx, (id_, doc, meta, dist) in enumerate(sorted_results, start=1):
-        table.add_row(
-            str(idx),
-            id_,
-            f"{dist:.4f}",
-            doc,
-            str(meta)
-        )
+            console.print(table)
 
-    console.print(table)
+        if pages.page_count <= 1:
+            return
+        choices = ["n", "p", "q"] if 0 < number < pages.page_count - 1 else (["n", "q"] if number == 0 else ["p", "q"])
+        choice = Prompt.ask("[bold green]Next page, previous page or quit[/bold green]", choices=choices,
+                            default=choices[0])
+        if choice == "q":
+            return
+        number += 1 if choice == "n" else -1
 
 
 def promptCollectInput():
@@ -322,10 +335,125 @@ def promptCollectInput():
     return False
 
 
-# TODO: Make Chunked Batch Add (When needed) [chroma_client.collections.add]
-def main():
+def ingest_chunks(chroma_client, chunks):
+    total = 0
+    try:
+        for ids, documents, metadatas, embeddings in chunks:
+            chroma_client.upsert_batch(ids, documents, metadatas, embeddings)
+            total += len(ids)
+            console.print(f"[green]Added {len(ids)} documents ({total} total)[/green]")
+    except ValueError as e:
+        console.print(f"[bold red]{e}[/bold red]")
+        console.print(f"[bold yellow]Stopped after {total} documents.[/bold yellow]")
+
+
+def run_ingest_job(config: configparser.ConfigParser, chroma_client, file_path: Path):
+    """Ingest a file as a checkpointed job that resumes where an earlier run stopped."""
+    embedder = RCAEmbedding(config)
+    try:
+        job = RCAIngestJob(config, chroma_client, embedder, file_path)
+        checkpoint = job.load_checkpoint()
+        if checkpoint["offset"] and not checkpoint["done"]:
+            console.print(f"[bold yellow]Found a checkpoint after {checkpoint['records']} records "
+                          f"({checkpoint['updated']})[/bold yellow]")
+            if Prompt.ask("[bold green]Resume from it?[/bold green]", choices=["y", "n"]) == "n":
+                job.reset()
+
+        checkpoint = job.run(on_chunk=lambda c: console.print(
+            f"[green]Chunk {c['chunks']}: {c['written']} written, {c['skipped']} already stored[/green]"
+        ))
+        console.print(f"[bold cyan]Ingested {file_path.name}: {checkpoint['written']} written, "
+                      f"{checkpoint['skipped']} skipped[/bold cyan]")
+    except ValueError as e:
+        console.print(f"[bold red]{e}[/bold red]")
+        console.print("[bold yellow]Progress is checkpointed, run the ingest again to resume.[/bold yellow]")
+    finally:
+        embedder.close()
+
+
+def ingest_input(config: configparser.ConfigParser, chroma_client):
+    """Sync modes: files run as resumable jobs, manual entries are upserted directly."""
+    console.print("[bold green]Collecting Chroma inputs...[/bold green]\n")
+
+    console.print("[bold cyan]How do you want to provide data?[/bold cyan]")
+    console.print("[bold yellow]1.[/bold yellow] Load from CSV/JSON file")
+    console.print("[bold yellow]2.[/bold yellow] Enter manually")
+
+    choice = Prompt.ask("[bold green]Choose an option[/bold green]", choices=["1", "2"])
+
+    if choice == "1":
+        file_path = choose_data_file()
+        if file_path is not None:
+            return run_ingest_job(config, chroma_client, file_path)
+        console.print("[bold red]Failed to load from file. Switching to manual input.[/bold red]")
+
+    ingest_chunks(chroma_client, embed_chunks(config, collect_manual_input()))
+
+
+def open_collection(config: configparser.ConfigParser, chroma_client, name: str):
+    """Select the collection, behind time partitions when [Partition] is enabled."""
+    if config.getboolean("Partition", "enabled", fallback=False):
+        chroma_client = PartitionedVectorDB(config, chroma_client)
+        chroma_client.get_collection(name)
+        dropped = chroma_client.apply_retention()
+        if dropped:
+            console.print(f"[yellow]Retention dropped {len(dropped)} old partitions[/yellow]")
+    else:
+        chroma_client.get_collection(name)
+    return chroma_client
+
+
+def async_main(config: configparser.ConfigParser):
+    """Menu option 3: ingest and query through the asyncio Chroma client and embedder."""
+    # One loop for the whole session, prompts run between run_until_complete calls
+    loop = asyncio.new_event_loop()
+    chroma_client = CreateHttpAsync(config)
+    loop.run_until_complete(chroma_client.create_asyncClient())
+    if chroma_client.client is None:
+        console.print("[bold red]Async Chroma client could not be created, check [Chroma] in config.ini[/bold red]")
+        return
+
+    chroma_collection_name = prompt("[bold cyan]Enter your collection name[/bold cyan]: ")
+    loop.run_until_complete(chroma_client.get_asyncCollection(chroma_collection_name))
+    embedder = RCAAsyncEmbedding(config)
+
+    if promptCollectInput():
+        try:
+            loop.run_until_complete(async_ingest(
+                chroma_client,
+                embedder,
+                collect_chroma_input(config),
+                embed_tasks=int(config.get("Ingest", "async_embed_tasks", fallback="2").strip()),
+                write_tasks=int(config.get("Ingest", "async_write_tasks", fallback="2").strip()),
+                queue_size=int(config.get("Ingest", "async_queue_size", fallback="4").strip()),
+                on_written=lambda n, total: console.print(f"[green]Added {n} documents ({total} total)[/green]")
+            ))
+        except* ValueError as group:
+            for e in group.exceptions:
+                console.print(f"[bold red]{e}[/bold red]")
+
+    console.print("[bold cyan] Query Chroma vector Database![/bold cyan]")
+
+    while True:
+        query_texts = prompt_query_list()
+
+        if query_texts is None:
+            console.print("[bold yellow]Exiting query mode...[/bold yellow]")
+            break
+
+        n_results = int(config.get("Query", "n_results", fallback="10").strip())
+        result = loop.run_until_complete(async_query(chroma_client, embedder, query_texts, n_results=n_results))
+
+        for i, query_text in enumerate(query_texts):
+            display_chroma_result(result, i, title=f"Chroma Query Results: {query_text}", config=config, query=query_text)
+
+    loop.run_until_complete(embedder.aclose())
+    loop.close()
+
+
+def main(config: configparser.ConfigParser = None):
     console.print(Panel("[bold cyan]Main Menu[/bold cyan]", expand=False))
-    config = RCAconfig.Readconfig().read()
+    config = config or RCAconfig.Readconfig().read()
 
     console.print("[bold cyan] Welcome to Chroma ingest toolkit![/bold cyan]")
     console.print("[bold yellow]1.[/bold yellow] Use Persistent Chroma DB")
@@ -340,46 +468,20 @@ def main():
             chroma_client = CreatePersistentDB(config)
             chroma_client.create_client()
             chroma_collection_name = prompt("[bold cyan]Enter your collection name[/bold cyan]: ")
-            chroma_client.get_collection(chroma_collection_name)
+            chroma_client = open_collection(config, chroma_client, chroma_collection_name)
             if promptCollectInput():
-                ids, documents, metadatas, embeddings = collect_chroma_input(config)
-
-                chroma_client.collections.add(
-                    ids=ids,
-                    documents=documents,
-                    metadatas=metadatas,
-                    embeddings=embeddings
-                )
+                ingest_input(config, chroma_client)
 
         case "2":
             chroma_client = CreateHttpDB(config)
             chroma_client.create_client()
             chroma_collection_name = prompt("[bold cyan]Enter your collection name[/bold cyan]: ")
-            chroma_client.get_collection(chroma_collection_name)
+            chroma_client = open_collection(config, chroma_client, chroma_collection_name)
             if promptCollectInput():
-                ids, documents, metadatas, embeddings = collect_chroma_input(config)
-
-                chroma_client.collections.add(
-                    ids=ids,
-                    documents=documents,
-                    metadatas=metadatas,
-                    embeddings=embeddings
-                )
+                ingest_input(config, chroma_client)
 
         case "3":
-            chroma_client = CreateHttpDB(config)
-            chroma_client.create_client()
-            chroma_collection_name = prompt("[bold cyan]Enter your collection name[/bold cyan]: ")
-            chroma_client.get_collection(chroma_collection_name)
-            if promptCollectInput():
-                ids, documents, metadatas, embeddings = collect_chroma_input(config)
-
-                chroma_client.collections.add(
-                    ids=ids,
-                    documents=documents,
-                    metadatas=metadatas,
-                    embeddings=embeddings
-                )
+            return async_main(config)
 
         case "4":
             sys.exit(0)
@@ -388,6 +490,9 @@ def main():
 
     console.print("[bold cyan] Query Chroma vector Database![/bold cyan]")
 
+    embedder = RCAEmbedding(config)
+    engine = RCAQueryEngine(config, chroma_client, embedder)
+
     while True:
         query_texts = prompt_query_list()
 
@@ -395,14 +500,21 @@ def main():
             console.print("[bold yellow]Exiting query mode...[/bold yellow]")
             break
 
-        query_embeddings = RCAEmbedding(config).embed_texts(query_texts)
+        start = None
+        if isinstance(chroma_client, PartitionedVectorDB):
+            try:
+                window = parse_window(prompt("Time window (e.g. 15m, 1h, 2d; blank = all): "))
+            except ValueError as e:
+                console.print(f"[bold red]{e}[/bold red]")
+                continue
+            start = time.time() - window if window else None
 
-        result = chroma_client.collections.query(
-            query_embeddings=query_embeddings,
-            n_results=10
-        )
+        # Only ids and distances come back; each page fetches its own documents
+        for result in engine.query(query_texts, start=start, lazy=True):
+            display_result_pages(RCAResultPages(config, chroma_client, result),
+                                 title=f"Chroma Query Results: {result['query']}")
 
-        display_chroma_result(result)
+    embedder.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+from utils import setup_logger
+
+
+class MicroBatcher:
+    """
+    Size/time based micro-batcher for the ingest service.
+
+    Records are buffered until `max_batch` of them are waiting or the oldest
+    one has waited `max_delay` seconds, then handed to `flush` in one call.
+    Up to `flush_tasks` flushes run at once. `offer` refuses new records once
+    `max_pending` records are buffered or being flushed, which the service
+    turns into a 429 so the sender backs off.
+
+    The records were already acknowledged, so a failed flush is retried
+    `flush_retries` times with a growing delay before the batch is given up;
+    given-up records and the last error show in `stats`.
+    """
+
+    def __init__(self, flush, max_batch: int = 1000, max_delay: float = 1.0,
+                 max_pending: int = 50000, flush_tasks: int = 2, flush_retries: int = 3):
+        self.logger = setup_logger("MicroBatcher")
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.flush_tasks = flush_tasks
+        self.flush_retries = flush_retries
+
+        self.buffer = []
+        self.pending = 0
+        self.oldest = None
+        self.wakeup = asyncio.Event()
+        self.closing = False
+        self.workers = []
+        self.stats = {"accepted": 0, "rejected": 0, "flushed": 0, "failed": 0, "batches": 0, "retries": 0,
+                      "last_error": None}
+
+    def start(self):
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.flush_tasks)]
+
+    def offer(self, records) -> bool:
+        """Buffer `records` as a whole, or return False if that would exceed max_pending."""
+        if self.closing or self.pending + len(records) > self.max_pending:
+            self.stats["rejected"] += len(records)
+            return False
+
+        if not self.buffer:
+            self.oldest = time.monotonic()
+        self.buffer.extend(records)
+        self.pending += len(records)
+        self.stats["accepted"] += len(records)
+
+        if len(self.buffer) >= self.max_batch:
+            self.wakeup.set()
+        return True
+
+    def _take(self):
+        batch = self.buffer[:self.max_batch]
+        del self.buffer[:self.max_batch]
+        self.oldest = time.monotonic() if self.buffer else None
+        if not self.buffer:
+            self.wakeup.clear()
+        return batch
+
+    async def _worker(self):
+        while True:
+            if not self.buffer:
+                if self.closing:
+                    return
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            waited = time.monotonic() - self.oldest
+            if len(self.buffer) < self.max_batch and waited < self.max_delay and not self.closing:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.max_delay - waited)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            batch = self._take()
+            try:
+                await self._flush_with_retries(batch)
+            finally:
+                self.pending -= len(batch)
+
+    async def _flush_with_retries(self, batch):
+        for attempt in range(self.flush_retries + 1):
+            try:
+                await self.flush(batch)
+                self.stats["flushed"] += len(batch)
+                self.stats["batches"] += 1
+                return
+            except Exception as e:
+                self.stats["last_error"] = f"{type(e).__name__}: {e}"
+                if attempt == self.flush_retries:
+                    self.stats["failed"] += len(batch)
+                    self.logger.error(f"❌ Gave up on {len(batch)} records after {attempt + 1} attempts: {e}")
+                    return
+                self.stats["retries"] += 1
+                self.logger.warning(f"⚠️ Failed to flush {len(batch)} records, retrying: {e}")
+                # Still counted in `pending`, so senders get 429s while the sink is down
+                await asyncio.sleep(self.max_delay * 2 ** attempt)
+
+    async def close(self):
+        """Stop accepting records and flush everything still buffered."""
+        self.closing = True
+        self.wakeup.set()
+        await asyncio.gather(*self.workers)
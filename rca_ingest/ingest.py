@@ -1,45 +1,120 @@
-# Will mostly be removed in next upcoming commits!
-
-# from fastapi import FastAPI, Request
-# import uvicorn
-#
-# from vectorEmbeddings.ingestDB import Document
-#
-# app = FastAPI()
-# from fastapi.responses import JSONResponse
-# from fastapi.concurrency import run_in_threadpool
-#
-# # UI on statistics
-# @app.get("/")
-# def root():
-#     return {"message": "RCA Ingestion API is running"}
-#
-# @app.get("/health")
-# def health():
-#     return JSONResponse("Healthy",status_code=200)
-#
-# # Ingest logs
-# @app.post("/ingest/log")
-# async def ingest_log(doc: Document):
-#     """Ingest one document into Chroma."""
-#     await run_in_threadpool(Document, doc)
-#     return {"status": "ok", "id": doc.id}
-#
-#
-#
-# @app.post("/query")
-# async def query_logs(query: QueryRequest):
-#
-#     async def _run_query():
-#         return collection.query(
-#             query_texts=[query.text],
-#             n_results=query.n_results
-#         )
-#
-#     result = await run_in_threadpool(_run_query)
-#
-#     return {"results": result}
-#
-# # uvicorn path:app --reload --host 0.0.0.0 --port 8000
-# if __name__ == '__main__':
-#     uvicorn.run("rca_ingest.ingest:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+from contextlib import asynccontextmanager
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from rca_ingest.batcher import MicroBatcher
+from rca_ingest.records import parse_body
+from utils import Readconfig, setup_logger, get_metrics
+from vectorEmbeddings import RCAAsyncEmbedding
+from vectorEmbeddings.createDB import CreateHttpAsync
+from vectorEmbeddings.ingestJob import last_wins
+
+logger = setup_logger("IngestService")
+
+
+class QueryRequest(BaseModel):
+    text: str | list[str]
+    n_results: int = 10
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    config = Readconfig().read()
+
+    db = CreateHttpAsync(config)
+    await db.create_asyncClient()
+    if db.client is None:
+        raise RuntimeError("❌ Ingest service needs a Chroma server, check [Chroma] in config.ini")
+    await db.get_asyncCollection(config.get("IngestService", "collection", fallback="logs").strip())
+
+    embedder = RCAAsyncEmbedding(config)
+
+    async def flush(records):
+        ids, documents, metadatas = (list(x) for x in zip(*records))
+        # Retried deliveries carry the same deterministic id, one upsert can't hold it twice
+        ids, documents, metadatas = last_wins(ids, documents, metadatas)
+        embeddings = await embedder.aembed_texts(documents)
+        metadatas = embedder.annotate_templates(documents, metadatas)
+        await db.upsert_asyncBatch(ids, documents, metadatas, embeddings)
+
+    batcher = MicroBatcher(
+        flush,
+        max_batch=int(config.get("IngestService", "max_batch", fallback="1000").strip()),
+        max_delay=float(config.get("IngestService", "max_delay", fallback="1.0").strip()),
+        max_pending=int(config.get("IngestService", "max_pending", fallback="50000").strip()),
+        flush_tasks=int(config.get("IngestService", "flush_tasks", fallback="2").strip()),
+        flush_retries=int(config.get("IngestService", "flush_retries", fallback="3").strip()),
+    )
+    batcher.start()
+
+    app.state.db = db
+    app.state.embedder = embedder
+    app.state.batcher = batcher
+    logger.info("🚀 RCA ingest service ready")
+
+    yield
+
+    await batcher.close()
+    await embedder.aclose()
+    logger.info(f"🛑 RCA ingest service stopped: {batcher.stats}")
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/")
+def root():
+    return {"message": "RCA Ingestion API is running"}
+
+
+@app.get("/health")
+def health():
+    return JSONResponse("Healthy", status_code=200)
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text format; empty while [Metrics] is disabled."""
+    return PlainTextResponse(get_metrics().prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+def stats(request: Request):
+    batcher = request.app.state.batcher
+    return {"pending": batcher.pending, **batcher.stats}
+
+
+# Ingest logs, batched by Vector's http sink
+@app.post("/ingest/log")
+async def ingest_log(request: Request):
+    try:
+        records = parse_body(await request.body())
+    except (ValueError, UnicodeDecodeError) as e:
+        return JSONResponse({"status": "error", "detail": str(e)}, status_code=400)
+
+    batcher = request.app.state.batcher
+    if not batcher.offer(records):
+        return JSONResponse(
+            {"status": "busy", "pending": batcher.pending},
+            status_code=429,
+            headers={"Retry-After": str(max(1, int(batcher.max_delay)))}
+        )
+
+    return JSONResponse({"status": "accepted", "count": len(records)}, status_code=202)
+
+
+@app.post("/query")
+async def query_logs(query: QueryRequest, request: Request):
+    texts = [query.text] if isinstance(query.text, str) else query.text
+    embeddings = await request.app.state.embedder.aembed_texts(texts)
+    result = await request.app.state.db.query_async(embeddings, n_results=query.n_results)
+
+    return {"results": {k: result[k] for k in ("ids", "documents", "metadatas", "distances")}}
+
+
+# uvicorn rca_ingest.ingest:app --host 0.0.0.0 --port 8000
+if __name__ == '__main__':
+    uvicorn.run("rca_ingest.ingest:app", host="0.0.0.0", port=8000)
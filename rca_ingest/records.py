@@ -0,0 +1,51 @@
+import hashlib
+import json
+
+# Fields Vector puts on every log event that are the log line itself
+MESSAGE_FIELDS = ("message", "document", "msg", "log")
+
+
+def flatten_metadata(event: dict, prefix: str = "") -> dict:
+    """Chroma metadata values must be scalars, nested objects become dotted keys."""
+    flat = {}
+    for key, value in event.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_metadata(value, f"{name}."))
+        elif isinstance(value, (str, int, float, bool)):
+            flat[name] = value
+        elif value is not None:
+            flat[name] = json.dumps(value)
+    return flat
+
+
+def event_to_record(event: dict) -> tuple:
+    """Turn one Vector log event into an (id, document, metadata) record."""
+    if not isinstance(event, dict):
+        raise ValueError(f"❌ Log event must be a JSON object, got {type(event).__name__}")
+    message = next((event[f] for f in MESSAGE_FIELDS if isinstance(event.get(f), str)), None)
+    if not message or not message.strip():
+        raise ValueError("❌ Log event has no message")
+
+    rest = {k: v for k, v in event.items() if k not in MESSAGE_FIELDS and k != "id"}
+    metadata = flatten_metadata(rest.pop("metadata", None) or {})
+    metadata.update(flatten_metadata(rest))
+
+    # Deterministic ids make Vector's at-least-once retries idempotent upserts
+    log_id = event.get("id") or hashlib.sha1(
+        json.dumps([message, metadata], sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+    return str(log_id), message, metadata or None
+
+
+def parse_body(body: bytes) -> list:
+    """Accept Vector's newline delimited JSON as well as a JSON array of events."""
+    text = body.decode("utf-8").strip()
+    if not text:
+        return []
+    if text[0] == "[":
+        events = json.loads(text)
+    else:
+        events = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [event_to_record(e) for e in events]
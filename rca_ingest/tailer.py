@@ -0,0 +1,314 @@
+import configparser
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+from rca_ingest.records import MESSAGE_FIELDS, flatten_metadata
+from utils import setup_logger, parse_timestamp, find_timestamp
+
+LEVEL = re.compile(r"\b(TRACE|DEBUG|INFO|NOTICE|WARN(?:ING)?|ERROR|ERR|CRIT(?:ICAL)?|SEVERE|FATAL|PANIC)\b", re.I)
+LEVEL_NAMES = {"WARNING": "WARN", "ERR": "ERROR", "CRIT": "CRITICAL", "SEVERE": "ERROR", "PANIC": "FATAL"}
+
+# "Jan  2 10:00:00 host sshd[123]: ..." → sshd
+SYSLOG_SERVICE = re.compile(r"^\w{3} +\d{1,2} \d{2}:\d{2}:\d{2} \S+ ([\w.\-/]+?)(?:\[\d+\])?:")
+
+# Lines that continue the previous record: indented frames, and the headers and
+# trailers of Java / Python stack traces
+CONTINUATION = re.compile(
+    r"^(?:\s|Caused by:|Suppressed:|Traceback \(most recent call last\):|During handling of the above|"
+    r"The above exception was|\.\.\. \d+ (?:more|common frames omitted)|[\w.$]+(?:Exception|Error)\b)"
+)
+
+JSON_LEVEL_FIELDS = ("level", "severity", "lvl", "log.level")
+JSON_SERVICE_FIELDS = ("service", "service.name", "app", "application")
+JSON_TIME_FIELDS = ("timestamp", "@timestamp", "time", "ts")
+
+# Bytes at the start of a file hashed to notice it was truncated and written again
+HEAD_BYTES = 1024
+
+
+class RCALogTailer:
+    """
+    Follows raw log files and ingests only the bytes added since the last run.
+
+    Per file the device, inode and byte offset are kept in a JSON state file.
+    A file whose inode changed was rotated: the old file is found again by its
+    inode and drained before the new one is read from the start; a file that
+    shrank was truncated and is re-read. Files are recognised by inode across
+    names, so a glob that also matches rotated names (app.log*) never reads
+    one of them again. Lines are grouped into records
+    (multi-line stack traces stay together), the record still being written
+    at the end of a file is held back until the next record starts or the
+    file goes idle, and the saved offset always sits on a record boundary.
+    Ids hash inode, offset and text, so re-reading after a crash upserts the
+    same ids again.
+    """
+
+    def __init__(self, config: configparser.ConfigParser, db, embedder):
+        self.logger = setup_logger("Tailer")
+        self.db = db
+        self.embedder = embedder
+
+        self.patterns = [p.strip() for p in config.get("Tailer", "paths", fallback="").split(",") if p.strip()]
+        self.chunk_size = int(config.get("Ingest", "chunk_size", fallback="2000").strip())
+        self.poll_interval = float(config.get("Tailer", "poll_interval", fallback="2").strip())
+        self.idle_flush = float(config.get("Tailer", "idle_flush", fallback="5").strip())
+        self.max_record_lines = int(config.get("Tailer", "max_record_lines", fallback="500").strip())
+        self.from_end = config.get("Tailer", "start_at", fallback="beginning").strip().lower() == "end"
+        self.service = config.get("Tailer", "service", fallback="").strip()
+
+        start = config.get("Tailer", "multiline_start", fallback="").strip()
+        self.record_start = re.compile(start) if start else None
+
+        state_path = config.get("Tailer", "state_path", fallback="").strip()
+        self.state_path = Path(state_path) if state_path else \
+            Path(config.get("Ingest", "checkpoint_dir", fallback=".checkpoints").strip()) / f"tailer__{db.collection_name}.json"
+        self.state = self.load_state()
+
+    def load_state(self):
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"⚠️ Ignoring unreadable tailer state {self.state_path}: {e}")
+            return {}
+
+    def save_state(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state, indent=2), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def starts_record(self, line: str) -> bool:
+        if self.record_start is not None:
+            return bool(self.record_start.match(line))
+        return line.startswith("{") or not CONTINUATION.match(line)
+
+    def iter_records(self, path: Path, offset: int, final: bool):
+        """
+        Yield (start, end, text) records from `offset`. Only whole lines are read;
+        the last record is held back unless `final` (rotated or idle file).
+        """
+        start, lines = offset, []
+        position = offset
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n") and not final:
+                    # Half-written line, read it whole next time
+                    break
+                line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                if lines and (self.starts_record(line) or len(lines) >= self.max_record_lines):
+                    yield start, position, "\n".join(lines)
+                    start, lines = position, []
+                lines.append(line)
+                position += len(raw)
+
+        if lines and final:
+            yield start, position, "\n".join(lines)
+
+    def to_record(self, path: Path, ident: str, start: int, text: str):
+        """(id, document, metadata) for one raw record of the file followed at `path`, None for blank ones."""
+        if not text.strip():
+            return None
+
+        metadata = {"source": str(path), "offset": start, "lines": text.count("\n") + 1}
+        document = text
+        first_line = text.split("\n", 1)[0]
+
+        event = None
+        if first_line.startswith("{") and "\n" not in text:
+            try:
+                event = json.loads(text)
+            except json.JSONDecodeError:
+                event = None
+
+        if isinstance(event, dict):
+            flat = flatten_metadata(event)
+            document = next((flat.pop(f) for f in MESSAGE_FIELDS if isinstance(flat.get(f), str)), text)
+            level = next((flat.pop(f) for f in JSON_LEVEL_FIELDS if f in flat), None)
+            service = next((flat.pop(f) for f in JSON_SERVICE_FIELDS if f in flat), None)
+            ts = next((parse_timestamp(flat.pop(f)) for f in JSON_TIME_FIELDS if f in flat), None)
+            metadata.update(flat)
+        else:
+            match = LEVEL.search(first_line)
+            level = match.group(1) if match else None
+            match = SYSLOG_SERVICE.match(first_line)
+            service = match.group(1) if match else None
+            ts = find_timestamp(first_line)
+
+        if level is not None:
+            level = str(level).upper()
+            metadata["level"] = LEVEL_NAMES.get(level, level)
+        metadata["service"] = service or self.service or path.stem
+        if ts is not None:
+            metadata["timestamp"] = ts
+
+        record_id = hashlib.sha1(f"{ident}:{start}:{text}".encode("utf-8")).hexdigest()
+        return record_id, document, metadata
+
+    def write(self, records):
+        ids, documents, metadatas = (list(x) for x in zip(*records))
+        embeddings = self.embedder.embed_texts(documents)
+        metadatas = self.embedder.annotate_templates(documents, metadatas)
+        self.db.upsert_batch(ids, documents, metadatas, embeddings)
+
+    def ingest_file(self, path: Path, entry: dict, final: bool, source: Path = None):
+        """
+        Ingest `path` from entry["offset"], committing the offset after every
+        written chunk. `source` is the followed path when `path` is its rotated file.
+        """
+        ident = f"{entry['dev']}:{entry['inode']}"
+        batch, written = [], 0
+
+        for start, end, text in self.iter_records(path, entry["offset"], final):
+            record = self.to_record(source or path, ident, start, text)
+            if record is not None:
+                batch.append(record)
+            if len(batch) >= self.chunk_size:
+                self.write(batch)
+                written += len(batch)
+                batch = []
+                entry["offset"] = end
+                self.save_state()
+            elif not batch:
+                # Nothing unwritten before `end`, blank records only move the offset
+                entry["offset"] = end
+
+            pending_end = end
+
+        if batch:
+            self.write(batch)
+            written += len(batch)
+            entry["offset"] = pending_end
+        self.save_state()
+        return written
+
+    def find_by_inode(self, directory: Path, dev: int, inode: int):
+        """Where a rotated file went, e.g. app.log → app.log.1, None if it's gone."""
+        try:
+            with os.scandir(directory) as entries:
+                for item in entries:
+                    try:
+                        st = item.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if st.st_ino == inode and st.st_dev == dev and item.is_file(follow_symlinks=False):
+                        return Path(item.path)
+        except OSError:
+            pass
+        return None
+
+    def entry_for_inode(self, dev: int, inode: int):
+        """State of the file with this inode kept under any path, None if it was never read."""
+        known = [e for e in self.state.values() if (e["dev"], e["inode"]) == (dev, inode)]
+        return max(known, key=lambda e: e["offset"], default=None)
+
+    def track_rotated(self, path: Path, entry: dict):
+        """
+        Keep `entry` under `path`, where its file was rotated to. The entry
+        held there before belongs to a file rotated one step further
+        (app.log.1 → app.log.2) and moves along with it.
+        """
+        displaced = self.state.get(str(path))
+        self.state[str(path)] = entry
+        if displaced is None or (displaced["dev"], displaced["inode"]) == (entry["dev"], entry["inode"]):
+            return
+        moved = self.find_by_inode(path.parent, displaced["dev"], displaced["inode"])
+        if moved is not None and moved.resolve() != path:
+            self.track_rotated(moved.resolve(), displaced)
+
+    def paths(self, patterns=None):
+        found = []
+        for pattern in patterns or self.patterns:
+            found.extend(sorted(glob.glob(os.path.expanduser(pattern), recursive=True)))
+        return [Path(p).resolve() for p in dict.fromkeys(found) if Path(p).is_file()]
+
+    def poll_file(self, path: Path):
+        key = str(path)
+        st = path.stat()
+        entry = self.state.get(key)
+        written = 0
+
+        if entry and (entry["dev"], entry["inode"]) != (st.st_dev, st.st_ino):
+            rotated = self.find_by_inode(path.parent, entry["dev"], entry["inode"])
+            if rotated is not None:
+                self.logger.info(f"🔄 {path.name} rotated to {rotated.name}, draining {rotated.stat().st_size - entry['offset']} bytes")
+                written += self.ingest_file(rotated, entry, final=True, source=path)
+                # Known under its new name too, so a glob that matches it doesn't read it again
+                self.track_rotated(rotated.resolve(), entry)
+            else:
+                self.logger.warning(f"⚠️ {path.name} rotated and the old file is gone, its unread tail is lost")
+            entry = None
+
+        if entry is None:
+            # A file already followed under another name (rotated, and matched
+            # by the glob before its old name was polled) carries on from its offset
+            entry = self.entry_for_inode(st.st_dev, st.st_ino)
+            if entry is not None:
+                self.state[key] = entry
+
+        if entry is None:
+            entry = self.state[key] = {
+                "dev": st.st_dev,
+                "inode": st.st_ino,
+                "offset": st.st_size if self.from_end else 0,
+            }
+        elif st.st_size < entry["offset"] or entry.get("head") != self.head_fingerprint(path, entry.get("head_bytes", 0)):
+            # copytruncate / rewritten in place: same inode, but not the bytes we read
+            self.logger.warning(f"⚠️ {path.name} was truncated or rewritten, reading from the start")
+            entry["offset"] = 0
+
+        if st.st_size > entry["offset"]:
+            idle = time.time() - st.st_mtime >= self.idle_flush
+            written += self.ingest_file(path, entry, final=idle)
+
+        if entry.get("head_bytes", 0) < min(entry["offset"], HEAD_BYTES):
+            entry["head_bytes"] = min(entry["offset"], HEAD_BYTES)
+            entry["head"] = self.head_fingerprint(path, entry["head_bytes"])
+        return written
+
+    @staticmethod
+    def head_fingerprint(path: Path, length: int):
+        """Hash of the file's first `length` bytes, to tell a truncated-and-refilled file from a grown one."""
+        if not length:
+            return None
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read(length)).hexdigest()
+
+    def prune(self, seen):
+        """Forget files that are gone for good; a missing path whose inode still exists may be mid-rotation."""
+        for key in [k for k in self.state if k not in seen]:
+            entry = self.state[key]
+            if not Path(key).exists() and self.find_by_inode(Path(key).parent, entry["dev"], entry["inode"]) is None:
+                del self.state[key]
+
+    def poll(self, patterns=None):
+        """One pass over every matching file; returns the number of records written."""
+        written = 0
+        paths = self.paths(patterns)
+        for path in paths:
+            try:
+                written += self.poll_file(path)
+            except FileNotFoundError:
+                # Rotated away between glob and open, picked up on the next pass
+                continue
+        self.prune({str(p) for p in paths})
+        self.save_state()
+        if written:
+            self.logger.info(f"📥 Tailer wrote {written} records")
+        return written
+
+    def run(self, patterns=None, once: bool = False, on_poll=None):
+        while True:
+            written = self.poll(patterns)
+            if on_poll is not None:
+                on_poll(written)
+            if once:
+                return written
+            time.sleep(self.poll_interval)
@@ -0,0 +1,19 @@
+import configparser
+
+import pytest
+
+from utils import configure_logging
+
+# Tests must not rewrite Logs/, warnings and errors still reach the console
+QUIET_LOGGING = {"Logging": {"level": "WARNING", "sinks": "console", "mode": "sync"}}
+
+
+def make_config(sections: dict = None) -> configparser.ConfigParser:
+    config = configparser.ConfigParser()
+    config.read_dict(sections or {})
+    return config
+
+
+@pytest.fixture(autouse=True, scope="session")
+def quiet_logging():
+    configure_logging(make_config(QUIET_LOGGING))
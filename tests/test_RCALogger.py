@@ -0,0 +1,29 @@
+import pytest
+
+from conftest import QUIET_LOGGING, make_config
+from utils import configure_logging, setup_logger
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    yield tmp_path
+    configure_logging(make_config(QUIET_LOGGING))
+
+
+def settings(directory, level):
+    return make_config({"Logging": {"level": level, "sinks": "files, global", "mode": "sync", "dir": str(directory)}})
+
+
+def test_rebuilding_the_pipeline_keeps_earlier_records(log_dir):
+    configure_logging(settings(log_dir, "DEBUG"))
+    logger = setup_logger("Probe")
+    logger.warning("before the config was read")
+
+    # What Readconfig.read() does once [Logging] is known
+    configure_logging(settings(log_dir, "INFO"))
+    logger.info("after")
+    logger.debug("filtered out")
+
+    lines = (log_dir / "Probe.log").read_text(encoding="utf-8").splitlines()
+    assert [line.split("] ", 2)[2].rsplit(" (", 1)[0] for line in lines] == ["before the config was read", "after"]
+    assert len((log_dir / "log.log").read_text(encoding="utf-8").splitlines()) == 2
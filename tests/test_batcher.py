@@ -0,0 +1,143 @@
+import asyncio
+
+from rca_ingest.batcher import MicroBatcher
+
+
+class Sink:
+    """Flush target recording its batches; fails the first `failures` calls."""
+
+    def __init__(self, failures: int = 0, delay: float = 0):
+        self.failures = failures
+        self.delay = delay
+        self.batches = []
+        self.calls = 0
+
+    async def __call__(self, batch):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.calls <= self.failures:
+            raise ConnectionError("sink down")
+        self.batches.append(list(batch))
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_flushes_full_batches_without_waiting():
+    async def scenario():
+        sink = Sink()
+        batcher = MicroBatcher(sink, max_batch=3, max_delay=60, flush_tasks=1)
+        batcher.start()
+        assert batcher.offer(list(range(7)))
+        await asyncio.sleep(0.05)
+        # The seventh record waits for more or for max_delay
+        assert sink.batches == [[0, 1, 2], [3, 4, 5]]
+        await batcher.close()
+        return sink, batcher
+
+    sink, batcher = run(scenario())
+    assert sink.batches[-1] == [6]
+    assert batcher.stats["flushed"] == 7
+    assert batcher.stats["batches"] == 3
+    assert batcher.pending == 0
+
+
+def test_flushes_a_partial_batch_after_max_delay():
+    async def scenario():
+        sink = Sink()
+        batcher = MicroBatcher(sink, max_batch=100, max_delay=0.1, flush_tasks=1)
+        batcher.start()
+        batcher.offer(["a", "b"])
+        await asyncio.sleep(0.02)
+        early = list(sink.batches)
+        await asyncio.sleep(0.2)
+        late = list(sink.batches)
+        await batcher.close()
+        return early, late
+
+    early, late = run(scenario())
+    assert early == []
+    assert late == [["a", "b"]]
+
+
+def test_refuses_records_beyond_max_pending():
+    async def scenario():
+        sink = Sink(delay=0.1)
+        batcher = MicroBatcher(sink, max_batch=2, max_delay=60, max_pending=4, flush_tasks=1)
+        batcher.start()
+        assert batcher.offer([1, 2, 3])
+        # All or nothing: two more would make five
+        assert not batcher.offer([4, 5])
+        assert batcher.offer([4])
+        assert not batcher.offer([5])
+        await asyncio.sleep(0.15)
+        # The first batch was flushed, which freed room
+        assert batcher.offer([5, 6])
+        await batcher.close()
+        return sink, batcher
+
+    sink, batcher = run(scenario())
+    assert [r for batch in sink.batches for r in batch] == [1, 2, 3, 4, 5, 6]
+    assert batcher.stats["rejected"] == 3
+    assert batcher.stats["accepted"] == 6
+
+
+def test_refuses_records_once_closing():
+    async def scenario():
+        batcher = MicroBatcher(Sink(), flush_tasks=1)
+        batcher.start()
+        await batcher.close()
+        return batcher.offer([1])
+
+    assert run(scenario()) is False
+
+
+def test_retries_a_failed_flush():
+    async def scenario():
+        sink = Sink(failures=2)
+        batcher = MicroBatcher(sink, max_batch=2, max_delay=0.01, flush_tasks=1, flush_retries=3)
+        batcher.start()
+        batcher.offer([1, 2])
+        await batcher.close()
+        return sink, batcher
+
+    sink, batcher = run(scenario())
+    assert sink.batches == [[1, 2]]
+    assert batcher.stats["retries"] == 2
+    assert batcher.stats["failed"] == 0
+    assert batcher.stats["last_error"] == "ConnectionError: sink down"
+
+
+def test_gives_up_after_the_last_retry():
+    async def scenario():
+        sink = Sink(failures=10)
+        batcher = MicroBatcher(sink, max_batch=2, max_delay=0.01, flush_tasks=1, flush_retries=1)
+        batcher.start()
+        batcher.offer([1, 2, 3, 4])
+        await batcher.close()
+        return sink, batcher
+
+    sink, batcher = run(scenario())
+    assert sink.batches == []
+    assert sink.calls == 4
+    assert batcher.stats["failed"] == 4
+    assert batcher.pending == 0
+
+
+def test_failing_flush_keeps_its_records_pending():
+    async def scenario():
+        sink = Sink(failures=1)
+        batcher = MicroBatcher(sink, max_batch=2, max_delay=0.2, max_pending=2, flush_tasks=1, flush_retries=1)
+        batcher.start()
+        batcher.offer([1, 2])
+        await asyncio.sleep(0.05)
+        # Waiting for its retry, the batch still holds its place
+        refused = not batcher.offer([3])
+        await batcher.close()
+        return refused, sink
+
+    refused, sink = run(scenario())
+    assert refused
+    assert sink.batches == [[1, 2]]
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from conftest import make_config
+from vectorEmbeddings.embedding import RCAAsyncEmbedding, RCAEmbedding
+
+
+def embedding_config(tmp_path):
+    return make_config({
+        "Embedding": {"model": "m", "host": "http://127.0.0.1:9", "adaptive": "false"},
+        "EmbeddingCache": {"enabled": "true", "path": str(tmp_path / "cache.sqlite")},
+    })
+
+
+def test_sync_embedder_owns_a_session_and_pool(tmp_path):
+    embedder = RCAEmbedding(embedding_config(tmp_path))
+    assert embedder.session is not None and embedder.executor is not None
+    embedder.close()
+
+
+def test_async_embedder_builds_no_sync_transport(tmp_path):
+    embedder = RCAAsyncEmbedding(embedding_config(tmp_path))
+    assert embedder.session is None and embedder.executor is None
+    assert embedder.async_client is None
+    asyncio.run(embedder.aclose())
+
+
+def test_async_cache_reads_and_writes_stay_off_the_loop(tmp_path):
+    embedder = RCAAsyncEmbedding(embedding_config(tmp_path))
+    threads = []
+    get_many, put_many = embedder.cache.get_many, embedder.cache.put_many
+    embedder.cache.get_many = lambda *a: threads.append(threading.get_ident()) or get_many(*a)
+    embedder.cache.put_many = lambda *a: threads.append(threading.get_ident()) or put_many(*a)
+
+    async def fake_batch(batch):
+        return np.ones((len(batch), 3), dtype=np.float32)
+    embedder._aembed_batch = fake_batch
+
+    async def run():
+        first = await embedder.aembed_texts(["disk full", "oom"])
+        again = await embedder.aembed_texts(["oom"])
+        return threading.get_ident(), first, again
+
+    loop_thread, first, again = asyncio.run(run())
+    assert first.shape == (2, 3) and again.tolist() == [[1.0, 1.0, 1.0]]
+    # lookup, write back, lookup again (all hits, nothing to write)
+    assert len(threads) == 3
+    assert loop_thread not in threads
+    asyncio.run(embedder.aclose())
@@ -0,0 +1,55 @@
+import numpy as np
+
+from conftest import make_config
+from vectorEmbeddings.embeddingCache import RCAEmbeddingCache
+
+
+def open_cache(tmp_path, **settings):
+    return RCAEmbeddingCache(make_config({"EmbeddingCache": dict({"path": str(tmp_path / "cache.sqlite")}, **settings)}))
+
+
+def test_hits_are_keyed_by_model_and_normalized_text(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put_many("m1", ["disk  full\n"], [[1.0, 2.0]])
+    found = cache.get_many("m1", ["disk full", "disk full", "oom"])
+    assert found[0].tolist() == found[1].tolist() == [1.0, 2.0]
+    assert found[2] is None
+    assert cache.get_many("m2", ["disk full"]) == [None]
+    assert cache.stats["memory_hits"] == 2
+    cache.close()
+
+
+def test_vectors_survive_a_restart(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put_many("m", ["a", "b"], np.asarray([[1, 2], [3, 4]], dtype=np.float32))
+    cache.close()
+
+    again = open_cache(tmp_path)
+    assert [v.tolist() for v in again.get_many("m", ["b", "a"])] == [[3, 4], [1, 2]]
+    assert again.stats["disk_hits"] == 2
+    assert again.hit_ratio() == 1.0
+    again.close()
+
+
+def test_memory_tier_is_bounded(tmp_path):
+    cache = open_cache(tmp_path, memory_entries="2")
+    cache.put_many("m", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    assert len(cache.memory) == 2
+    # Evicted from memory, still on disk
+    assert cache.get_many("m", ["a"])[0].tolist() == [1.0]
+    assert cache.stats["disk_hits"] == 1
+    cache.close()
+
+
+def test_disk_tier_drops_least_recently_used(tmp_path):
+    # 100 vectors of 1 KiB against a budget of about 50
+    cache = open_cache(tmp_path, max_disk_mb=str(50 * 1024 / 1024 / 1024), memory_entries="1")
+    vectors = np.ones((100, 256), dtype=np.float32)
+    for i in range(100):
+        cache.put_many("m", [f"text {i}"], vectors[i:i + 1])
+    assert cache.disk_bytes <= 50 * 1024
+    assert cache.stats["evictions"] > 0
+    assert cache.get_many("m", ["text 0"]) == [None]
+    assert cache.get_many("m", ["text 99"])[0] is not None
+    cache.close()
+
@@ -0,0 +1,36 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from rca_ingest.batcher import MicroBatcher
+from rca_ingest.ingest import app
+
+
+async def discard(batch):
+    pass
+
+
+def client(max_pending: int):
+    # Without the lifespan (no Chroma), the batcher only buffers
+    app.state.batcher = MicroBatcher(discard, max_pending=max_pending)
+    return TestClient(app)
+
+
+def test_accepts_events():
+    response = client(10).post("/ingest/log", content=json.dumps([{"message": "a"}, {"message": "b"}]))
+    assert response.status_code == 202
+    assert response.json()["count"] == 2
+
+
+def test_malformed_bodies_are_400():
+    http = client(10)
+    for body in (b"[1]", b"null", b"{nope", b"\xff\xfe", b'{"level": "info"}'):
+        assert http.post("/ingest/log", content=body).status_code == 400, body
+
+
+def test_full_buffer_is_429():
+    http = client(2)
+    assert http.post("/ingest/log", content=b'{"message": "a"}\n{"message": "b"}').status_code == 202
+    response = http.post("/ingest/log", content=b'{"message": "c"}')
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
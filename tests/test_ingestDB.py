@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from vectorEmbeddings.ingestDB import StreamingRecordReader, iter_chunks, ndjson_shards
+
+RECORDS = [
+    {"id": i, "document": f"line {i} é✓", "metadata": {"n": i} if i % 2 else None}
+    for i in range(1, 8)
+]
+EXPECTED = [(str(r["id"]), r["document"], r["metadata"]) for r in RECORDS]
+
+
+def write_ndjson(path, records=RECORDS):
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+    return path
+
+
+def write_json_array(path, records=RECORDS):
+    path.write_text("[\n" + ",\n".join(json.dumps(r, ensure_ascii=False) for r in records) + "\n]\n",
+                    encoding="utf-8")
+    return path
+
+
+def write_csv(path, records=RECORDS):
+    rows = ["id,document,metadata"]
+    for r in records:
+        metadata = json.dumps(r["metadata"]).replace('"', '""') if r["metadata"] else ""
+        rows.append(f'{r["id"]},"{r["document"]}","{metadata}"')
+    path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    return path
+
+
+WRITERS = {"data.ndjson": write_ndjson, "data.json": write_json_array, "data.csv": write_csv}
+
+
+@pytest.mark.parametrize("name", WRITERS)
+def test_reads_every_record(tmp_path, name):
+    path = WRITERS[name](tmp_path / name)
+    reader = StreamingRecordReader(path)
+    assert list(reader) == EXPECTED
+    # Only whitespace after the last record (a JSON array ends at its "]")
+    assert not path.read_bytes()[reader.offset:].strip()
+
+
+@pytest.mark.parametrize("name", WRITERS)
+def test_resumes_after_every_record(tmp_path, name):
+    path = WRITERS[name](tmp_path / name)
+    reader = StreamingRecordReader(path)
+    offsets = []
+    for _ in reader:
+        offsets.append(reader.offset)
+
+    for done, offset in enumerate(offsets, start=1):
+        assert list(StreamingRecordReader(path, start_offset=offset)) == EXPECTED[done:]
+
+
+def test_json_array_resume_across_read_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(StreamingRecordReader, "READ_SIZE", 7)
+    path = write_json_array(tmp_path / "data.json")
+    reader = StreamingRecordReader(path)
+    records = iter(reader)
+    assert [next(records) for _ in range(3)] == EXPECTED[:3]
+    assert list(StreamingRecordReader(path, start_offset=reader.offset)) == EXPECTED[3:]
+
+
+def test_json_array_offsets_with_many_records_per_block(tmp_path):
+    records = [dict(r, id=i) for i, r in enumerate(RECORDS * 300)]
+    path = write_json_array(tmp_path / "data.json", records)
+    reader = StreamingRecordReader(path)
+    offsets = [reader.offset for _ in reader]
+    assert len(offsets) == len(records)
+    assert not path.read_bytes()[reader.offset:].strip()
+    assert next(iter(StreamingRecordReader(path, start_offset=offsets[1000])))[0] == "1001"
+
+
+def test_json_file_with_one_object_per_line_is_ndjson(tmp_path):
+    path = write_ndjson(tmp_path / "data.json")
+    assert StreamingRecordReader(path).format == "ndjson"
+    assert list(StreamingRecordReader(path)) == EXPECTED
+
+
+def test_truncated_json_array_is_an_error(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text('[{"id": 1, "document": "a"}, {"id": 2, "docu', encoding="utf-8")
+    with pytest.raises(ValueError, match="Truncated"):
+        list(StreamingRecordReader(path))
+
+
+def test_record_without_document_is_an_error(tmp_path):
+    path = write_ndjson(tmp_path / "data.ndjson", [{"id": 1, "text": "a"}])
+    with pytest.raises(ValueError, match="'id' and 'document'"):
+        list(StreamingRecordReader(path))
+
+
+@pytest.mark.parametrize("shard_bytes", [1, 10, 40, 1000])
+def test_ndjson_shards_cover_each_record_once(tmp_path, shard_bytes):
+    path = write_ndjson(tmp_path / "data.ndjson")
+    records = []
+    for start, end in ndjson_shards(path, shard_bytes):
+        records.extend(StreamingRecordReader(path, start_offset=start, end_offset=end))
+    assert records == EXPECTED
+
+
+def test_iter_chunks_sizes():
+    chunks = list(iter_chunks(iter(EXPECTED), 3))
+    assert [len(ids) for ids, _, _ in chunks] == [3, 3, 1]
+    assert [i for ids, _, _ in chunks for i in ids] == [r[0] for r in EXPECTED]
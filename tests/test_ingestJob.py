@@ -0,0 +1,133 @@
+import json
+
+import numpy as np
+import pytest
+
+from conftest import make_config
+from vectorEmbeddings.ingestJob import RCAIngestJob, last_wins
+
+
+class FakeEmbedder:
+    def embed_texts(self, texts):
+        return np.zeros((len(texts), 4), dtype=np.float32)
+
+    def annotate_templates(self, documents, metadatas):
+        return metadatas
+
+
+class FakeDB:
+    collection_name = "logs"
+
+    def __init__(self):
+        self.rows = {}
+        self.upserted = []
+
+    def existing_ids(self, ids):
+        return {i for i in ids if i in self.rows}
+
+    def upsert_batch(self, ids, documents, metadatas, embeddings):
+        assert len(set(ids)) == len(ids)
+        self.upserted.extend(ids)
+        self.rows.update(zip(ids, documents))
+
+
+class Crash(Exception):
+    pass
+
+
+def write_records(path, first, last, mode="w"):
+    with open(path, mode, encoding="utf-8") as f:
+        for i in range(first, last):
+            f.write(json.dumps({"id": f"r{i}", "document": f"doc {i}"}) + "\n")
+
+
+@pytest.fixture
+def setup(tmp_path):
+    config = make_config({"Ingest": {"chunk_size": "3", "checkpoint_dir": str(tmp_path / "checkpoints")}})
+    path = tmp_path / "data.ndjson"
+    write_records(path, 0, 10)
+    return config, FakeDB(), path
+
+
+def test_runs_to_the_end_and_records_it(setup):
+    config, db, path = setup
+    checkpoint = RCAIngestJob(config, db, FakeEmbedder(), path).run()
+    assert checkpoint["done"]
+    assert (checkpoint["chunks"], checkpoint["records"], checkpoint["written"]) == (4, 10, 10)
+    assert checkpoint["offset"] == path.stat().st_size
+    assert checkpoint["last_chunk"] == {"index": 4, "first_id": "r9", "last_id": "r9"}
+    assert sorted(db.rows) == sorted(f"r{i}" for i in range(10))
+
+
+def test_resumes_after_the_last_committed_chunk(setup):
+    config, db, path = setup
+
+    def crash_after_two(checkpoint):
+        if checkpoint["chunks"] == 2:
+            raise Crash()
+
+    with pytest.raises(Crash):
+        RCAIngestJob(config, db, FakeEmbedder(), path).run(on_chunk=crash_after_two)
+    assert len(db.upserted) == 6
+
+    checkpoint = RCAIngestJob(config, db, FakeEmbedder(), path).run()
+    # Nothing before the checkpoint is read, let alone embedded, again
+    assert db.upserted == [f"r{i}" for i in range(10)]
+    assert (checkpoint["records"], checkpoint["written"], checkpoint["skipped"]) == (10, 10, 0)
+
+
+def test_rows_written_before_a_lost_checkpoint_are_skipped(setup, monkeypatch):
+    config, db, path = setup
+    job = RCAIngestJob(config, db, FakeEmbedder(), path)
+    save = job.save_checkpoint
+
+    def die_on_second_chunk(checkpoint):
+        if checkpoint["chunks"] == 2:
+            raise Crash()
+        save(checkpoint)
+
+    monkeypatch.setattr(job, "save_checkpoint", die_on_second_chunk)
+    with pytest.raises(Crash):
+        job.run()
+
+    checkpoint = RCAIngestJob(config, db, FakeEmbedder(), path).run()
+    assert db.upserted == [f"r{i}" for i in range(10)]
+    # Chunk 2 was stored but not checkpointed: read again, not written again
+    assert (checkpoint["records"], checkpoint["written"], checkpoint["skipped"]) == (10, 7, 3)
+
+
+def test_a_finished_file_that_grew_is_picked_up(setup):
+    config, db, path = setup
+    RCAIngestJob(config, db, FakeEmbedder(), path).run()
+    assert RCAIngestJob(config, db, FakeEmbedder(), path).run()["written"] == 10
+
+    write_records(path, 10, 12, mode="a")
+    checkpoint = RCAIngestJob(config, db, FakeEmbedder(), path).run()
+    assert db.upserted[10:] == ["r10", "r11"]
+    assert (checkpoint["records"], checkpoint["written"]) == (12, 12)
+
+
+def test_a_truncated_file_starts_over(setup):
+    config, db, path = setup
+    job = RCAIngestJob(config, db, FakeEmbedder(), path)
+    job.run()
+    write_records(path, 0, 2)
+    assert job.load_checkpoint()["offset"] == 0
+
+    checkpoint = job.run()
+    assert (checkpoint["records"], checkpoint["written"], checkpoint["skipped"]) == (2, 0, 2)
+
+
+def test_unreadable_checkpoint_starts_over(setup):
+    config, db, path = setup
+    job = RCAIngestJob(config, db, FakeEmbedder(), path)
+    job.checkpoint_path.parent.mkdir(parents=True)
+    job.checkpoint_path.write_text("{not json", encoding="utf-8")
+    assert job.load_checkpoint()["offset"] == 0
+
+
+def test_last_wins_keeps_the_last_row_of_an_id():
+    ids, documents, metadatas = last_wins(["a", "b", "a", "c", "b"], [1, 2, 3, 4, 5], [None, {"x": 1}, None, None, {"x": 2}])
+    assert ids == ["a", "c", "b"]
+    assert documents == [3, 4, 5]
+    assert metadatas == [None, None, {"x": 2}]
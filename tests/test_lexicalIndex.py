@@ -0,0 +1,60 @@
+import pytest
+
+from conftest import make_config
+from vectorEmbeddings.lexicalIndex import RCALexicalIndex, reciprocal_rank_fusion
+
+
+def test_rrf_scores_are_summed_reciprocal_ranks():
+    fused = dict(reciprocal_rank_fusion([["a", "b"], ["b", "c"]], k=60))
+    assert fused["a"] == pytest.approx(1 / 61)
+    assert fused["b"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused["c"] == pytest.approx(1 / 62)
+
+
+def test_rrf_favours_ids_both_rankings_found():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d", "b"]])
+    assert [id_ for id_, _ in fused][:2] == ["c", "b"]
+    assert [score for _, score in fused] == sorted((score for _, score in fused), reverse=True)
+
+
+def test_rrf_weights_scale_each_ranking():
+    assert reciprocal_rank_fusion([["a"], ["b"]], weights=[1.0, 2.0])[0][0] == "b"
+    assert reciprocal_rank_fusion([["a"], ["b"]], weights=[3.0, 2.0])[0][0] == "a"
+
+
+def test_rrf_of_nothing_is_empty():
+    assert reciprocal_rank_fusion([[], []]) == []
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = RCALexicalIndex(make_config({"Hybrid": {"index_dir": str(tmp_path)}}), "logs")
+    yield index
+    index.close()
+
+
+def test_exact_tokens_rank_first(index):
+    index.add(["1", "2", "3"],
+              ["connection reset ERR_CONN_RESET on db-01", "connection slow on db-02", "disk full on db-01"],
+              [{"timestamp": 100}, {"timestamp": 200}, {"timestamp": 300}])
+    assert [id_ for id_, _ in index.search("ERR_CONN_RESET")] == ["1"]
+    assert {id_ for id_, _ in index.search("db-01")} == {"1", "3"}
+    assert index.search("...") == []
+
+
+def test_upserts_replace_the_earlier_text(index):
+    index.add(["1"], ["disk full"], [None])
+    index.add(["1"], ["memory pressure"], [None])
+    assert index.search("disk") == []
+    assert [id_ for id_, _ in index.search("memory")] == ["1"]
+    assert index.count() == 1
+
+
+def test_time_bounds_and_retention(index):
+    index.add(["old", "new"], ["timeout", "timeout"], [{"timestamp": 100}, {"timestamp": 200}])
+    assert [id_ for id_, _ in index.search("timeout", start=150)] == ["new"]
+    assert [id_ for id_, _ in index.search("timeout", end=150)] == ["old"]
+    index.delete_before(150)
+    assert [id_ for id_, _ in index.search("timeout")] == ["new"]
+    index.delete(["new"])
+    assert index.count() == 0
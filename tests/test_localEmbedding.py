@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from vectorEmbeddings.localEmbedding import RCALocalModel, RCATransformersModel, token_batches
+
+
+class FakeTokenizer:
+    """Whitespace tokens, shaped like a transformers BatchEncoding."""
+
+    def __call__(self, texts, truncation=True, max_length=None):
+        ids = [list(range(1, len(t.split()) + 1))[:max_length] for t in texts]
+        return {"input_ids": ids, "attention_mask": [[1] * len(i) for i in ids],
+                "token_type_ids": [[0] * len(i) for i in ids]}
+
+
+def fake_model(max_batch_tokens: int, max_length: int = 512):
+    """The transformers backend with a fake tokenizer; forward returns each row's token count."""
+    model = RCATransformersModel.__new__(RCATransformersModel)
+    RCALocalModel.__init__(model, "fake", threads=0, max_length=max_length, max_batch_tokens=max_batch_tokens,
+                           normalize=False)
+    model.tokenizer = FakeTokenizer()
+    model.batches = []
+
+    def forward(encodings):
+        model.batches.append([len(e["input_ids"]) for e in encodings])
+        return np.asarray([[len(e["input_ids"]), 1.0] for e in encodings], dtype=np.float32)
+
+    model._forward = forward
+    return model
+
+
+def test_transformers_encodings_are_measured_in_tokens():
+    model = fake_model(max_batch_tokens=100)
+    assert [model._length(e) for e in model._encode(["a b c d e", "a"])] == [5, 1]
+
+
+def test_batches_stay_within_the_token_budget():
+    model = fake_model(max_batch_tokens=40)
+    texts = ["word " * n for n in (30, 1, 2, 10, 3, 20, 1)]
+    out = model.embed(texts)
+
+    # Rows come back in input order whatever the batching
+    assert out[:, 0].tolist() == [30, 1, 2, 10, 3, 20, 1]
+    # Length sorted, each padded batch within 40 tokens
+    assert model.batches == [[1, 1, 2, 3], [10, 20], [30]]
+
+
+def test_truncation_caps_the_length():
+    model = fake_model(max_batch_tokens=8, max_length=4)
+    model.embed(["word " * 50, "word " * 50])
+    assert model.batches == [[4, 4]]
+
+
+@pytest.mark.parametrize("lengths, budget, max_rows, expected", [
+    ([1, 2, 3, 4], 8, None, [[0, 1], [2, 3]]),
+    ([1, 1, 1, 1], 100, 3, [[0, 1, 2], [3]]),
+    ([2, 50], 10, None, [[0], [1]]),
+])
+def test_token_batches(lengths, budget, max_rows, expected):
+    assert list(token_batches(range(len(lengths)), lengths, budget, max_rows)) == expected
@@ -0,0 +1,36 @@
+import pytest
+
+from vectorEmbeddings.logTemplate import RCALogTemplater
+
+
+@pytest.fixture
+def templater():
+    return RCALogTemplater()
+
+
+@pytest.mark.parametrize("line, template", [
+    ("2024-05-01T10:00:00.123Z user 42 logged in from 10.0.0.7:8080",
+     "<TS> user <NUM> logged in from <IP>"),
+    ("May  1 10:00:00 host sshd[991]: Accepted key for bob@example.com",
+     "<TS> host sshd[<NUM>]: Accepted key for <EMAIL>"),
+    ("request 3f2b8c1e-9d4a-4b6e-8f1a-2c3d4e5f6a7b took 12.5 ms at 0x7ffe12",
+     "request <UUID> took <NUM> ms at <HEX>"),
+    ("trace deadbeef00112233 on 2024-05-01 at 10:00:01",
+     "trace <HEX> on <DATE> at <TIME>"),
+    # Digits glued to a word are part of it, after a dash they are a variable
+    ("retry v2.1 of job-7 failed", "retry v2.1 of job-<NUM> failed"),
+])
+def test_variable_tokens_are_masked(templater, line, template):
+    assert templater.template(line) == template
+
+
+def test_lines_differing_only_in_variables_share_an_id(templater):
+    ids = templater.template_ids([
+        "2024-05-01T10:00:00Z user 1 logged in",
+        "2024-05-02T11:30:00Z user 2071 logged in",
+        "2024-05-02T11:30:00Z user 2071 logged out",
+        None,
+    ])
+    assert ids[0] == ids[1] != ids[2]
+    assert ids[3] == RCALogTemplater.template_id("")
+    assert len(ids[0]) == 16
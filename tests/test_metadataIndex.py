@@ -0,0 +1,93 @@
+import pytest
+
+from conftest import make_config
+from vectorEmbeddings.metadataIndex import RCAMetadataIndex, RCAMetadataSchema
+
+T0 = 1714557600.0  # 2024-05-01T10:00:00Z
+
+
+@pytest.fixture
+def schema():
+    return RCAMetadataSchema(make_config(), "logs")
+
+
+def test_where_operands_are_coerced_like_stored_values(schema):
+    where = {
+        "$and": [
+            {"level": {"$in": ["ERR", "Warn", 3]}},
+            {"timestamp": {"$gte": "2024-05-01T10:00:00Z", "$lt": T0 * 1000 + 60000}},
+            {"$or": [{"service": " Payment "}, {"host": "DB-01"}]},
+        ]
+    }
+    assert schema.coerce_where(where) == {
+        "$and": [
+            {"level": {"$in": ["error", "warning", "error"]}},
+            {"timestamp": {"$gte": T0, "$lt": T0 + 60}},
+            # Undeclared fields are left alone
+            {"$or": [{"service": "payment"}, {"host": "DB-01"}]},
+        ]
+    }
+
+
+def test_unparseable_operands_are_kept(schema):
+    assert schema.coerce_where({"timestamp": {"$gt": "yesterday"}}) == {"timestamp": {"$gt": "yesterday"}}
+    assert schema.coerce_where({"level": "ERROR"}) == {"level": "error"}
+    assert schema.coerce_where(None) is None
+
+
+def test_metadata_is_coerced_with_aliases(schema):
+    assert schema.coerce({"severity": "E", "timestamp": "1714557600000", "app": "API", "x": 1}) == {
+        "severity": "E", "level": "error", "timestamp": T0, "app": "API", "service": "api", "x": 1}
+    assert schema.coerce({"timestamp": "not a time"}) is None
+    assert schema.coerce({"level": 0})["level"] == "critical"
+
+
+def test_fields_come_from_the_most_specific_section():
+    config = make_config({
+        "Metadata": {"fields": "code:int"},
+        "Metadata.logs": {"fields": "code:float, ok:bool", "aliases": "ok=success"},
+    })
+    schema = RCAMetadataSchema(config, "logs__2024_05_01")
+    assert schema.fields == {"code": "float", "ok": "bool"}
+    assert schema.coerce({"code": "5", "success": "yes"}) == {"code": 5.0, "success": "yes", "ok": True}
+    assert RCAMetadataSchema(config, "other").fields == {"code": "int"}
+
+
+def test_unknown_type_is_an_error():
+    with pytest.raises(ValueError, match="must be one of"):
+        RCAMetadataSchema(make_config({"Metadata": {"fields": "code:decimal"}}), "logs")
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = RCAMetadataIndex(make_config({"Metadata": {"index_dir": str(tmp_path), "prefilter_max": "2"}}), "logs")
+    index.add(["a", "b", "c"], [
+        {"timestamp": T0, "level": "error", "service": "payment"},
+        {"timestamp": T0 + 10, "level": "info", "service": "payment"},
+        {"timestamp": T0 + 20, "level": "error", "service": "search", "host": "h1"},
+    ])
+    yield index
+    index.close()
+
+
+def test_candidates_answer_the_indexed_part(index):
+    found, rest = index.candidates({"level": "error", "host": "h1"})
+    assert sorted(found) == [("a", T0), ("c", T0 + 20)]
+    assert rest == {"host": "h1"}
+
+    found, rest = index.candidates({"service": "payment"}, start=T0 + 5)
+    assert (found, rest) == ([("b", T0 + 10)], None)
+
+
+def test_unselective_filters_are_left_to_chroma(index):
+    where = {"timestamp": {"$gte": T0}}
+    assert index.candidates(where) == (None, where)
+    assert index.candidates({"host": "h1"}) == (None, {"host": "h1"})
+
+
+def test_fields_declared_later_are_not_used(tmp_path, index):
+    config = make_config({"Metadata": {"index_dir": str(tmp_path), "fields": "level:level, host:str"}})
+    later = RCAMetadataIndex(config, "logs")
+    assert later.complete == {"level"}
+    assert later.candidates({"host": "h1"}) == (None, {"host": "h1"})
+    later.close()
@@ -0,0 +1,115 @@
+import json
+import multiprocessing
+import os
+import queue
+import signal
+
+import numpy as np
+import pytest
+
+from conftest import make_config
+from vectorEmbeddings.parallelIngest import RCAParallelIngest, _DONE, expand_sources, parse_worker, plan_shards
+
+
+class FakeEmbedder:
+    templater = None
+
+    def embed_texts(self, texts, templates=None):
+        return np.zeros((len(texts), 4), dtype=np.float32)
+
+    def annotate_templates(self, documents, metadatas, templates=None):
+        return metadatas
+
+
+class FakeDB:
+    def __init__(self):
+        self.batches = []
+
+    def upsert_batch(self, ids, documents, metadatas, embeddings):
+        self.batches.append((ids, documents))
+
+
+def write_ndjson(path, rows):
+    path.write_text("".join(json.dumps({"id": i, "document": d}) + "\n" for i, d in rows), encoding="utf-8")
+    return path
+
+
+def parse(shards, chunk_size):
+    tasks, results = queue.Queue(), queue.Queue()
+    for shard in shards:
+        tasks.put(shard)
+    tasks.put(_DONE)
+    parse_worker(tasks, results, chunk_size, templates=False)
+    chunks = []
+    while (item := results.get()) is not _DONE:
+        chunks.append(item)
+    return chunks
+
+
+def test_repeated_ids_within_a_chunk_keep_the_last_row(tmp_path):
+    path = write_ndjson(tmp_path / "a.ndjson", [("x", "old"), ("y", "y"), ("x", "new"), ("z", "z")])
+    chunks = parse(plan_shards([path], 1 << 20), chunk_size=4)
+    assert [(ids, documents) for ids, documents, _, _ in chunks] == [(["y", "x", "z"], ["y", "new", "z"])]
+
+
+def test_worker_reports_a_bad_file_as_an_error(tmp_path):
+    path = tmp_path / "bad.ndjson"
+    path.write_text('{"id": 1, "document": "a"}\n{oops\n', encoding="utf-8")
+    chunks = parse(plan_shards([path], 1 << 20), chunk_size=1)
+    assert isinstance(chunks[-1], ValueError)
+
+
+def test_worker_reports_a_malformed_task():
+    chunks = parse([42], chunk_size=1)
+    assert isinstance(chunks[-1], ValueError)
+    assert str(chunks[-1]).startswith("❌ Parse worker failed: ")
+
+
+def test_shards_split_ndjson_and_keep_other_formats_whole(tmp_path):
+    big = write_ndjson(tmp_path / "big.ndjson", [(i, "x" * 50) for i in range(100)])
+    array = tmp_path / "small.json"
+    array.write_text(json.dumps([{"id": 1, "document": "a"}]), encoding="utf-8")
+    files = expand_sources([str(tmp_path)])
+    assert files == [big.resolve(), array.resolve()]
+
+    shards = plan_shards(files, 1000)
+    assert (str(array.resolve()), 0, None) in shards
+    ndjson = sorted((s, e) for p, s, e in shards if p == str(big.resolve()))
+    assert len(ndjson) > 1
+    assert ndjson[0][0] == 0 and ndjson[-1][1] == big.stat().st_size
+    assert all(end == start for (_, end), (start, _) in zip(ndjson, ndjson[1:]))
+
+
+def test_run_writes_every_record_once(tmp_path):
+    write_ndjson(tmp_path / "a.ndjson", [(f"a{i}", f"doc {i}") for i in range(300)])
+    write_ndjson(tmp_path / "b.ndjson", [(f"b{i}", f"doc {i}") for i in range(50)])
+    config = make_config({"Ingest": {"chunk_size": "40", "parallel_workers": "2", "parallel_shard_mb": "0.002"}})
+    db = FakeDB()
+
+    summary = RCAParallelIngest(config, db, FakeEmbedder()).run([str(tmp_path)])
+    written = [i for ids, _ in db.batches for i in ids]
+    assert sorted(written) == sorted([f"a{i}" for i in range(300)] + [f"b{i}" for i in range(50)])
+    assert summary["written"] == 350
+    assert summary["shards"] > 2
+
+
+def test_run_without_data_files_is_an_error(tmp_path):
+    with pytest.raises(ValueError, match="No "):
+        RCAParallelIngest(make_config(), FakeDB(), FakeEmbedder()).run([str(tmp_path)])
+
+
+class KillingEmbedder(FakeEmbedder):
+    """Kills the parse workers on its first call, like the OOM killer would."""
+
+    def embed_texts(self, texts, templates=None):
+        for child in multiprocessing.active_children():
+            os.kill(child.pid, signal.SIGKILL)
+        return super().embed_texts(texts, templates)
+
+
+def test_a_killed_worker_fails_the_run_instead_of_hanging(tmp_path):
+    write_ndjson(tmp_path / "a.ndjson", [(f"a{i}", f"doc {i}") for i in range(20000)])
+    config = make_config({"Ingest": {"chunk_size": "10", "parallel_workers": "2", "parallel_queue_size": "1",
+                                     "parallel_shard_mb": "0.05"}})
+    with pytest.raises(RuntimeError, match="parse worker died"):
+        RCAParallelIngest(config, FakeDB(), KillingEmbedder()).run([str(tmp_path)])
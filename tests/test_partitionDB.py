@@ -0,0 +1,74 @@
+import types
+
+import pytest
+
+from conftest import make_config
+from vectorEmbeddings.createDB import TIMESTAMP_FIELD
+from vectorEmbeddings.partitionDB import PartitionedVectorDB
+
+T0 = 1714557600.0  # 2024-05-01T10:00:00Z
+
+
+class FakeCollection:
+    """Chroma collection stand-in that embeds a text as its length."""
+
+    def __init__(self, name):
+        self.name = name
+        self.metadata = None
+        self.rows = {}
+
+    def add(self, ids, documents, metadatas, embeddings=None):
+        self.rows.update(zip(ids, zip(documents, metadatas)))
+
+    def query(self, query_texts=None, query_embeddings=None, ids=None, n_results=10, where=None, include=()):
+        queries = query_texts if query_texts is not None else [q[0] for q in query_embeddings]
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for q in queries:
+            size = len(q) if isinstance(q, str) else q
+            hits = sorted((abs(len(doc) - size), id_, doc, meta) for id_, (doc, meta) in self.rows.items())[:n_results]
+            result["ids"].append([h[1] for h in hits])
+            result["documents"].append([h[2] for h in hits])
+            result["metadatas"].append([h[3] for h in hits])
+            result["distances"].append([float(h[0]) for h in hits])
+        return result
+
+
+class FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name, configuration=None, metadata=None):
+        return self.collections.setdefault(name, FakeCollection(name))
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+    def list_collections(self):
+        return list(self.collections)
+
+
+@pytest.fixture
+def db():
+    client = FakeClient()
+    db = PartitionedVectorDB(make_config({"Partition": {"granularity": "daily"}}),
+                             types.SimpleNamespace(client=client, max_batch_size=100))
+    db.get_collection("logs")
+    return db
+
+
+def test_insert_routes_to_the_time_partition(db):
+    db.insert("a", "disk full", {"timestamp": "2024-05-01T10:00:00Z"})
+    db.insert("b", "no time", None)
+    assert sorted(db.client.collections) == ["logs__d20240501", "logs__undated"]
+    assert db.client.collections["logs__d20240501"].rows["a"] == ("disk full", {"timestamp": "2024-05-01T10:00:00Z",
+                                                                                TIMESTAMP_FIELD: T0})
+    assert db.generation == 2
+
+
+def test_text_query_merges_partitions(db):
+    db.insert("a", "xxxx", {"timestamp": T0})
+    db.insert("b", "xx", {"timestamp": T0 + 86400})
+    db.insert("c", "xxxxxxxx", None)
+    result = db.query(["xxx", "xxxxxxx"], n_results=2)
+    assert result["ids"] == [["a", "b"], ["c", "a"]]
+    assert result["distances"] == [[1.0, 1.0], [1.0, 3.0]]
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from conftest import make_config
+from vectorEmbeddings.quantStore import RCAQuantizedClient, RCAQuantizedCollection, quantize, where_sql
+
+
+def clustered(rng, n, noise, dim=32, centers=20):
+    """Vectors around `centers` points; the tighter the clusters, the more int8 rounding reorders neighbours."""
+    means = rng.normal(size=(centers, dim)).astype(np.float32)
+    return means[rng.integers(0, centers, n)] + noise * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def collection(path, space="l2", rerank_factor=8, scan_block=16384):
+    return RCAQuantizedCollection(path / "c", "c", configuration={"hnsw": {"space": space}},
+                                  rerank_factor=rerank_factor, scan_block=scan_block)
+
+
+def test_quantize_is_within_half_a_step():
+    x = np.random.default_rng(0).normal(size=(50, 16)).astype(np.float32) * np.repeat([[1], [1000]], 25, axis=0)
+    codes, scales = quantize(x)
+    assert codes.dtype == np.int8 and scales.dtype == np.float32
+    assert np.abs(codes).max() == 127
+    assert np.all(np.abs(codes * scales[:, None] - x) <= scales[:, None] / 2 + 1e-6)
+
+
+def test_quantize_zero_rows():
+    codes, scales = quantize(np.zeros((2, 4), dtype=np.float32))
+    assert not codes.any()
+    assert np.all(scales == 1)
+
+
+@pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+def test_reranked_results_match_an_exact_search(tmp_path, space):
+    rng = np.random.default_rng(1)
+    x = clustered(rng, 3000, noise=0.2)
+    store = collection(tmp_path, space, scan_block=512)
+    store.add(ids=[f"r{i}" for i in range(len(x))], embeddings=x)
+
+    queries = store.prepare(x[rng.integers(0, len(x), 20)] + 0.01)
+    found = store.search(queries, 10)
+    truth = store.search(queries, 10, exact=True)
+    for q, (rows, distances), (true_rows, _) in zip(queries, found, truth):
+        assert set(rows) == set(true_rows)
+        # Re-ranked distances are the exact ones, not the int8 estimates
+        assert np.allclose(distances, store.exact_distances(store.full.data[rows], q), atol=1e-5)
+        assert np.all(np.diff(distances) >= 0)
+    store.close()
+
+
+def test_reranking_recovers_what_codes_alone_miss(tmp_path):
+    rng = np.random.default_rng(2)
+    x = clustered(rng, 4000, noise=0.05)
+    store = collection(tmp_path, rerank_factor=16)
+    store.add(ids=[str(i) for i in range(len(x))], embeddings=x)
+
+    report = store.recall_report(x[:30] + 0.01, k=10)
+    assert report["recall@10_codes"] < 0.6
+    assert report["recall@10_reranked"] >= 0.9
+    assert report["compression"] > 3
+    store.close()
+
+
+def test_query_returns_payloads_like_chroma(tmp_path):
+    store = collection(tmp_path)
+    store.add(ids=["a", "b", "c"], embeddings=[[0, 0], [1, 0], [5, 5]], documents=["A", "B", "C"],
+              metadatas=[{"level": "error"}, None, {"level": "info"}])
+    result = store.query(query_embeddings=[[0.9, 0]], n_results=2)
+    assert result["ids"] == [["b", "a"]]
+    assert result["documents"] == [["B", "A"]]
+    assert result["metadatas"] == [[None, {"level": "error"}]]
+    assert result["distances"][0] == pytest.approx([0.01, 0.81], abs=1e-3)
+
+    filtered = store.query(query_embeddings=[[0.9, 0]], n_results=2, where={"level": {"$in": ["error", "info"]}},
+                           include=["distances"])
+    assert filtered["ids"] == [["a", "c"]]
+    assert filtered["documents"] is None
+    store.close()
+
+
+def test_upsert_overwrites_and_add_ignores_existing_ids(tmp_path):
+    store = collection(tmp_path)
+    store.add(ids=["a"], embeddings=[[1, 0]], documents=["first"])
+    store.add(ids=["a"], embeddings=[[0, 1]], documents=["ignored"])
+    assert store.get(ids=["a"])["documents"] == ["first"]
+    store.upsert(ids=["a", "b"], embeddings=[[0, 1], [1, 1]], documents=["second", "B"])
+    assert store.count() == 2
+    assert store.get(include=["documents", "embeddings"])["embeddings"].tolist() == [[0, 1], [1, 1]]
+    with pytest.raises(ValueError, match="dimension"):
+        store.add(ids=["c"], embeddings=[[1, 2, 3]])
+    store.close()
+
+
+def test_rows_survive_reopening(tmp_path):
+    store = collection(tmp_path)
+    store.add(ids=["a", "b"], embeddings=[[1, 0], [0, 1]], documents=["A", "B"])
+    store.close()
+
+    again = RCAQuantizedCollection(tmp_path / "c", "c")
+    assert (again.count(), again.dim, again.space) == (2, 2, "l2")
+    assert again.query(query_embeddings=[[0, 1]], n_results=1)["ids"] == [["b"]]
+    again.close()
+
+
+def test_client_lists_and_deletes_collections(tmp_path):
+    client = RCAQuantizedClient(make_config({"Quantized": {"path": str(tmp_path)}}))
+    client.get_or_create_collection("logs").add(ids=["a"], embeddings=[[1.0]])
+    assert client.list_collections() == ["logs"]
+    with pytest.raises(ValueError, match="does not exist"):
+        client.get_collection("other")
+    client.delete_collection("logs")
+    assert client.list_collections() == []
+
+
+def test_where_sql():
+    params = []
+    sql = where_sql({"$and": [{"level": "error"}, {"code": {"$gte": 500, "$nin": [503]}}]}, params)
+    assert sql == ("(json_extract(metadata, ?) = ? AND json_extract(metadata, ?) >= ? AND "
+                   "json_extract(metadata, ?) NOT IN (?))")
+    assert params == ['$."level"', "error", '$."code"', 500, '$."code"', 503]
+    with pytest.raises(ValueError, match="Unsupported"):
+        where_sql({"level": {"$contains": "err"}}, [])
@@ -0,0 +1,152 @@
+import numpy as np
+
+from conftest import make_config
+from vectorEmbeddings import queryDB
+from vectorEmbeddings.queryDB import RCAQueryEngine, TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeEmbedder:
+    def embed_texts(self, texts):
+        return np.asarray([[len(t), t.count("e")] for t in texts], dtype=np.float32)
+
+
+class FakeDB:
+    """Answers every query with one hit and counts the searches."""
+
+    collection_name = "logs"
+    lexical = None
+
+    def __init__(self):
+        self.generation = 0
+        self.searches = 0
+
+    def query_embeddings(self, embeddings, n_results, where=None, start=None, end=None, include=None):
+        self.searches += 1
+        rows = range(len(embeddings))
+        return {"ids": [[f"id-{self.searches}"] for _ in rows], "documents": [["doc"] for _ in rows],
+                "metadatas": [[None] for _ in rows], "distances": [[0.5] for _ in rows]}
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(queryDB, "time", clock)
+    cache = TTLCache(ttl=10)
+    cache.put("k", 1)
+    clock.now += 9
+    assert cache.get("k") == 1
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats == {"hits": 1, "misses": 1, "expired": 1}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def engine():
+    db = FakeDB()
+    return RCAQueryEngine(make_config(), db, FakeEmbedder()), db
+
+
+def test_repeated_queries_come_from_the_cache():
+    query, db = engine()
+    first = query.query(["disk full", "oom"])
+    again = query.query(["oom", "disk full"])
+    assert db.searches == 1
+    assert [r["ids"] for r in again] == [first[1]["ids"], first[0]["ids"]]
+
+
+def test_only_missing_queries_are_searched():
+    query, db = engine()
+    query.query("disk full")
+    results = query.query(["disk full", "oom"])
+    assert db.searches == 2
+    assert [r["ids"] for r in results] == [["id-1"], ["id-2"]]
+
+
+def test_a_write_invalidates_earlier_results():
+    query, db = engine()
+    query.query("disk full")
+    db.generation += 1
+    assert query.query("disk full")[0]["ids"] == ["id-2"]
+    assert db.searches == 2
+
+
+def test_filters_and_sizes_are_part_of_the_key():
+    query, db = engine()
+    query.query("disk full")
+    query.query("disk full", where={"level": "error"})
+    query.query("disk full", n_results=3)
+    query.query("disk full", start=0.0, end=10.0)
+    query.query("disk full", lazy=True)
+    assert db.searches == 5
+
+
+def test_callers_cannot_corrupt_cached_results():
+    query, db = engine()
+    query.query("disk full")[0]["ids"].append("junk")
+    assert query.query("disk full")[0]["ids"] == ["id-1"]
+
+
+def test_sliding_windows_share_a_cache_entry():
+    db = FakeDB()
+    query = RCAQueryEngine(make_config({"Query": {"window_bucket": "60"}}), db, FakeEmbedder())
+    calls = []
+    search = db.query_embeddings
+
+    def record(embeddings, n_results, where=None, start=None, end=None, include=None):
+        calls.append((start, end))
+        return search(embeddings, n_results, where, start, end, include)
+
+    db.query_embeddings = record
+    query.query("disk full", start=1000.0 - 900)
+    query.query("disk full", start=1010.0 - 900)
+    # Widened outwards to whole minutes
+    query.query("disk full", start=1200.0 - 900, end=1201.0)
+    assert calls == [(60.0, None), (300.0, 1260.0)]
+
+
+def test_exact_windows_when_not_bucketed():
+    query, db = engine()
+    query.window_bucket = 0
+    query.query("disk full", start=100.0)
+    query.query("disk full", start=101.0)
+    assert db.searches == 2
+
+
+class FakeLexical:
+    def search(self, text, limit, start=None, end=None):
+        return [("lex-1", 2.0), ("lex-2", 1.0)]
+
+
+def test_lazy_fusion_only_checks_which_lexical_hits_pass():
+    db = FakeDB()
+    db.lexical = FakeLexical()
+    fetched = []
+
+    def get_records(ids, where=None, start=None, end=None, payloads=True):
+        fetched.append(payloads)
+        return {"lex-1": ("doc", None) if payloads else None}
+
+    db.get_records = get_records
+    query = RCAQueryEngine(make_config(), db, FakeEmbedder())
+    lazy = query.query("disk full", hybrid=True, lazy=True)[0]
+    full = query.query("disk full", hybrid=True)[0]
+    assert fetched == [False, True]
+    # lex-2 failed the filter and is left out either way
+    assert sorted(lazy["ids"]) == ["id-1", "lex-1"] and sorted(full["ids"]) == ["id-2", "lex-1"]
+    assert "documents" not in lazy and full["documents"][full["ids"].index("lex-1")] == "doc"
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from rca_ingest.records import event_to_record, flatten_metadata, parse_body
+
+
+def test_parses_ndjson_and_arrays_alike():
+    events = [{"message": "disk full", "host": "a"}, {"message": "disk ok", "host": "b"}]
+    ndjson = "\n".join(json.dumps(e) for e in events).encode("utf-8")
+    array = json.dumps(events).encode("utf-8")
+    assert parse_body(ndjson) == parse_body(array)
+    assert [r[1] for r in parse_body(array)] == ["disk full", "disk ok"]
+
+
+def test_empty_body_has_no_records():
+    assert parse_body(b"  \n") == []
+
+
+def test_ids_are_deterministic_unless_given():
+    event = {"message": "disk full", "host": "a"}
+    assert event_to_record(event)[0] == event_to_record(dict(event))[0]
+    assert event_to_record(dict(event, host="b"))[0] != event_to_record(event)[0]
+    assert event_to_record(dict(event, id=42))[0] == "42"
+
+
+def test_metadata_is_flattened_to_scalars():
+    assert flatten_metadata({"k8s": {"pod": "p", "labels": {"app": "x"}}, "tags": ["a"], "gone": None}) == {
+        "k8s.pod": "p", "k8s.labels.app": "x", "tags": '["a"]'}
+
+
+@pytest.mark.parametrize("body", [
+    b"[1, 2]",
+    b'["a string"]',
+    b"null",
+    b'{"message": "ok"}\n42',
+    b'{"message": "ok"}\n{"message"',
+    b'{"host": "no message"}',
+    b'{"message": "   "}',
+])
+def test_bad_bodies_are_value_errors(body):
+    # The service answers ValueError with a 400
+    with pytest.raises(ValueError):
+        parse_body(body)
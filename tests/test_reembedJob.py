@@ -0,0 +1,194 @@
+import json
+
+import numpy as np
+import pytest
+
+from conftest import make_config
+from vectorEmbeddings import createDB, reembedJob
+from vectorEmbeddings.createDB import MODEL_KEY, SERVED_BY_KEY, CreateQuantizedDB
+from vectorEmbeddings.quantStore import RCAQuantizedClient
+from vectorEmbeddings.reembedJob import RCAReembedJob
+
+
+class FakeEmbedder:
+    """Vectors that differ per model, so a test can tell which model embedded a row."""
+
+    def __init__(self, model: str):
+        self.offset = float(sum(map(ord, model)))
+        self.embedded = []
+
+    def embed_texts(self, texts):
+        self.embedded.extend(texts)
+        return np.asarray([[self.offset, len(t), 1.0] for t in texts], dtype=np.float32)
+
+    def annotate_templates(self, documents, metadatas):
+        return metadatas
+
+
+@pytest.fixture(autouse=True)
+def follow_at_once(monkeypatch):
+    # Handles look a swap up on their next call instead of within a second
+    monkeypatch.setattr(createDB, "FOLLOW_INTERVAL", 0.0)
+    monkeypatch.setattr(reembedJob, "FOLLOW_INTERVAL", 0.0)
+
+
+@pytest.fixture
+def open_db(tmp_path):
+    def open_db(model: str, **reembed):
+        config = make_config({
+            "Embedding": {"model": model},
+            "Quantized": {"path": str(tmp_path / "store")},
+            "Reembed": dict({"state_dir": str(tmp_path / "state"), "page_size": "2", "max_rate": "0",
+                             "swap_grace": "0.01"}, **reembed),
+        })
+        db = CreateQuantizedDB(config)
+        db.create_client()
+        db.get_collection("logs")
+        return config, db
+    return open_db
+
+
+def ingest(db, model, ids):
+    embedder = FakeEmbedder(model)
+    documents = [f"document {i}" for i in ids]
+    db.upsert_batch(list(ids), documents, [{"n": i} for i in ids], embedder.embed_texts(documents))
+
+
+def stored(db):
+    got = db.current().get(include=["documents", "embeddings"])
+    return dict(zip(got["ids"], got["documents"])), got["embeddings"]
+
+
+def test_migrates_and_swaps_through_the_pointer(open_db):
+    _, old = open_db("model-a")
+    ingest(old, "model-a", ["1", "2", "3", "4", "5"])
+
+    config, db = open_db("model-b")
+    embedder = FakeEmbedder("model-b")
+    state = RCAReembedJob(config, db, embedder).run()
+
+    shadow = RCAReembedJob.shadow_name("logs", "model-b")
+    assert state["done"] and state["sources"]["logs"]["swapped"]
+    assert db.current().name == shadow
+    documents, embeddings = stored(db)
+    assert sorted(documents) == ["1", "2", "3", "4", "5"]
+    assert np.all(embeddings[:, 0] == FakeEmbedder("model-b").offset)
+
+    # The name stays, holding only the pointer
+    holder = db.client.get_collection("logs")
+    assert holder.metadata[SERVED_BY_KEY] == shadow
+    assert holder.get(include=[])["ids"] == []
+    assert sorted(db.client.list_collections()) == ["logs", shadow]
+
+    # A fresh handle resolves the pointer, an old-model one is refused
+    assert open_db("model-b")[1].current().name == shadow
+    with pytest.raises(ValueError, match="embedded with model-b"):
+        ingest(old, "model-a", ["6"])
+
+
+def test_rows_written_to_the_old_collection_during_the_swap_are_kept(open_db, monkeypatch):
+    _, old = open_db("model-a")
+    ingest(old, "model-a", ["1", "2", "3"])
+    lagging = old.current()
+
+    config, db = open_db("model-b")
+    job = RCAReembedJob(config, db, FakeEmbedder("model-b"))
+    finish = job.finish
+
+    def write_then_finish(*args, **kwargs):
+        # A writer that hasn't followed the switch yet
+        lagging.upsert(ids=["late"], documents=["late row"], embeddings=[[0.0, 1.0, 2.0]])
+        finish(*args, **kwargs)
+
+    monkeypatch.setattr(job, "finish", write_then_finish)
+    job.run()
+    assert sorted(stored(db)[0]) == ["1", "2", "3", "late"]
+
+
+def test_stopped_run_resumes_at_its_page(open_db):
+    _, old = open_db("model-a")
+    ingest(old, "model-a", ["1", "2", "3", "4", "5"])
+
+    config, db = open_db("model-b")
+    first = RCAReembedJob(config, db, FakeEmbedder("model-b"))
+    state = first.run(on_page=lambda progress: first.stop_event.set())
+    assert not state["done"]
+    assert state["sources"]["logs"]["offset"] == 2
+    # Not switched, queries still read the old vectors
+    assert db.current().name == "logs"
+
+    embedder = FakeEmbedder("model-b")
+    state = RCAReembedJob(config, db, embedder).run()
+    assert state["done"]
+    assert embedder.embedded == ["document 3", "document 4", "document 5"]
+    assert sorted(stored(db)[0]) == ["1", "2", "3", "4", "5"]
+
+
+def test_interrupted_swap_is_finished_by_the_next_run(open_db, monkeypatch):
+    _, old = open_db("model-a")
+    ingest(old, "model-a", ["1", "2"])
+
+    config, db = open_db("model-b")
+    job = RCAReembedJob(config, db, FakeEmbedder("model-b"))
+    monkeypatch.setattr(job, "finish", lambda *args, **kwargs: (_ for _ in ()).throw(KeyboardInterrupt()))
+    with pytest.raises(KeyboardInterrupt):
+        job.run()
+    progress = json.loads(job.state_path.read_text())["sources"]["logs"]
+    assert progress["switched"] and not progress["swapped"]
+
+    state = RCAReembedJob(config, db, FakeEmbedder("model-b")).run()
+    assert state["sources"]["logs"]["swapped"]
+    assert db.client.get_collection("logs").get(include=[])["ids"] == []
+    assert sorted(stored(db)[0]) == ["1", "2"]
+
+
+def test_second_migration_retires_the_first_shadow(open_db):
+    _, old = open_db("model-a")
+    ingest(old, "model-a", ["1", "2", "3"])
+    config, db = open_db("model-b")
+    RCAReembedJob(config, db, FakeEmbedder("model-b")).run()
+
+    config, db = open_db("model-c")
+    RCAReembedJob(config, db, FakeEmbedder("model-c")).run()
+    shadow = RCAReembedJob.shadow_name("logs", "model-c")
+    assert sorted(db.client.list_collections()) == ["logs", shadow]
+    assert db.client.get_collection("logs").metadata[SERVED_BY_KEY] == shadow
+    assert db.current().metadata[MODEL_KEY] == "model-c"
+    assert sorted(stored(db)[0]) == ["1", "2", "3"]
+
+
+def test_keep_old_leaves_the_old_vectors(open_db):
+    _, old = open_db("model-a")
+    ingest(old, "model-a", ["1", "2"])
+    config, db = open_db("model-b", keep_old="true")
+    RCAReembedJob(config, db, FakeEmbedder("model-b")).run()
+    assert sorted(db.client.get_collection("logs").get(include=[])["ids"]) == ["1", "2"]
+
+
+def test_swap_grace_must_outlast_the_follow_interval(open_db, monkeypatch):
+    monkeypatch.setattr(reembedJob, "FOLLOW_INTERVAL", 1.0)
+    config, db = open_db("model-b", swap_grace="0.5")
+    with pytest.raises(ValueError, match="swap_grace"):
+        RCAReembedJob(config, db, FakeEmbedder("model-b"))
+
+
+def test_quantized_client_sees_metadata_written_by_another(tmp_path):
+    config = make_config({"Quantized": {"path": str(tmp_path)}})
+    mine, theirs = RCAQuantizedClient(config), RCAQuantizedClient(config)
+    mine.get_or_create_collection("logs", metadata={"a": 1})
+    assert theirs.get_collection("logs").metadata == {"a": 1}
+    mine.get_collection("logs").modify(metadata={SERVED_BY_KEY: "elsewhere"})
+    assert theirs.get_collection("logs").metadata == {SERVED_BY_KEY: "elsewhere"}
+
+
+def test_quantized_delete(tmp_path):
+    collection = RCAQuantizedClient(make_config({"Quantized": {"path": str(tmp_path)}})).get_or_create_collection("c")
+    collection.add(ids=["a", "b", "c"], embeddings=[[0, 0], [1, 0], [2, 0]], metadatas=[{"k": 1}, {"k": 2}, {"k": 1}])
+    collection.delete(where={"k": 1})
+    assert collection.count() == 1
+    result = collection.query(query_embeddings=[[0, 0]], n_results=3)
+    # The deleted rows' vectors stay allocated but are never returned
+    assert result["ids"] == [["b"]]
+    collection.delete(ids=["b"])
+    assert collection.count() == 0
+    assert collection.query(query_embeddings=[[0, 0]], n_results=3)["ids"] == [[]]
@@ -0,0 +1,181 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import make_config
+from rca_ingest.tailer import RCALogTailer
+
+
+class FakeEmbedder:
+    def embed_texts(self, texts):
+        return np.zeros((len(texts), 4), dtype=np.float32)
+
+    def annotate_templates(self, documents, metadatas):
+        return metadatas
+
+
+class FakeDB:
+    collection_name = "logs"
+
+    def __init__(self):
+        self.rows = {}
+        self.writes = []
+
+    def upsert_batch(self, ids, documents, metadatas, embeddings):
+        self.writes.extend(documents)
+        self.rows.update(zip(ids, zip(documents, metadatas)))
+
+
+@pytest.fixture
+def log(tmp_path):
+    return tmp_path / "app.log"
+
+
+def tailer(log, db, idle_flush="0"):
+    config = make_config({
+        "Tailer": {"paths": str(log), "idle_flush": idle_flush, "state_path": str(log.parent / "state.json")},
+        "Ingest": {"chunk_size": "2"},
+    })
+    return RCALogTailer(config, db, FakeEmbedder())
+
+
+def append(path, text):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_reads_only_new_lines(log):
+    db = FakeDB()
+    append(log, "2024-05-01 10:00:00 INFO start\n2024-05-01 10:00:01 ERROR boom\n")
+    assert tailer(log, db).poll() == 2
+    append(log, "2024-05-01 10:00:02 WARN slow\n")
+    # A fresh tailer picks up the saved offset
+    assert tailer(log, db).poll() == 1
+    assert db.writes == ["2024-05-01 10:00:00 INFO start", "2024-05-01 10:00:01 ERROR boom",
+                         "2024-05-01 10:00:02 WARN slow"]
+    assert [m["level"] for _, m in db.rows.values()] == ["INFO", "ERROR", "WARN"]
+
+
+def test_stack_traces_stay_one_record(log):
+    db = FakeDB()
+    append(log, "ERROR failed\nTraceback (most recent call last):\n  File \"x.py\", line 1\nValueError: bad\n"
+                "INFO next\n")
+    tailer(log, db).poll()
+    assert db.writes == ["ERROR failed\nTraceback (most recent call last):\n  File \"x.py\", line 1\nValueError: bad",
+                         "INFO next"]
+
+
+def test_last_record_waits_until_the_next_one_starts(log):
+    db = FakeDB()
+    tail = tailer(log, db, idle_flush="3600")
+    append(log, "ERROR failed\n  at a\n")
+    assert tail.poll() == 0
+    append(log, "  at b\nhalf a line")
+    assert tail.poll() == 0
+    append(log, "\nINFO next\n")
+    assert tail.poll() == 2
+    assert db.writes == ["ERROR failed\n  at a\n  at b", "half a line"]
+
+
+def test_rotated_file_is_drained_before_the_new_one(log):
+    db = FakeDB()
+    tail = tailer(log, db)
+    append(log, "INFO one\n")
+    tail.poll()
+    # Written after the last poll, then rotated away
+    append(log, "INFO two\n")
+    os.rename(log, log.with_name("app.log.1"))
+    append(log, "INFO three\n")
+
+    assert tail.poll() == 2
+    assert db.writes == ["INFO one", "INFO two", "INFO three"]
+    assert {m["source"] for _, m in db.rows.values()} == {str(log.resolve())}
+    assert tail.poll() == 0
+
+
+def test_rotated_file_that_is_gone_is_skipped(log):
+    db = FakeDB()
+    tail = tailer(log, db)
+    append(log, "INFO one\n")
+    tail.poll()
+    append(log, "INFO lost\n")
+    os.rename(log, log.with_name("app.log.1"))
+    log.with_name("app.log.1").unlink()
+    append(log, "INFO three\n")
+
+    assert tail.poll() == 1
+    assert db.writes == ["INFO one", "INFO three"]
+
+
+def test_truncated_file_is_read_from_the_start(log):
+    db = FakeDB()
+    tail = tailer(log, db)
+    append(log, "INFO a long first line\nINFO two\n")
+    tail.poll()
+    # copytruncate, then fewer bytes than were read
+    log.write_text("INFO new\n", encoding="utf-8")
+    assert tail.poll() == 1
+    assert db.writes[-1] == "INFO new"
+
+
+def test_rewritten_file_longer_than_the_offset_is_read_from_the_start(log):
+    db = FakeDB()
+    tail = tailer(log, db)
+    append(log, "INFO one\n")
+    tail.poll()
+    # Same inode, already past the old offset again by the next poll
+    with open(log, "r+", encoding="utf-8") as f:
+        f.truncate(0)
+        f.write("WARN other\nINFO more\n")
+    assert tail.poll() == 2
+    assert db.writes == ["INFO one", "WARN other", "INFO more"]
+
+
+def test_reading_again_upserts_the_same_ids(log):
+    db = FakeDB()
+    append(log, "INFO one\nINFO two\n")
+    tailer(log, db).poll()
+    (log.parent / "state.json").unlink()
+    tailer(log, db).poll()
+    assert len(db.writes) == 4
+    assert len(db.rows) == 2
+
+
+def test_json_lines_become_metadata(log):
+    db = FakeDB()
+    append(log, '{"message": "paid", "level": "warning", "service": "billing", "order": {"id": 7}}\n')
+    tailer(log, db).poll()
+    [(document, metadata)] = db.rows.values()
+    assert document == "paid"
+    assert (metadata["level"], metadata["service"], metadata["order.id"]) == ("WARN", "billing", 7)
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_rotated_names_matched_by_the_glob_are_not_read_again(log, monkeypatch, reverse):
+    db = FakeDB()
+    config = make_config({
+        "Tailer": {"paths": str(log) + "*", "idle_flush": "0", "state_path": str(log.parent / "state.json")},
+    })
+    tail = RCALogTailer(config, db, FakeEmbedder())
+    if reverse:
+        # app.log.2, app.log.1, app.log: rotated names come up before the file they were rotated from
+        paths = tail.paths
+        monkeypatch.setattr(tail, "paths", lambda patterns=None: paths(patterns)[::-1])
+
+    def rotate():
+        for n in (2, 1):
+            older = log.with_name(f"app.log.{n - 1}" if n > 1 else "app.log")
+            if older.exists():
+                os.rename(older, log.with_name(f"app.log.{n}"))
+
+    append(log, "INFO one\n")
+    tail.poll()
+    rotate()
+    append(log, "INFO two\n")
+    tail.poll()
+    rotate()
+    append(log, "INFO three\n")
+    tail.poll()
+    assert tail.poll() == 0
+    assert db.writes == ["INFO one", "INFO two", "INFO three"]
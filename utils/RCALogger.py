@@ -1,48 +1,251 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
 from pathlib import Path
-from rich.logging import RichHandler
+
+LOGS_DIR = Path(__file__).parent.parent / "Logs"
+
+FILE_FORMAT = logging.Formatter(
+    fmt='[%(asctime)s] [%(levelname)-8s] %(message)s (%(filename)s:%(lineno)d)',
+    datefmt='%y-%m-%d %H:%M:%S'
+)
+
+# [Logging] defaults, the behaviour before the section existed
+DEFAULTS = {
+    "level": "DEBUG",
+    "sinks": "console, files, global",
+    "mode": "queue",
+    "dir": "",
+    "rate_limit": "0",
+    "rate_window": "60",
+}
+SINKS = ("console", "files", "global")
+# Per-logger files this process already started, reopened for appending when the pipeline is rebuilt
+_STARTED_FILES = set()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `limit` records per call site (file:line) through every
+    `window` seconds, so a log line inside a hot loop can't flood the sinks.
+    The first record after a window with drops says how many were dropped.
+    """
+
+    def __init__(self, limit: int, window: float):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.sites = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.levelno >= logging.ERROR:
+            return True
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            started, count, dropped = self.sites.get(site, (now, 0, 0))
+            if now - started >= self.window:
+                started, count = now, 0
+                if dropped:
+                    record.msg = f"{record.getMessage()} (+{dropped} similar messages suppressed)"
+                    record.args = None
+                    dropped = 0
+            count += 1
+            keep = count <= self.limit
+            self.sites[site] = (started, count, dropped + (not keep))
+        return keep
+
+
+class PerLoggerFileHandler(logging.Handler):
+    """
+    Routes each record to Logs/<logger name>.log. A file is truncated the first
+    time this process writes to it and appended to after that, so rebuilding
+    the pipeline (e.g. once config.ini is read) keeps what was logged before.
+    """
+
+    def __init__(self, directory: Path):
+        super().__init__()
+        self.directory = directory
+        self.files = {}
+
+    def emit(self, record: logging.LogRecord):
+        handler = self.files.get(record.name)
+        if handler is None:
+            path = (self.directory / f"{record.name}.log").resolve()
+            handler = logging.FileHandler(path, mode='a' if path in _STARTED_FILES else 'w', encoding='utf-8')
+            _STARTED_FILES.add(path)
+            handler.setFormatter(FILE_FORMAT)
+            self.files[record.name] = handler
+        handler.emit(record)
+
+    def close(self):
+        for handler in self.files.values():
+            handler.close()
+        super().close()
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues the record itself. The stock QueueHandler copies and formats it
+    first, which costs the logging thread more than writing it did; here the
+    sinks format on the listener thread, and exc_info survives for Rich.
+    """
+
+    def prepare(self, record: logging.LogRecord):
+        return record
+
+
+class FanOutHandler(logging.Handler):
+    """Synchronous mode: hand each record to every sink in the calling thread."""
+
+    def __init__(self, sinks):
+        super().__init__()
+        self.sinks = sinks
+
+    def emit(self, record: logging.LogRecord):
+        for sink in self.sinks:
+            if record.levelno >= sink.level:
+                sink.handle(record)
+
+
+def console_handler():
+    # Logs go to stderr so stdout stays clean for command output (NDJSON);
+    # Rich formatting only when a person is watching the terminal
+    if sys.stderr.isatty():
+        from rich.console import Console
+        from rich.logging import RichHandler
+
+        return RichHandler(
+            console=Console(stderr=True),
+            rich_tracebacks=True,
+            show_time=True,
+            show_level=True,
+            show_path=True,  # ✅ This makes the file paths clickable in supported terminals (like VSCode/PyCharm)
+            markup=True
+        )
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(FILE_FORMAT)
+    return handler
+
+
+class LogPipeline:
+    """
+    The process-wide logging setup every `setup_logger` logger shares.
+
+    Loggers get one entry handler. In queue mode it only puts the record on a
+    queue and a QueueListener thread does the console rendering and file
+    writes, so hot paths never wait on I/O. Sinks are built once per process
+    and rebuilt only when `configure_logging` changes the settings.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.settings = None
+        self.entry = None
+        self.listener = None
+        self.sinks = []
+        self.loggers = set()
+        self.level = logging.DEBUG
+        atexit.register(self.stop)
+
+    def build(self, settings: dict):
+        level = logging.getLevelName(settings["level"].strip().upper())
+        if not isinstance(level, int):
+            raise ValueError(f"❌ [Logging] level must be a logging level name, got {settings['level']}")
+        sinks = [s.strip().lower() for s in settings["sinks"].split(",") if s.strip()]
+        unknown = set(sinks) - set(SINKS)
+        if unknown:
+            raise ValueError(f"❌ [Logging] sinks must be among {list(SINKS)}, got {sorted(unknown)}")
+        mode = settings["mode"].strip().lower()
+        if mode not in ("queue", "sync"):
+            raise ValueError(f"❌ [Logging] mode must be queue or sync, got {mode}")
+
+        directory = Path(settings["dir"].strip()) if settings["dir"].strip() else LOGS_DIR
+        handlers = []
+        if "files" in sinks or "global" in sinks:
+            directory.mkdir(parents=True, exist_ok=True)
+        if "files" in sinks:
+            handlers.append(PerLoggerFileHandler(directory))
+        if "global" in sinks:
+            handler = logging.FileHandler(directory / "log.log", mode='a', encoding='utf-8')
+            handler.setFormatter(FILE_FORMAT)
+            handlers.append(handler)
+        if "console" in sinks:
+            handlers.append(console_handler())
+        for handler in handlers:
+            handler.setLevel(level)
+
+        listener = None
+        if mode == "queue":
+            records = queue.SimpleQueue()
+            entry = RecordQueueHandler(records)
+            listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+            listener.start()
+        else:
+            entry = FanOutHandler(handlers)
+        entry.addFilter(RateLimitFilter(int(settings["rate_limit"]), float(settings["rate_window"])))
+        return level, entry, listener, handlers
+
+    def apply(self, settings: dict):
+        with self.lock:
+            if settings == self.settings:
+                return
+            level, entry, listener, sinks = self.build(settings)
+            old_entry, old_listener, old_sinks = self.entry, self.listener, self.sinks
+            self.settings, self.level, self.entry, self.listener, self.sinks = settings, level, entry, listener, sinks
+            for name in self.loggers:
+                self.attach(logging.getLogger(name))
+        self.close(old_entry, old_listener, old_sinks)
+
+    def attach(self, logger: logging.Logger):
+        logger.handlers = [self.entry]
+        logger.setLevel(self.level)
+        logger.propagate = False
+
+    def logger(self, name: str) -> logging.Logger:
+        if self.entry is None:
+            self.apply(dict(DEFAULTS))
+        logger = logging.getLogger(name)
+        with self.lock:
+            self.loggers.add(name)
+            if logger.handlers != [self.entry]:
+                self.attach(logger)
+        return logger
+
+    @staticmethod
+    def close(entry, listener, sinks):
+        if listener is not None:
+            # Drains what is still queued before the sinks close
+            listener.stop()
+        for handler in sinks:
+            handler.close()
+        if entry is not None:
+            entry.close()
+
+    def stop(self):
+        with self.lock:
+            entry, listener, sinks = self.entry, self.listener, self.sinks
+            self.entry, self.listener, self.sinks, self.settings = None, None, [], None
+        self.close(entry, listener, sinks)
+
+
+PIPELINE = LogPipeline()
+
+
+def configure_logging(config):
+    """Apply [Logging] (level, sinks, queue/sync mode, rate limit) to every RCA logger in this process."""
+    settings = {key: config.get("Logging", key, fallback=value) for key, value in DEFAULTS.items()}
+    PIPELINE.apply(settings)
+
 
 def setup_logger(name: str):
-    # Create logger
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
-
-    # Prevent duplicate handlers
-    if logger.hasHandlers():
-        logger.handlers.clear()
-
-    # --- Logging folder setup ---
-    logging_folder = Path(__file__).parent.parent / "Logs"
-    logging_folder.mkdir(parents=True, exist_ok=True)
-
-    # --- File Handlers ---
-    file_handler = logging.FileHandler(logging_folder / f"{name}.log", mode='w', encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
-
-    global_file_handler = logging.FileHandler(logging_folder / "log.log", mode='a', encoding='utf-8')
-    global_file_handler.setLevel(logging.DEBUG)
-
-    # --- Formatter for file handlers ---
-    file_formatter = logging.Formatter(
-        fmt='[%(asctime)s] [%(levelname)-8s] %(message)s (%(filename)s:%(lineno)d)',
-        datefmt='%y-%m-%d %H:%M:%S'
-    )
-    file_handler.setFormatter(file_formatter)
-    global_file_handler.setFormatter(file_formatter)
-
-    # --- Rich Console Handler ---
-    console_handler = RichHandler(
-        rich_tracebacks=True,
-        show_time=True,
-        show_level=True,
-        show_path=True,  # ✅ This makes the file paths clickable in supported terminals (like VSCode/PyCharm)
-        markup=True
-    )
-    console_handler.setLevel(logging.DEBUG)
-
-    # --- Add all handlers ---
-    logger.addHandler(file_handler)
-    logger.addHandler(global_file_handler)
-    logger.addHandler(console_handler)
-
-    return logger
+    """
+    Logger `name` on the shared pipeline. Cheap to call again: handlers and
+    files are set up once per process, not per call.
+    """
+    return PIPELINE.logger(name)
@@ -0,0 +1,330 @@
+import bisect
+import contextlib
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .RCALogger import setup_logger
+
+# Histogram bucket upper bounds in seconds, Prometheus' defaults stretched to a minute
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# [Metrics] defaults: off, so the instrumented code costs one no-op call per stage
+DEFAULTS = {
+    "enabled": "false",
+    "exporter": "none",
+    "prometheus_port": "0",
+    "prometheus_file": "",
+    "otlp_endpoint": "http://localhost:4317",
+    "service_name": "openlogrca",
+    "summary": "true",
+}
+NOOP_SPAN = contextlib.nullcontext()
+
+
+def metric_name(name: str, suffix: str):
+    return "openlogrca_" + re.sub(r"[^a-zA-Z0-9_]", "_", name) + suffix
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float):
+        """Estimated from the buckets, linear inside the bucket it falls in (narrowed to the observed min/max)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if seen + n >= rank and n:
+                low = max(BUCKETS[i - 1] if i else 0.0, self.min)
+                high = min(BUCKETS[i] if i < len(BUCKETS) else self.max, self.max)
+                return low + (high - low) * (rank - seen) / n
+            seen += n
+        return self.max
+
+
+class Span:
+    """Times a stage into its histogram, and into an OpenTelemetry span when tracing is exported."""
+
+    __slots__ = ("metrics", "name", "labels", "started", "otel")
+
+    def __init__(self, metrics, name: str, labels: dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.otel = None
+
+    def __enter__(self):
+        if self.metrics.tracer is not None:
+            self.otel = self.metrics.tracer.start_as_current_span(self.name, attributes=self.labels)
+            self.otel.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        if self.otel is not None:
+            self.otel.__exit__(*exc)
+        return False
+
+
+class RCAMetrics:
+    """
+    In-process counters and latency histograms for the ingest and query
+    stages, exposed in Prometheus text format (HTTP /metrics or a textfile for
+    node_exporter) or pushed over OTLP together with trace spans.
+    """
+
+    enabled = True
+
+    def __init__(self, settings: dict):
+        self.logger = setup_logger("Metrics")
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self.tracer = None
+        self.meter = None
+        self.instruments = {}
+        self.server = None
+
+        exporter = settings["exporter"].strip().lower()
+        if exporter not in ("none", "prometheus", "otlp"):
+            raise ValueError(f"❌ [Metrics] exporter must be none, prometheus or otlp, got {exporter}")
+        if exporter == "prometheus" and int(settings["prometheus_port"]):
+            self.serve(int(settings["prometheus_port"]))
+        if exporter == "otlp":
+            self.start_otlp(settings["otlp_endpoint"].strip(), settings["service_name"].strip())
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        if self.meter is not None:
+            self.instrument(name, "counter").add(value, labels)
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+        if self.meter is not None:
+            self.instrument(name, "histogram").record(seconds, labels)
+
+    def span(self, name: str, **labels):
+        return Span(self, name, labels)
+
+    def instrument(self, name: str, kind: str):
+        key = (name, kind)
+        instrument = self.instruments.get(key)
+        if instrument is None:
+            if kind == "counter":
+                instrument = self.meter.create_counter(metric_name(name, "_total"))
+            else:
+                instrument = self.meter.create_histogram(metric_name(name, "_seconds"), unit="s")
+            self.instruments[key] = instrument
+        return instrument
+
+    def start_otlp(self, endpoint: str, service_name: str):
+        try:
+            from opentelemetry import metrics, trace
+            from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.metrics import MeterProvider
+            from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        except ImportError as e:
+            raise ValueError(f"❌ [Metrics] exporter = otlp needs opentelemetry-sdk and "
+                             f"opentelemetry-exporter-otlp-proto-grpc: {e}")
+
+        resource = Resource.create({"service.name": service_name})
+        self.tracer_provider = TracerProvider(resource=resource)
+        self.tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint, insecure=True)))
+        self.meter_provider = MeterProvider(
+            resource=resource,
+            metric_readers=[PeriodicExportingMetricReader(OTLPMetricExporter(endpoint=endpoint, insecure=True))]
+        )
+        trace.set_tracer_provider(self.tracer_provider)
+        metrics.set_meter_provider(self.meter_provider)
+        self.tracer = self.tracer_provider.get_tracer("openlogrca")
+        self.meter = self.meter_provider.get_meter("openlogrca")
+        self.logger.info(f"📡 Exporting metrics and spans over OTLP to {endpoint}")
+
+    def serve(self, port: int):
+        """Prometheus scrape endpoint on http://0.0.0.0:<port>/metrics in a daemon thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        self.logger.info(f"📈 Prometheus metrics on :{port}/metrics")
+
+    def prometheus_text(self):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            snapshots = [(key, list(h.buckets), h.count, h.sum) for key, h in histograms]
+
+        typed = set()
+        for (name, labels), value in counters:
+            full = metric_name(name, "_total")
+            if full not in typed:
+                lines.append(f"# TYPE {full} counter")
+                typed.add(full)
+            lines.append(f"{full}{label_text(dict(labels))} {value}")
+
+        for (name, labels), buckets, count, total in snapshots:
+            full = metric_name(name, "_seconds")
+            if full not in typed:
+                lines.append(f"# TYPE {full} histogram")
+                typed.add(full)
+            labels = dict(labels)
+            cumulative = 0
+            for bound, n in zip(list(BUCKETS) + ["+Inf"], buckets):
+                cumulative += n
+                lines.append(f"{full}_bucket{label_text(dict(labels, le=bound))} {cumulative}")
+            lines.append(f"{full}_sum{label_text(labels)} {total}")
+            lines.append(f"{full}_count{label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Per-stage rows (count, total and latency quantiles in ms) plus the counters."""
+        with self.lock:
+            stages = [
+                {
+                    "stage": name + label_text(dict(labels)),
+                    "count": h.count,
+                    "total_s": round(h.sum, 3),
+                    "mean_ms": round(1000 * h.sum / h.count, 3) if h.count else 0,
+                    "p50_ms": round(1000 * h.quantile(0.5), 3),
+                    "p95_ms": round(1000 * h.quantile(0.95), 3),
+                    "max_ms": round(1000 * h.max, 3),
+                }
+                for (name, labels), h in sorted(self.histograms.items(), key=lambda item: -item[1].sum)
+            ]
+            counters = {name + label_text(dict(labels)): value for (name, labels), value in sorted(self.counters.items())}
+        return {"wall_s": round(time.time() - self.started, 3), "stages": stages, "counters": counters}
+
+    def print_summary(self, file=None):
+        report = self.summary()
+        file = file or sys.stderr
+        print(f"\n⏱️  Stage timings over {report['wall_s']}s", file=file)
+        print(f"{'stage':<32}{'count':>9}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}", file=file)
+        for row in report["stages"]:
+            print(f"{row['stage']:<32}{row['count']:>9}{row['total_s']:>10}{row['mean_ms']:>10}"
+                  f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['max_ms']:>10}", file=file)
+        for name, value in report["counters"].items():
+            print(f"{name:<32}{value:>9}", file=file)
+
+    def finish(self):
+        """End of a run: write the textfile, flush OTLP, print the summary when asked to."""
+        path = self.settings["prometheus_file"].strip()
+        if path:
+            tmp = Path(path).with_suffix(".tmp")
+            tmp.write_text(self.prometheus_text(), encoding="utf-8")
+            tmp.replace(path)
+        if self.meter is not None:
+            self.meter_provider.force_flush()
+            self.tracer_provider.force_flush()
+        if self.settings["summary"].strip().lower() in ("1", "true", "yes", "on") and self.histograms:
+            self.print_summary()
+
+
+class NoopMetrics:
+    """Stand-in while [Metrics] is off: every call returns at once."""
+
+    enabled = False
+
+    def count(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, seconds, **labels):
+        pass
+
+    def span(self, name, **labels):
+        return NOOP_SPAN
+
+    def prometheus_text(self):
+        return ""
+
+    def finish(self):
+        pass
+
+
+ACTIVE = NoopMetrics()
+
+
+def configure_metrics(config):
+    """Switch the process to [Metrics] settings; off unless `enabled = true`."""
+    global ACTIVE
+    settings = {key: config.get("Metrics", key, fallback=value) for key, value in DEFAULTS.items()}
+    if getattr(ACTIVE, "settings", None) == settings:
+        return ACTIVE
+    if getattr(ACTIVE, "server", None) is not None:
+        ACTIVE.server.shutdown()
+    if settings["enabled"].strip().lower() not in ("1", "true", "yes", "on"):
+        ACTIVE = NoopMetrics()
+    else:
+        ACTIVE = RCAMetrics(settings)
+    return ACTIVE
+
+
+def get_metrics():
+    return ACTIVE
+
+
+def span(name: str, **labels):
+    """`with span("db.write"):` times a stage; a shared null context when metrics are off."""
+    return ACTIVE.span(name, **labels)
+
+
+def count(name: str, value: float = 1, **labels):
+    ACTIVE.count(name, value, **labels)
+
+
+def observe(name: str, seconds: float, **labels):
+    ACTIVE.observe(name, seconds, **labels)
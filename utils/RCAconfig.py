@@ -1,7 +1,7 @@
 import configparser
 from pathlib import Path
 
-from utils import setup_logger
+from utils import setup_logger, configure_logging, configure_metrics
 
 
 class Readconfig:
@@ -15,6 +15,9 @@ class Readconfig:
 
     def read(self):
         readPath = self.config.read(self.path)
+        # [Logging] applies to the whole process from here on
+        configure_logging(self.config)
+        configure_metrics(self.config)
         self.logger.info(f"Successfully read config file from path: {readPath}")
         return self.config
 
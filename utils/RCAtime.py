@@ -0,0 +1,86 @@
+import re
+from datetime import datetime, timezone
+
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+# Timestamps as they show up inside raw log lines, with how to parse each
+LOG_TIMESTAMPS = [
+    # 2025-01-02T10:00:00.123Z, 2025-01-02 10:00:00,123 +02:00
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), None),
+    # Apache/nginx: 10/Oct/2000:13:55:36 -0700
+    (re.compile(r"\d{1,2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2}(?: [+-]\d{4})?"), ("%d/%b/%Y:%H:%M:%S %z", "%d/%b/%Y:%H:%M:%S")),
+    # Syslog: Jan  2 10:00:00, no year
+    (re.compile(r"\b\w{3} +\d{1,2} \d{2}:\d{2}:\d{2}\b"), ("%b %d %H:%M:%S",)),
+]
+
+
+def parse_timestamp(value):
+    """
+    Best-effort conversion of a log timestamp to epoch seconds (UTC).
+    Accepts epoch seconds/milliseconds as numbers or strings and ISO 8601
+    strings; naive times are taken as UTC. Returns None if it can't parse.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+
+    if isinstance(value, (int, float)):
+        # Anything past year 5000 in seconds is really milliseconds
+        return value / 1000 if value > 1e11 else float(value)
+
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return None
+        try:
+            return parse_timestamp(float(text))
+        except ValueError:
+            pass
+        try:
+            parsed = datetime.fromisoformat(text.replace("Z", "+00:00").replace(",", "."))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+    return None
+
+
+def find_timestamp(text: str):
+    """
+    Epoch seconds of the first timestamp found in a raw log line, None if there
+    is none. Syslog stamps carry no year and are taken as the current one (UTC).
+    """
+    for pattern, formats in LOG_TIMESTAMPS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        if formats is None:
+            ts = parse_timestamp(match.group(0))
+            if ts is not None:
+                return ts
+            continue
+        stamp = " ".join(match.group(0).split())
+        for fmt in formats:
+            if "%Y" not in fmt:
+                # Parse with the year in place, Feb 29 doesn't exist in the default 1900
+                stamp, fmt = f"{datetime.now(timezone.utc).year} {stamp}", f"%Y {fmt}"
+            try:
+                parsed = datetime.strptime(stamp, fmt)
+            except ValueError:
+                continue
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed.timestamp()
+    return None
+
+
+def parse_window(text: str):
+    """Turn a relative window like '15m', '1h' or '2d' into seconds, None if blank."""
+    text = (text or "").strip().lower()
+    if not text:
+        return None
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([smhdw])", text)
+    if not match:
+        raise ValueError(f"❌ Invalid time window '{text}', use e.g. 30s, 15m, 1h, 2d")
+    return float(match.group(1)) * WINDOW_UNITS[match.group(2)]
@@ -1,2 +1,4 @@
-from .RCALogger import setup_logger
-from .RCAconfig import Readconfig
\ No newline at end of file
+from .RCALogger import setup_logger, configure_logging
+from .RCAMetrics import configure_metrics, get_metrics
+from .RCAconfig import Readconfig
+from .RCAtime import parse_timestamp, parse_window, find_timestamp
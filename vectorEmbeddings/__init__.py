@@ -1,3 +1,21 @@
-from .setUpDB import RCAChroma, RCAChromaPersistent, RCAChromaHttp
-from .ingestDB import Document
-from .embedding import RCAEmbedding
\ No newline at end of file
+# Exports are imported on first access, so e.g. the embedder can be used
+# without paying for the chromadb import
+_EXPORTS = {
+    "RCAChroma": "setUpDB",
+    "RCAChromaPersistent": "setUpDB",
+    "RCAChromaHttp": "setUpDB",
+    "Document": "ingestDB",
+    "RCAEmbedding": "embedding",
+    "RCAAsyncEmbedding": "embedding",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,76 @@
+import asyncio
+
+from utils import setup_logger
+
+_DONE = object()
+
+
+async def async_ingest(db, embedder, chunks, embed_tasks: int = 2, write_tasks: int = 2,
+                       queue_size: int = 4, on_written=None):
+    """
+    Embed and write (ids, documents, metadatas) chunks with asyncio.
+
+    `embed_tasks` chunks are embedded and `write_tasks` chunks are written at
+    once. Embedded chunks wait in a queue of `queue_size`, so a slow Chroma
+    server throttles embedding instead of piling up vectors in memory.
+    Returns the number of documents written.
+    """
+    logger = setup_logger("AsyncIngest")
+    embedded = asyncio.Queue(maxsize=queue_size)
+    chunk_iter = iter(chunks)
+    read_lock = asyncio.Lock()
+    written = 0
+
+    async def next_chunk():
+        # Chunks come from a blocking file reader, keep it off the event loop
+        async with read_lock:
+            return await asyncio.to_thread(next, chunk_iter, None)
+
+    async def embed_worker():
+        while (chunk := await next_chunk()) is not None:
+            ids, documents, metadatas = chunk
+            embeddings = await embedder.aembed_texts(documents)
+            metadatas = embedder.annotate_templates(documents, metadatas)
+            await embedded.put((ids, documents, metadatas, embeddings))
+
+    async def write_worker():
+        nonlocal written
+        while (item := await embedded.get()) is not _DONE:
+            await db.add_asyncBatch(*item)
+            written += len(item[0])
+            if on_written:
+                on_written(len(item[0]), written)
+
+    async def close_queue(producers):
+        await asyncio.gather(*producers)
+        for _ in range(write_tasks):
+            await embedded.put(_DONE)
+
+    # A failing task cancels the rest instead of leaving them blocked on the queue
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(write_tasks):
+            tg.create_task(write_worker())
+        producers = [tg.create_task(embed_worker()) for _ in range(embed_tasks)]
+        tg.create_task(close_queue(producers))
+
+    logger.info(f"✅ Async ingest wrote {written} documents")
+    return written
+
+
+async def async_query(db, embedder, query_texts, n_results: int = 10, group_size: int = 16, concurrency: int = 4):
+    """Embed `query_texts` once and fan them out to Chroma in groups, merging the results in order."""
+    query_embeddings = await embedder.aembed_texts(query_texts)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(start):
+        async with semaphore:
+            return await db.query_async(query_embeddings[start:start + group_size], n_results=n_results)
+
+    results = await asyncio.gather(*(run(i) for i in range(0, len(query_texts), group_size)))
+
+    merged = {}
+    for result in results:
+        for key in ("ids", "documents", "metadatas", "distances"):
+            if result.get(key) is not None:
+                merged.setdefault(key, []).extend(result[key])
+    return merged
@@ -1,36 +1,316 @@
 import asyncio
 import configparser
+import time
 
 from vectorEmbeddings import RCAChromaPersistent, RCAChromaHttp
 from utils import Readconfig, setup_logger
+from utils.RCAMetrics import count, span
 from vectorEmbeddings.setUpDB import RCAChromaHttpAsync
+from vectorEmbeddings.lexicalIndex import open_lexical_index
+from vectorEmbeddings.localEmbedding import embedding_model_id
+from vectorEmbeddings.metadataIndex import open_metadata_index
+from vectorEmbeddings.quantStore import RCAQuantizedClient
+
+# Metadata field holding a document's timestamp as epoch seconds
+TIMESTAMP_FIELD = "ts_epoch"
+# What a query returns unless the caller projects it down
+QUERY_INCLUDE = ("documents", "metadatas", "distances")
+# Collection metadata keys recording what its vectors were embedded with
+MODEL_KEY = "embedding_model"
+DIM_KEY = "embedding_dim"
+# Set on a collection whose rows were re-embedded into another one: the name of the one serving it now
+SERVED_BY_KEY = "served_by"
+# Seconds between checks whether a re-embedding switched an open collection
+FOLLOW_INTERVAL = 1.0
 
 
-# TODO: Add async client compatibility
-
 class CreateVectorDB:
 
     def __init__(self, config: configparser.ConfigParser):
         self.collections = None
+        self.name = None
         self.config = config
         self.client = None
+        self.max_batch_size = None
+        # Bumped on every write so result caches know earlier answers are stale
+        self.generation = 0
+        # BM25 index kept in step with every write when [Hybrid] is enabled
+        self.lexical = None
+        # Typed metadata and its secondary index when [Metadata] is enabled
+        self.metadata_index = None
+        # Model the configured embedder writes and queries with
+        self.model = embedding_model_id(config)
+        # When each collection name was last checked for a re-embedding switch
+        self.followed = {}
+
+    def get_max_batch_size(self):
+        if self.max_batch_size is None:
+            try:
+                self.max_batch_size = self.client.get_max_batch_size()
+            except AttributeError:
+                self.max_batch_size = 5000
+        return self.max_batch_size
+
+    def add_batch(self, ids, documents, metadatas, embeddings):
+        """Add one ingest chunk, split so no request exceeds Chroma's max batch size."""
+        return self._write_batch("add", ids, documents, metadatas, embeddings)
+
+    def upsert_batch(self, ids, documents, metadatas, embeddings):
+        """Like add_batch but overwrites ids that already exist instead of failing."""
+        return self._write_batch("upsert", ids, documents, metadatas, embeddings)
+
+    def _write_batch(self, method: str, ids, documents, metadatas, embeddings):
+        collection = self.current()
+        self.ensure_model(collection, embeddings)
+        write = getattr(collection, method)
+        metadatas = self.coerce_metadata(metadatas)
+        step = self.get_max_batch_size()
+        with span("db.write"):
+            for i in range(0, len(ids), step):
+                write(
+                    ids=ids[i:i + step],
+                    documents=documents[i:i + step],
+                    metadatas=metadatas[i:i + step],
+                    embeddings=embeddings[i:i + step]
+                )
+        count("db.rows", len(ids))
+        self.index_lexical(ids, documents, metadatas)
+        self.index_metadata(ids, metadatas)
+        self.generation += 1
+
+        return ids
+
+    def index_lexical(self, ids, documents, metadatas):
+        if self.lexical is not None:
+            with span("lexical.write"):
+                self.lexical.add(ids, documents, metadatas)
+
+    def model_update(self, collection, embeddings):
+        """
+        Raise if `collection` was embedded with another model or dimension.
+        Returns the collection metadata that records this model and
+        dimension when it has none yet (its first write), else None.
+        """
+        recorded = collection.metadata or {}
+        model, dim = recorded.get(MODEL_KEY), recorded.get(DIM_KEY)
+        if model is not None and model != self.model:
+            raise ValueError(f"❌ Collection {collection.name} was embedded with {model}, [Embedding] is {self.model}. "
+                             f"Migrate it with `openlogrca reembed -c {self.collection_name}` or switch the model back")
+        width = len(embeddings[0]) if embeddings is not None and len(embeddings) else None
+        if width is not None and dim is not None and width != dim:
+            raise ValueError(f"❌ Collection {collection.name} holds {dim}-d vectors, {self.model} gives {width}-d ones")
+        if width is not None and (model is None or dim is None):
+            return dict(recorded, **{MODEL_KEY: self.model, DIM_KEY: width})
+        return None
+
+    def ensure_model(self, collection, embeddings):
+        """Model check before a write; the first write records the model in the collection's metadata."""
+        update = self.model_update(collection, embeddings)
+        if update is not None:
+            collection.modify(metadata=update)
+
+    def check_model(self, collection, embeddings):
+        """Model check before a query; collections from before models were recorded are let through."""
+        self.model_update(collection, embeddings)
+
+    def coerce_metadata(self, metadatas):
+        """Declared metadata fields typed as [Metadata] says, before they are stored."""
+        if self.metadata_index is None:
+            return metadatas
+        return self.metadata_index.schema.coerce_all(metadatas)
+
+    def index_metadata(self, ids, metadatas):
+        if self.metadata_index is not None:
+            with span("metadata.write"):
+                self.metadata_index.add(ids, metadatas)
+
+    def prefilter(self, where: dict = None, start=None, end=None):
+        """
+        (candidates, where): a selective filter on indexed metadata becomes
+        the [(id, ts)] the vector search is limited to, and `where` keeps
+        only what Chroma still has to check. candidates is None when the
+        search should run unrestricted with the whole (coerced) `where`.
+        """
+        if self.metadata_index is None or not where:
+            return None, where
+        where = self.metadata_index.schema.coerce_where(where)
+        with span("query.prefilter"):
+            candidates, where = self.metadata_index.candidates(where, start, end)
+        count("query.prefiltered" if candidates is not None else "query.unfiltered")
+        return candidates, where
+
+    def get_records(self, ids, where: dict = None, start=None, end=None, payloads: bool = True):
+        """
+        {id: (document, metadata)} for those of `ids` that are stored and pass the filters.
+        Without `payloads` only which ids pass is fetched, as {id: None}.
+        """
+        if self.metadata_index is not None:
+            where = self.metadata_index.schema.coerce_where(where)
+        include = ["documents", "metadatas"] if payloads else []
+        records = {}
+        step = self.get_max_batch_size()
+        ids = list(ids)
+        for i in range(0, len(ids), step):
+            got = self.current().get(ids=ids[i:i + step], where=time_where(where, start, end), include=include)
+            records.update(zip(got["ids"], zip(got["documents"], got["metadatas"])) if payloads
+                           else dict.fromkeys(got["ids"]))
+        return records
+
+    def source_collections(self, start=None):
+        """(name, collection) pairs that can hold documents newer than `start`."""
+        return [(self.name, self.current())]
+
+    def resolve(self, collection):
+        """The collection serving `collection`'s name: itself, or the re-embedded one its served_by names."""
+        target = (collection.metadata or {}).get(SERVED_BY_KEY)
+        return self.client.get_collection(target) if target else collection
+
+    def follow(self, name: str, collection):
+        """
+        `collection`, or the one serving `name` now if a re-embedding switched
+        it since, possibly from another process. The name is looked up again
+        at most every FOLLOW_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        if now - self.followed.get(name, 0.0) < FOLLOW_INTERVAL:
+            return collection
+        self.followed[name] = now
+        current = self.resolve(self.client.get_collection(name))
+        if current.name != collection.name:
+            self.generation += 1
+        return current
+
+    def current(self):
+        self.collections = self.follow(self.name, self.collections)
+        return self.collections
+
+    def replace_collection(self, name: str, collection):
+        """Serve `name` from `collection` from now on, e.g. after a re-embedding swap."""
+        self.collections = collection
+        self.followed[name] = time.monotonic()
+        self.generation += 1
+
+    def existing_ids(self, ids):
+        """The subset of `ids` already stored, looked up in max-batch-size `get` calls without payloads."""
+        found = set()
+        step = self.get_max_batch_size()
+        ids = list(ids)
+        for i in range(0, len(ids), step):
+            found.update(self.current().get(ids=ids[i:i + step], include=[])["ids"])
+        return found
 
     def insert(self, log_id, message, metadata):
-        self.collections.add(
+        [metadata] = self.coerce_metadata([metadata])
+        self.current().add(
             ids=[log_id],
             documents=[message],
             metadatas=[metadata]
         )
+        self.index_lexical([log_id], [message], [metadata])
+        self.index_metadata([log_id], [metadata])
+        self.generation += 1
 
         return [log_id]
-    # TODO add n_results to ini file and enable where query
-    def query(self, queryText: list):
-        return self.collections.query(
+
+    def query(self, queryText: list, n_results: int = 10, where: dict = None):
+        candidates, where = self.prefilter(where)
+        if candidates is not None and not candidates:
+            return empty_result(len(queryText))
+        return self.current().query(
             query_texts=queryText,
-            n_results=10,
-            # where=where or {}
+            ids=[id_ for id_, _ in candidates] if candidates is not None else None,
+            n_results=n_results,
+            where=where or None
+        )
+
+    def query_embeddings(self, embeddings, n_results: int = 10, where: dict = None, start=None, end=None,
+                         include=QUERY_INCLUDE):
+        """Chroma query; `include=["distances"]` returns ids and distances only, without the payloads."""
+        collection = self.current()
+        self.check_model(collection, embeddings)
+        candidates, where = self.prefilter(where, start, end)
+        if candidates is not None and not candidates:
+            return empty_result(len(embeddings), include)
+        return collection.query(
+            query_embeddings=embeddings,
+            ids=[id_ for id_, _ in candidates] if candidates is not None else None,
+            n_results=n_results,
+            where=time_where(where, start, end),
+            include=list(include)
         )
 
+    @property
+    def collection_name(self):
+        return self.name
+
+    def collection_configuration(self, name: str):
+        return hnsw_configuration(self.config, name)
+
+    def get_collection(self, name: str):
+        self.name = name
+        self.collections = self.resolve(self.client.get_or_create_collection(
+            name=name,
+            configuration=self.collection_configuration(name)
+        ))
+        self.followed[name] = time.monotonic()
+        apply_ef_search(self.collections, self.collection_configuration(name))
+        self.lexical = open_lexical_index(self.config, name)
+        self.metadata_index = open_metadata_index(self.config, name)
+
+
+HNSW_KEYS = {"space": str, "ef_construction": int, "ef_search": int, "max_neighbors": int}
+
+
+def hnsw_configuration(config: configparser.ConfigParser, name: str):
+    """
+    HNSW settings for collection `name`: [HNSW] holds the defaults and
+    [HNSW.<name>] overrides them. Returns None when nothing is configured.
+    Time partitions (`<name>__h2025...`) use the settings of their base name.
+    """
+    hnsw = {}
+    for section in ("HNSW", f"HNSW.{name.split('__')[0]}", f"HNSW.{name}"):
+        if config.has_section(section):
+            for key, cast in HNSW_KEYS.items():
+                value = config.get(section, key, fallback="").strip()
+                if value:
+                    hnsw[key] = cast(value)
+    return {"hnsw": hnsw} if hnsw else None
+
+
+def ef_search_update(collection, configuration):
+    """ef_search is the only HNSW knob that can change after creation; the change to apply if the config moved."""
+    wanted = ((configuration or {}).get("hnsw") or {}).get("ef_search")
+    if wanted is None:
+        return None
+    current = ((collection.configuration or {}).get("hnsw") or {}).get("ef_search")
+    return {"hnsw": {"ef_search": wanted}} if current != wanted else None
+
+
+def apply_ef_search(collection, configuration):
+    update = ef_search_update(collection, configuration)
+    if update is not None:
+        collection.modify(configuration=update)
+
+
+def empty_result(num_queries: int, include=QUERY_INCLUDE):
+    """A query result with no hits, for filters known to match nothing."""
+    result = {"ids": [[] for _ in range(num_queries)]}
+    result.update({field: [[] for _ in range(num_queries)] for field in include})
+    return result
+
+
+def time_where(where: dict = None, start=None, end=None, field: str = TIMESTAMP_FIELD):
+    """AND a [start, end) epoch range on the normalized timestamp field into a where filter."""
+    clauses = [where] if where else []
+    if start is not None:
+        clauses.append({field: {"$gte": float(start)}})
+    if end is not None:
+        clauses.append({field: {"$lt": float(end)}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
 
 class CreateHttpDB(CreateVectorDB):
 
@@ -40,9 +320,6 @@ class CreateHttpDB(CreateVectorDB):
     def create_client(self):
         self.client = RCAChromaHttp(self.config).get_client()
 
-    def get_collection(self, name: str):
-        self.collections = self.client.get_or_create_collection(name=name)
-
 
 class CreateHttpAsync(CreateVectorDB):
 
@@ -50,10 +327,81 @@ class CreateHttpAsync(CreateVectorDB):
         super().__init__(config)
 
     async def create_asyncClient(self):
-        self.client = RCAChromaHttpAsync(self.config).get_client()
-
-    def get_asyncCollection(self, name: str):
-        self.collections = self.client.get_or_create_collection(name=name)
+        self.client = await RCAChromaHttpAsync(self.config).get_client()
+
+    async def get_asyncCollection(self, name: str):
+        self.name = name
+        self.collections = await self.aresolve(await self.client.get_or_create_collection(
+            name=name,
+            configuration=self.collection_configuration(name)
+        ))
+        self.followed[name] = time.monotonic()
+        update = ef_search_update(self.collections, self.collection_configuration(name))
+        if update is not None:
+            await self.collections.modify(configuration=update)
+        self.lexical = open_lexical_index(self.config, name)
+        self.metadata_index = open_metadata_index(self.config, name)
+
+    async def aresolve(self, collection):
+        target = (collection.metadata or {}).get(SERVED_BY_KEY)
+        return await self.client.get_collection(target) if target else collection
+
+    async def acurrent(self):
+        """Async counterpart of current(): follow a re-embedding switch of the open collection."""
+        now = time.monotonic()
+        if now - self.followed.get(self.name, 0.0) >= FOLLOW_INTERVAL:
+            self.followed[self.name] = now
+            current = await self.aresolve(await self.client.get_collection(self.name))
+            if current.name != self.collections.name:
+                self.collections = current
+                self.generation += 1
+        return self.collections
+
+    async def get_asyncMaxBatchSize(self):
+        if self.max_batch_size is None:
+            self.max_batch_size = await self.client.get_max_batch_size()
+        return self.max_batch_size
+
+    async def add_asyncBatch(self, ids, documents, metadatas, embeddings):
+        """Async counterpart of add_batch, split to Chroma's max batch size."""
+        return await self._write_asyncBatch("add", ids, documents, metadatas, embeddings)
+
+    async def upsert_asyncBatch(self, ids, documents, metadatas, embeddings):
+        """Like add_asyncBatch but overwrites ids that already exist instead of failing."""
+        return await self._write_asyncBatch("upsert", ids, documents, metadatas, embeddings)
+
+    async def _write_asyncBatch(self, method: str, ids, documents, metadatas, embeddings):
+        collection = await self.acurrent()
+        update = self.model_update(collection, embeddings)
+        if update is not None:
+            await collection.modify(metadata=update)
+        write = getattr(collection, method)
+        metadatas = self.coerce_metadata(metadatas)
+        step = await self.get_asyncMaxBatchSize()
+        with span("db.write"):
+            for i in range(0, len(ids), step):
+                await write(
+                    ids=ids[i:i + step],
+                    documents=documents[i:i + step],
+                    metadatas=metadatas[i:i + step],
+                    embeddings=embeddings[i:i + step]
+                )
+        count("db.rows", len(ids))
+        if self.lexical is not None:
+            await asyncio.to_thread(self.index_lexical, ids, documents, metadatas)
+        if self.metadata_index is not None:
+            await asyncio.to_thread(self.index_metadata, ids, metadatas)
+        self.generation += 1
+
+        return ids
+
+    async def query_async(self, query_embeddings, n_results: int = 10):
+        collection = await self.acurrent()
+        self.check_model(collection, query_embeddings)
+        return await collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results
+        )
 
 
 class CreatePersistentDB(CreateVectorDB):
@@ -64,8 +412,15 @@ class CreatePersistentDB(CreateVectorDB):
     def create_client(self):
         self.client = RCAChromaPersistent(self.config).get_client()
 
-    def get_collection(self, name: str):
-        self.collections = self.client.get_or_create_collection(name=name)
+
+class CreateQuantizedDB(CreateVectorDB):
+    """int8 codes in memory-mapped files instead of Chroma, see quantStore.py."""
+
+    def __init__(self, config: configparser.ConfigParser):
+        super().__init__(config)
+
+    def create_client(self):
+        self.client = RCAQuantizedClient(self.config)
 
 
 def __testPersistentDB():
@@ -118,12 +473,12 @@ def __testHttpDB():
 async def __testHttpDBAsync():
     config = Readconfig().read()
 
-    chroma_client = CreateHttpDB(config)
+    chroma_client = CreateHttpAsync(config)
 
-    chroma_client.create_client()
+    await chroma_client.create_asyncClient()
 
-    chroma_client.get_collection("test_collection")
-    chroma_client.collections.add(
+    await chroma_client.get_asyncCollection("test_collection")
+    await chroma_client.collections.add(
         ids=["id1", "id2", "id3"],
         documents=[
             "lorem ipsum dolor sit amet",
@@ -1,8 +1,19 @@
+import asyncio
 import configparser
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+import httpx
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 
 from utils import setup_logger, Readconfig
+from utils.RCAMetrics import count, span
+from vectorEmbeddings.embeddingCache import RCAEmbeddingCache
+from vectorEmbeddings.localEmbedding import embedding_model_id, load_local_model, token_batches
+from vectorEmbeddings.logTemplate import RCALogTemplater
 
 
 class RCAEmbedding:
@@ -12,6 +23,13 @@ class RCAEmbedding:
             self.model = config.get("Embedding", "model", fallback="").strip()
             self.host = config.get("Embedding", "host", fallback="").strip()
             self.batchsize = int(config.get("Embedding", "batch_size", fallback="100").strip())
+            self.concurrency = max(1, int(config.get("Embedding", "concurrency", fallback="4").strip()))
+            self.timeout = float(config.get("Embedding", "timeout", fallback="120").strip())
+            self.dedupe = config.get("Embedding", "dedupe", fallback="exact").strip().lower()
+            self.backend = config.get("Embedding", "backend", fallback="ollama").strip().lower()
+            self.max_batch_chars = int(config.get("Embedding", "max_batch_chars", fallback="400000").strip())
+            self.adaptive = config.getboolean("Embedding", "adaptive", fallback=True)
+            self.target_latency = float(config.get("Embedding", "target_latency", fallback="10").strip())
         except configparser.NoSectionError:
             self.logger.error("❌ Missing [Embedding] section in configuration file.")
             self.logger.error("""Create a file like:
@@ -19,91 +37,303 @@ class RCAEmbedding:
 model = nomic-embed-text
 host = http://localhost:11434""")
 
-    def embed_texts(self, texts):
+        # In-process backends embed all missing texts in one call and batch them by token length
+        self.local = None
+        if self.backend != "ollama":
+            self.local = load_local_model(config)
+            # Keeps cached vectors of an Ollama model and a local export of it apart
+            self.model = embedding_model_id(config)
+
+        self.session = None
+        self.executor = None
+        self.open_transport()
+
+        # Padded character budget per request, tuned from observed latency when adaptive
+        self.batch_chars = self.max_batch_chars
+        self.tune_lock = threading.Lock()
+
+        # "template" mode embeds one masked template per group of near-identical log lines
+        self.templater = RCALogTemplater() if self.dedupe == "template" else None
+
+        self.cache = None
+        if config.getboolean("EmbeddingCache", "enabled", fallback=False):
+            self.cache = RCAEmbeddingCache(config)
+
+    def open_transport(self):
+        """One pooled keep-alive session shared by every in-flight batch."""
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed")
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        if self.session is not None:
+            self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def _lookup(self, texts):
+        """Cached vectors (None where missing) and the rows still to embed."""
+        if not self.cache:
+            return [None] * len(texts), list(range(len(texts)))
+        with span("embed.cache_lookup"):
+            cached = self.cache.get_many(self.model, texts)
+        missing = [i for i, v in enumerate(cached) if v is None]
+        count("embed.cache_hits", len(texts) - len(missing))
+        count("embed.cache_misses", len(missing))
+        return cached, missing
+
+    def _embed_unique(self, texts):
+        """Embed distinct texts into one float32 matrix, serving whatever the cache already holds."""
+        cached, missing = self._lookup(texts)
+
+        if self.local is not None:
+            with span("embed.local"):
+                fresh = [self.local.embed([texts[i] for i in missing])] if missing else []
+            return self._assemble(texts, cached, missing, fresh)
+
+        missing, batches = self._plan(texts, missing)
+
+        # Up to `concurrency` batches are in flight, results come back in submission order
+        fresh = self.executor.map(self._embed_batch, batches)
+        return self._assemble(texts, cached, missing, fresh)
+
+    def _plan(self, texts, missing):
+        """
+        Sort the rows to embed by length and cut them into batches of at most
+        `batch_size` rows whose padded size (rows × longest text) fits the
+        current character budget, so one stack trace doesn't pad a whole batch
+        of short lines. Returns the sorted rows and the batches' texts in that order.
+        """
+        lengths = [len(t) for t in texts]
+        missing = sorted(missing, key=lengths.__getitem__)
+        batches = [
+            [texts[i] for i in rows]
+            for rows in token_batches(missing, lengths, self.batch_chars, self.batchsize)
+        ]
+        return missing, batches
+
+    def _observe(self, batch, seconds: float):
+        """Halve the character budget after a slow batch, grow it back slowly after fast full ones."""
+        if not self.adaptive:
+            return
+        padded = len(batch) * max(len(t) for t in batch)
+        with self.tune_lock:
+            budget = self.batch_chars
+            if seconds > self.target_latency:
+                budget = max(padded // 2, 1)
+            elif seconds < self.target_latency / 2 and padded > budget // 2:
+                budget = min(int(budget * 1.25) + 1, self.max_batch_chars)
+            if budget != self.batch_chars:
+                self.logger.debug(f"📏 Batch of {len(batch)} took {seconds:.2f}s, char budget {self.batch_chars} → {budget}")
+                self.batch_chars = budget
+
+    def _split_retry(self, batch, error):
+        """A batch that timed out is retried as two halves; a single text has nothing left to split."""
+        if len(batch) == 1:
+            raise error
+        self._observe(batch, float("inf"))
+        self.logger.warning(f"⏱️ Embedding batch of {len(batch)} timed out, retrying in halves")
+        half = len(batch) // 2
+        return batch[:half], batch[half:]
+
+    def _assemble(self, texts, cached, missing, fresh):
+        """Copy cached rows and freshly embedded batches into their rows of one matrix."""
+        matrix = None
+
+        done = 0
+        for batch_matrix in fresh:
+            if matrix is None:
+                matrix = np.empty((len(texts), batch_matrix.shape[1]), dtype=np.float32)
+            matrix[missing[done:done + len(batch_matrix)]] = batch_matrix
+            done += len(batch_matrix)
+
+        if matrix is None:
+            matrix = np.empty((len(texts), len(cached[0])), dtype=np.float32)
+
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                if len(vector) != matrix.shape[1]:
+                    raise ValueError(
+                        f"❌ Cached embedding has dimension {len(vector)}, model returned {matrix.shape[1]}"
+                    )
+                matrix[i] = vector
+
+        if self.cache and missing:
+            self.cache.put_many(self.model, [texts[i] for i in missing], matrix[missing])
+
+        return matrix
+
+    def _embed_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            with span("embed.batch"):
+                r = self.session.post(
+                    f"{self.host}/api/embed",
+                    json={
+                        "model": self.model,
+                        "input": list(batch)
+                    },
+                    timeout=self.timeout
+                )
+        except requests.Timeout as e:
+            count("embed.timeouts")
+            first, second = self._split_retry(batch, e)
+            return np.vstack([self._embed_batch(first), self._embed_batch(second)])
+
+        self._observe(batch, time.perf_counter() - started)
+        r.raise_for_status()
+        count("embed.texts", len(batch))
+        with span("embed.decode"):
+            return self._decode(r.json(), batch)
+
+    @staticmethod
+    def _decode(data, batch):
+        if "embeddings" not in data:
+            raise ValueError(f"❌ Missing 'embeddings' in response: {data}")
+
+        batch_embeddings = data["embeddings"]
+
+        # STRICT validation
+        if not isinstance(batch_embeddings, list):
+            raise ValueError(f"❌ Embeddings must be a list, got {type(batch_embeddings)}")
+
+        try:
+            batch_embeddings = np.asarray(batch_embeddings, dtype=np.float32)
+        except ValueError:
+            raise ValueError("❌ Embeddings in one batch have different dimensions!")
+
+        if batch_embeddings.ndim != 2 or len(batch_embeddings) != len(batch):
+            raise ValueError(
+                f"❌ Embedding count mismatch!\n"
+                f"Sent {len(batch)} items\nGot {len(batch_embeddings)} embeddings\n"
+                f"Response (trimmed): {str(data)[:300]}"
+            )
+
+        return batch_embeddings
+
+    def _group(self, texts, templates=None):
+        """
+        Clean `texts` and group repeats, returning (keys, unique keys, one text to embed per key).
+        `templates` are the texts' masked templates when already computed elsewhere.
+        """
         # 1️⃣ CLEAN TEXTS
         clean_texts = [t.strip() if isinstance(t, str) else "" for t in texts]
 
-        # Remove truly empty docs (but track original index!)
-        indexed = [(i, t) for i, t in enumerate(clean_texts) if t]
-        if not indexed:
+        # Empty docs cannot be embedded and would leave holes in the output
+        if not any(clean_texts):
             raise ValueError("❌ No valid text provided for embedding.")
 
-        indices, valid_texts = zip(*indexed)
+        # GUARANTEE: no missing embedding
+        if not all(clean_texts):
+            raise ValueError("❌ Some texts failed to embed — index mismatch!")
+
+        # Repeated texts are embedded once and fanned back out. Exact mode groups
+        # texts equal up to whitespace (same as the cache key), template mode groups
+        # texts sharing a masked template and embeds the template itself
+        if self.templater:
+            keys = list(templates) if templates is not None else [self.templater.template(t) for t in clean_texts]
+            first_seen = {k: k for k in keys}
+        else:
+            keys = [RCAEmbeddingCache.normalize(t) for t in clean_texts]
+            first_seen = dict(zip(reversed(keys), reversed(clean_texts)))
+        unique_keys = list(dict.fromkeys(keys))
+        return keys, unique_keys, [first_seen[k] for k in unique_keys]
 
-        all_embeddings = []
-        total = len(valid_texts)
+    @staticmethod
+    def _expand(keys, unique_keys, unique_matrix, out):
+        # 2️⃣ RE-EXPAND TO MATCH ORIGINAL ORDER
+        position = {k: i for i, k in enumerate(unique_keys)}
+        inverse = np.fromiter((position[k] for k in keys), dtype=np.intp, count=len(keys))
 
-        for i in range(0, total, self.batchsize):
-            batch = valid_texts[i:i + self.batchsize]
+        if out is None:
+            out = np.empty((len(keys), unique_matrix.shape[1]), dtype=np.float32)
+        elif out.shape != (len(keys), unique_matrix.shape[1]):
+            raise ValueError(f"❌ Output buffer has shape {out.shape}, expected {(len(keys), unique_matrix.shape[1])}")
 
-            r = requests.post(
-                f"{self.host}/api/embed",
-                json={
-                    "model": self.model,
-                    "input": list(batch)
-                }
-            )
+        np.take(unique_matrix, inverse, axis=0, out=out)
+        return out
 
-            r.raise_for_status()
-            data = r.json()
+    def embed_texts(self, texts, out: np.ndarray = None, templates=None):
+        """
+        Embed `texts` into a contiguous (len(texts), dim) float32 matrix.
+        Pass `out` (e.g. a np.memmap) to have the rows written there instead.
+        """
+        keys, unique_keys, unique_texts = self._group(texts, templates)
+        return self._expand(keys, unique_keys, self._embed_unique(unique_texts), out)
 
-            if "embeddings" not in data:
-                raise ValueError(f"❌ Missing 'embeddings' in response: {data}")
+    def annotate_templates(self, documents, metadatas, templates=None):
+        """Add the `template_id` of every document to its metadata when template dedupe is on."""
+        if not self.templater:
+            return metadatas
+        template_ids = [self.templater.template_id(t) for t in templates] if templates is not None \
+            else self.templater.template_ids(documents)
+        return [
+            dict(meta or {}, template_id=template_id)
+            for meta, template_id in zip(metadatas, template_ids)
+        ]
 
-            batch_embeddings = data["embeddings"]
 
-            # STRICT validation
-            if not isinstance(batch_embeddings, list):
-                raise ValueError(f"❌ Embeddings must be a list, got {type(batch_embeddings)}")
+class RCAAsyncEmbedding(RCAEmbedding):
+    """
+    asyncio flavour of RCAEmbedding: batches are posted through one pooled
+    httpx.AsyncClient with at most `concurrency` of them in flight. Grouping,
+    caching and the float32 output are shared with the sync client.
+    """
 
-            if len(batch_embeddings) != len(batch):
-                raise ValueError(
-                    f"❌ Embedding count mismatch!\n"
-                    f"Sent {len(batch)} items\nGot {len(batch_embeddings)} embeddings\n"
-                    f"Response (trimmed): {str(data)[:300]}"
-                )
+    def open_transport(self):
+        # Batches go through an httpx.AsyncClient opened on first use, no requests session or threads
+        self.async_client = None
+        self.semaphore = None
 
-            all_embeddings.extend(batch_embeddings)
+    async def _aembed_batch(self, batch):
+        if self.async_client is None:
+            limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+            self.async_client = httpx.AsyncClient(base_url=self.host, limits=limits, timeout=self.timeout)
+            self.semaphore = asyncio.Semaphore(self.concurrency)
 
-        # 2️⃣ RE-EXPAND TO MATCH ORIGINAL ORDER
-        final_embeddings = [None] * len(texts)
+        try:
+            async with self.semaphore:
+                started = time.perf_counter()
+                with span("embed.batch"):
+                    r = await self.async_client.post("/api/embed", json={"model": self.model, "input": list(batch)})
+        except httpx.TimeoutException as e:
+            count("embed.timeouts")
+            first, second = self._split_retry(batch, e)
+            return np.vstack(await asyncio.gather(self._aembed_batch(first), self._aembed_batch(second)))
 
-        for emb, original_index in zip(all_embeddings, indices):
-            final_embeddings[original_index] = emb
+        self._observe(batch, time.perf_counter() - started)
+        r.raise_for_status()
+        count("embed.texts", len(batch))
+        with span("embed.decode"):
+            return self._decode(r.json(), batch)
 
-        # 3️⃣ GUARANTEE: no missing embedding
-        if any(e is None for e in final_embeddings):
-            raise ValueError("❌ Some texts failed to embed — index mismatch!")
+    async def _aembed_unique(self, texts):
+        # The cache is SQLite, its reads and writes stay off the event loop like local inference
+        cached, missing = await asyncio.to_thread(self._lookup, texts)
+
+        if self.local is not None:
+            # Model inference is CPU bound, keep it off the event loop
+            with span("embed.local"):
+                fresh = [await asyncio.to_thread(self.local.embed, [texts[i] for i in missing])] if missing else []
+            return await asyncio.to_thread(self._assemble, texts, cached, missing, fresh)
+
+        missing, batches = self._plan(texts, missing)
+        fresh = await asyncio.gather(*(self._aembed_batch(b) for b in batches))
+        return await asyncio.to_thread(self._assemble, texts, cached, missing, fresh)
+
+    async def aembed_texts(self, texts, out: np.ndarray = None, templates=None):
+        keys, unique_keys, unique_texts = self._group(texts, templates)
+        return self._expand(keys, unique_keys, await self._aembed_unique(unique_texts), out)
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.aclose()
+        self.close()
 
-        return final_embeddings
-
-
-# import torch
-# from transformers import AutoTokenizer, AutoModel
-#
-class HFTransformersEmbeddingFunction:
-    def __init__(self):
-        raise NotImplemented
-#     def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2"):
-#         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-#         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-#         self.model = AutoModel.from_pretrained(model_name).to(self.device)
-#
-#     def __call__(self, texts):
-#         inputs = self.tokenizer(
-#             texts,
-#             padding=True,
-#             truncation=True,
-#             return_tensors="pt"
-#         ).to(self.device)
-#
-#         with torch.no_grad():
-#             outputs = self.model(**inputs)
-#
-#         # Mean pooling
-#         embeddings = outputs.last_hidden_state.mean(dim=1)
-#
-#         return embeddings.cpu().numpy().tolist()
 
 if __name__ == '__main__':
     config = Readconfig().read()
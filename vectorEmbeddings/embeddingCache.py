@@ -0,0 +1,164 @@
+import configparser
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from utils import setup_logger
+
+
+class RCAEmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (model, normalized text hash).
+    Lookups go to an in-memory LRU first, then to a size-bounded SQLite file
+    that survives across runs. Vectors are stored as raw float32 bytes.
+    """
+
+    def __init__(self, config: configparser.ConfigParser):
+        self.logger = setup_logger("EmbeddingCache")
+
+        path = Path(config.get("EmbeddingCache", "path", fallback="EmbeddingCache/embeddings.sqlite").strip())
+        self.path = path if path.is_absolute() else Path.cwd() / path
+        self.memory_entries = int(config.get("EmbeddingCache", "memory_entries", fallback="10000").strip())
+        self.max_disk_bytes = int(float(config.get("EmbeddingCache", "max_disk_mb", fallback="1024").strip()) * 1024 * 1024)
+
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT, vector BLOB, last_access REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings(last_access)")
+        self.conn.commit()
+
+        self.disk_bytes = self.conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        self.logger.info(f"🗃️ Embedding cache at {self.path} ({self.disk_bytes / 1024 / 1024:.1f} MB on disk)")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def key(self, model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts):
+        """Return a list aligned with `texts` holding a float32 vector or None per text."""
+        keys = [self.key(model, t) for t in texts]
+        found = [None] * len(texts)
+        disk_lookup = {}
+
+        with self.lock:
+            for i, k in enumerate(keys):
+                vector = self.memory.get(k)
+                if vector is not None:
+                    self.memory.move_to_end(k)
+                    found[i] = vector
+                    self.stats["memory_hits"] += 1
+                else:
+                    disk_lookup.setdefault(k, []).append(i)
+
+            if disk_lookup:
+                now = time.time()
+                pending = list(disk_lookup)
+                hit_keys = []
+                # SQLite caps bound parameters, so look keys up in slices
+                for i in range(0, len(pending), 500):
+                    part = pending[i:i + 500]
+                    rows = self.conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                        part
+                    ).fetchall()
+                    for k, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(k, vector)
+                        hit_keys.append(k)
+                        for idx in disk_lookup[k]:
+                            found[idx] = vector
+                        self.stats["disk_hits"] += len(disk_lookup[k])
+
+                if hit_keys:
+                    self.conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                        [(now, k) for k in hit_keys]
+                    )
+                    self.conn.commit()
+
+            self.stats["misses"] += sum(1 for v in found if v is None)
+
+        return found
+
+    def put_many(self, model: str, texts, vectors):
+        now = time.time()
+        rows = []
+
+        with self.lock:
+            for text, vector in zip(texts, vectors):
+                k = self.key(model, text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(k, vector)
+                rows.append((k, model, vector.tobytes(), now))
+
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, vector, last_access) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+
+            inserted = self.conn.total_changes - before
+            if rows and inserted:
+                self.disk_bytes += inserted * len(rows[0][2])
+            if self.disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _remember(self, k, vector):
+        self.memory[k] = vector
+        self.memory.move_to_end(k)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict_disk(self):
+        # Drop least recently used rows until 90% of the budget is left
+        count, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        if not count:
+            self.disk_bytes = 0
+            return
+
+        target = int(self.max_disk_bytes * 0.9)
+        drop = max(1, int((total - target) / (total / count)) + 1)
+        self.conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+            (drop,)
+        )
+        self.conn.commit()
+
+        self.disk_bytes = self.conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        self.stats["evictions"] += drop
+        self.logger.debug(f"🧹 Evicted {drop} cached embeddings, {self.disk_bytes} bytes left on disk")
+
+    def hit_ratio(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else 0.0
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+        self.logger.info(f"🗃️ Embedding cache stats: {self.stats} (hit ratio {self.hit_ratio():.1%})")
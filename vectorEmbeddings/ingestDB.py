@@ -1,10 +1,16 @@
 # UI on
 # General API's
+import codecs
+import csv
+import json
+import time
 from dataclasses import dataclass
-from typing import Union, List
+from pathlib import Path
+from typing import Union, List, Iterator, Iterable
 
 import numpy as np
-from chromadb.api.async_api import AsyncCollection
+
+from utils.RCAMetrics import count, observe
 
 
 @dataclass
@@ -15,3 +21,195 @@ class Document:
     embedding: np.ndarray
 
 
+def normalize_record(entry: dict) -> tuple:
+    """Turn one raw id/document/metadata entry into what Chroma accepts."""
+    if "id" not in entry or "document" not in entry:
+        raise ValueError(f"❌ Record must contain 'id' and 'document': {str(entry)[:300]}")
+
+    metadata = entry.get("metadata") or None
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata) if metadata.strip() else None
+        except json.JSONDecodeError:
+            raise ValueError(f"❌ Invalid metadata JSON in record: {str(entry)[:300]}")
+
+    # Chroma rejects empty metadata dicts, None is the accepted "no metadata"
+    return str(entry["id"]), entry["document"], metadata or None
+
+
+class StreamingRecordReader:
+    """
+    Iterates id/document/metadata records from a JSON array, NDJSON or CSV file
+    without loading the whole file. `offset` is the byte offset right after the
+    last yielded record, so a reader can be re-opened at that position.
+    NDJSON can also be read as a byte range: records starting before
+    `end_offset` are yielded, see `ndjson_shards`.
+    """
+
+    READ_SIZE = 1 << 16
+
+    def __init__(self, path: Union[str, Path], start_offset: int = 0, end_offset: int = None):
+        self.path = Path(path)
+        self.offset = start_offset
+        self.end_offset = end_offset
+        self.format = self.detect_format(self.path)
+
+    @staticmethod
+    def detect_format(path: Path) -> str:
+        suffix = path.suffix.lower()
+        if suffix == ".csv":
+            return "csv"
+        if suffix in (".ndjson", ".jsonl"):
+            return "ndjson"
+        if suffix == ".json":
+            # A .json file is either one big array or one object per line
+            with open(path, "rb") as f:
+                while True:
+                    ch = f.read(1)
+                    if not ch or not ch.isspace():
+                        break
+            return "json" if ch == b"[" else "ndjson"
+        raise ValueError(f"❌ Unsupported file extension: {path.suffix}")
+
+    def __iter__(self) -> Iterator[tuple]:
+        match self.format:
+            case "json":
+                yield from self._iter_json_array()
+            case "ndjson":
+                yield from self._iter_ndjson()
+            case "csv":
+                yield from self._iter_csv()
+
+    def _iter_ndjson(self):
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for line_no, line in enumerate(f, start=1):
+                if self.end_offset is not None and self.offset >= self.end_offset:
+                    return
+                self.offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"❌ Invalid JSON on line {line_no} after resume point: {e}")
+                yield normalize_record(entry)
+
+    def _iter_csv(self):
+        with open(self.path, "rb") as f:
+            header_line = f.readline()
+            fieldnames = next(csv.reader([header_line.decode("utf-8-sig")]))
+
+            required = {"id", "document", "metadata"}
+            if not required <= set(fieldnames):
+                raise ValueError("❌ CSV must contain columns: id, document, metadata")
+
+            if self.offset <= len(header_line):
+                self.offset = len(header_line)
+            f.seek(self.offset)
+
+            def lines():
+                # csv.reader pulls exactly the physical lines of one row, so the
+                # offset is at the row boundary whenever a row is yielded
+                for raw in f:
+                    self.offset += len(raw)
+                    yield raw.decode("utf-8")
+
+            for row in csv.DictReader(lines(), fieldnames=fieldnames):
+                yield normalize_record(row)
+
+    def _iter_json_array(self):
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        # Records are decoded in place at `pos`, the consumed prefix is only
+        # dropped once per block read, not copied away after every record
+        buf = ""
+        pos = 0
+        eof = False
+        # Before the opening '[' on a fresh read, inside the array on a resume
+        started = self.offset > 0
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+
+            def fill():
+                nonlocal buf, pos, eof
+                chunk = f.read(self.READ_SIZE)
+                if not chunk:
+                    eof = True
+                buf = buf[pos:] + utf8.decode(chunk, final=eof)
+                pos = 0
+
+            while True:
+                # Skip whitespace and separators, tracking consumed bytes
+                skipped = pos
+                while True:
+                    while pos < len(buf) and (buf[pos].isspace() or buf[pos] == "," or
+                                              (not started and buf[pos] == "[")):
+                        if buf[pos] == "[":
+                            started = True
+                        pos += 1
+                    if pos < len(buf) or eof:
+                        break
+                    self.offset += len(buf[skipped:pos].encode("utf-8"))
+                    fill()
+                    skipped = 0
+
+                self.offset += len(buf[skipped:pos].encode("utf-8"))
+
+                if pos == len(buf):
+                    return
+                if buf[pos] == "]":
+                    self.offset += 1
+                    return
+
+                try:
+                    entry, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise ValueError(f"❌ Truncated or invalid JSON array in {self.path.name}")
+                    fill()
+                    continue
+
+                self.offset += len(buf[pos:end].encode("utf-8"))
+                pos = end
+                yield normalize_record(entry)
+
+
+def ndjson_shards(path: Union[str, Path], shard_bytes: int):
+    """
+    Cut an NDJSON file into (start, end) byte ranges of about `shard_bytes`,
+    each starting at a line boundary, so readers can split it without
+    overlapping or skipping a record.
+    """
+    size = Path(path).stat().st_size
+    starts = [0]
+    with open(path, "rb") as f:
+        for target in range(shard_bytes, size, shard_bytes):
+            # The next line start at or after the target byte
+            f.seek(target - 1)
+            f.readline()
+            if f.tell() > starts[-1] and f.tell() < size:
+                starts.append(f.tell())
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def iter_chunks(records: Iterable[tuple], chunk_size: int) -> Iterator[tuple]:
+    """Group (id, document, metadata) records into fixed size (ids, documents, metadatas) chunks."""
+    ids, documents, metadatas = [], [], []
+    started = time.perf_counter()
+    for id_, document, metadata in records:
+        ids.append(id_)
+        documents.append(document)
+        metadatas.append(metadata)
+        if len(ids) >= chunk_size:
+            # Reading and parsing this chunk only, not what the consumer does with it
+            observe("ingest.parse", time.perf_counter() - started)
+            count("ingest.records", len(ids))
+            yield ids, documents, metadatas
+            ids, documents, metadatas = [], [], []
+            started = time.perf_counter()
+    if ids:
+        observe("ingest.parse", time.perf_counter() - started)
+        count("ingest.records", len(ids))
+        yield ids, documents, metadatas
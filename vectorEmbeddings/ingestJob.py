@@ -0,0 +1,134 @@
+import configparser
+import json
+import os
+import time
+from pathlib import Path
+
+from utils import setup_logger
+from vectorEmbeddings.ingestDB import StreamingRecordReader, iter_chunks
+
+
+def last_wins(ids, documents, metadatas):
+    """Drop earlier repeats of an id within one chunk, a single upsert can't hold an id twice."""
+    last = {id_: i for i, id_ in enumerate(ids)}
+    if len(last) == len(ids):
+        return ids, documents, metadatas
+    rows = sorted(last.values())
+    return [ids[i] for i in rows], [documents[i] for i in rows], [metadatas[i] for i in rows]
+
+
+def upsert_new(db, embedder, ids, documents, metadatas):
+    """
+    Embed and upsert the rows of one chunk whose ids aren't stored yet.
+    Returns (ids after dropping in-chunk repeats, number written).
+    """
+    ids, documents, metadatas = last_wins(ids, documents, metadatas)
+
+    # Stored by an earlier run, e.g. one that died between upsert and checkpoint
+    stored = db.existing_ids(ids)
+    rows = [i for i, id_ in enumerate(ids) if id_ not in stored]
+
+    if rows:
+        new_ids = [ids[i] for i in rows]
+        new_documents = [documents[i] for i in rows]
+        embeddings = embedder.embed_texts(new_documents)
+        new_metadatas = embedder.annotate_templates(new_documents, [metadatas[i] for i in rows])
+        db.upsert_batch(new_ids, new_documents, new_metadatas, embeddings)
+    return ids, len(rows)
+
+
+class RCAIngestJob:
+    """
+    Resumable bulk ingest of one data file into a collection.
+
+    Chunks are streamed from the file, rows whose ids are already stored are
+    skipped before embedding, the rest are upserted, and after every committed
+    chunk a checkpoint with the reader's byte offset is written atomically.
+    Re-running the same job continues at that offset, and a file that grew
+    since it finished is picked up from where the last run ended.
+    """
+
+    def __init__(self, config: configparser.ConfigParser, db, embedder, path):
+        self.logger = setup_logger("IngestJob")
+        self.db = db
+        self.embedder = embedder
+        self.path = Path(path).resolve()
+        self.chunk_size = int(config.get("Ingest", "chunk_size", fallback="2000").strip())
+
+        checkpoint_dir = Path(config.get("Ingest", "checkpoint_dir", fallback=".checkpoints").strip())
+        self.checkpoint_path = checkpoint_dir / f"{db.collection_name}__{self.path.name}.json"
+
+    def load_checkpoint(self):
+        """The saved progress of this job, or a fresh start when there is none or it doesn't fit the file."""
+        fresh = {
+            "source": str(self.path),
+            "collection": self.db.collection_name,
+            "offset": 0,
+            "chunks": 0,
+            "records": 0,
+            "written": 0,
+            "skipped": 0,
+            "last_chunk": None,
+            "done": False,
+        }
+        try:
+            checkpoint = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return fresh
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"⚠️ Ignoring unreadable checkpoint {self.checkpoint_path}: {e}")
+            return fresh
+
+        if checkpoint.get("source") != str(self.path) or checkpoint.get("offset", 0) > self.path.stat().st_size:
+            # Same name but a different or truncated file, the offset means nothing here
+            self.logger.warning(f"⚠️ Checkpoint doesn't match {self.path.name} anymore, starting over")
+            return fresh
+        return dict(fresh, **checkpoint)
+
+    def save_checkpoint(self, checkpoint: dict):
+        checkpoint["updated"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(checkpoint, indent=2), encoding="utf-8")
+        # Atomic on the same filesystem, a crash leaves either the old or the new checkpoint
+        os.replace(tmp, self.checkpoint_path)
+
+    def reset(self):
+        self.checkpoint_path.unlink(missing_ok=True)
+
+    def run(self, on_chunk=None):
+        """
+        Ingest from the checkpointed offset to the end of the file and return the
+        checkpoint. `on_chunk(checkpoint)` is called after every committed chunk.
+        """
+        checkpoint = self.load_checkpoint()
+        if checkpoint["offset"] >= self.path.stat().st_size and checkpoint["done"]:
+            self.logger.info(f"✅ {self.path.name} already ingested into {checkpoint['collection']}")
+            return checkpoint
+
+        if checkpoint["offset"]:
+            self.logger.info(f"⏩ Resuming {self.path.name} at byte {checkpoint['offset']} "
+                             f"after {checkpoint['records']} records")
+        checkpoint["done"] = False
+
+        reader = StreamingRecordReader(self.path, start_offset=checkpoint["offset"])
+        for ids, documents, metadatas in iter_chunks(reader, self.chunk_size):
+            ids, written = upsert_new(self.db, self.embedder, ids, documents, metadatas)
+
+            checkpoint["offset"] = reader.offset
+            checkpoint["chunks"] += 1
+            checkpoint["records"] += len(ids)
+            checkpoint["written"] += written
+            checkpoint["skipped"] += len(ids) - written
+            checkpoint["last_chunk"] = {"index": checkpoint["chunks"], "first_id": ids[0], "last_id": ids[-1]}
+            self.save_checkpoint(checkpoint)
+
+            if on_chunk is not None:
+                on_chunk(checkpoint)
+
+        checkpoint["offset"] = reader.offset
+        checkpoint["done"] = True
+        self.save_checkpoint(checkpoint)
+        self.logger.info(f"✅ {self.path.name}: {checkpoint['written']} written, "
+                         f"{checkpoint['skipped']} already stored")
+        return checkpoint
@@ -0,0 +1,129 @@
+import configparser
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from utils import setup_logger, parse_timestamp
+
+# Same token shape as the FTS5 tokenizer below: error codes like ERR_CONN_RESET
+# and hosts like db-01 stay one token, dots and slashes split
+TOKEN = re.compile(r"[\w\-]+")
+
+
+class RCALexicalIndex:
+    """
+    BM25 inverted index (SQLite FTS5) kept next to one Chroma collection.
+
+    Documents are added through the collection's write hooks, so every ingest
+    path keeps it current; upserts replace the earlier text of an id. Searches
+    OR the query's tokens and rank by BM25, which favours rare exact tokens
+    such as error codes, hostnames and exception class names.
+    """
+
+    def __init__(self, config: configparser.ConfigParser, collection_name: str):
+        self.logger = setup_logger("LexicalIndex")
+        index_dir = Path(config.get("Hybrid", "index_dir", fallback="LexicalIndex").strip())
+        index_dir = index_dir if index_dir.is_absolute() else Path.cwd() / index_dir
+        index_dir.mkdir(parents=True, exist_ok=True)
+        self.timestamp_field = config.get("Partition", "timestamp_field", fallback="timestamp").strip()
+
+        self.path = index_dir / f"{collection_name}.sqlite"
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS docs (rid INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE, ts REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS docs_ts ON docs(ts)")
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5("
+            "document, tokenize=\"unicode61 tokenchars '_-'\")"
+        )
+        self.conn.commit()
+        self.logger.info(f"🔤 Lexical index at {self.path}")
+
+    def _delete(self, ids):
+        placeholders = ",".join("?" * len(ids))
+        rids = [r for (r,) in self.conn.execute(f"SELECT rid FROM docs WHERE id IN ({placeholders})", ids)]
+        if rids:
+            marks = ",".join("?" * len(rids))
+            self.conn.execute(f"DELETE FROM terms WHERE rowid IN ({marks})", rids)
+            self.conn.execute(f"DELETE FROM docs WHERE rid IN ({marks})", rids)
+
+    def add(self, ids, documents, metadatas):
+        """Write hook: index (or re-index) one written batch."""
+        ids = list(ids)
+        with self.lock, self.conn:
+            for i in range(0, len(ids), 500):
+                self._delete(ids[i:i + 500])
+
+            for id_, document, meta in zip(ids, documents, metadatas):
+                ts = parse_timestamp((meta or {}).get(self.timestamp_field))
+                rid = self.conn.execute("INSERT INTO docs (id, ts) VALUES (?, ?)", (id_, ts)).lastrowid
+                self.conn.execute("INSERT INTO terms (rowid, document) VALUES (?, ?)", (rid, document or ""))
+
+    def delete(self, ids):
+        ids = list(ids)
+        with self.lock, self.conn:
+            for i in range(0, len(ids), 500):
+                self._delete(ids[i:i + 500])
+
+    def delete_before(self, ts: float):
+        """Drop documents older than `ts`, e.g. after partition retention."""
+        with self.lock, self.conn:
+            rids = [r for (r,) in self.conn.execute("SELECT rid FROM docs WHERE ts < ?", (ts,))]
+            for i in range(0, len(rids), 500):
+                marks = ",".join("?" * len(rids[i:i + 500]))
+                self.conn.execute(f"DELETE FROM terms WHERE rowid IN ({marks})", rids[i:i + 500])
+                self.conn.execute(f"DELETE FROM docs WHERE rid IN ({marks})", rids[i:i + 500])
+
+    @staticmethod
+    def match_query(text: str):
+        """FTS5 query ORing the quoted tokens of `text`, None if it has none."""
+        tokens = list(dict.fromkeys(t.lower() for t in TOKEN.findall(text)))
+        return " OR ".join(f'"{t}"' for t in tokens) if tokens else None
+
+    def search(self, text: str, limit: int = 50, start: float = None, end: float = None):
+        """[(id, bm25 score)] best first; lower BM25 scores are better in SQLite."""
+        query = self.match_query(text)
+        if query is None:
+            return []
+
+        sql = "SELECT docs.id, bm25(terms) AS score FROM terms JOIN docs ON docs.rid = terms.rowid WHERE terms MATCH ?"
+        params = [query]
+        if start is not None:
+            sql += " AND docs.ts >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND docs.ts < ?"
+            params.append(end)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_lexical_index(config: configparser.ConfigParser, collection_name: str):
+    """The collection's lexical index when [Hybrid] is enabled, else None."""
+    if not config.getboolean("Hybrid", "enabled", fallback=False):
+        return None
+    return RCALexicalIndex(config, collection_name)
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60, weights=None):
+    """Fuse ranked id lists: score(id) = Σ weight / (k + rank). Returns [(id, score)] best first."""
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
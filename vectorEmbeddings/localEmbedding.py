@@ -0,0 +1,214 @@
+import abc
+import configparser
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils import setup_logger
+
+LOCAL_BACKENDS = ("onnx", "transformers")
+
+# Loaded models per process, keyed by their settings, so every RCAEmbedding shares one copy
+_MODELS = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def token_batches(order, lengths, max_batch_tokens: int, max_rows: int = None):
+    """
+    Split row indices, already sorted by length, into batches whose padded
+    size (rows × longest row) stays within `max_batch_tokens` and that hold
+    at most `max_rows` rows. A single row longer than the budget still gets
+    a batch of its own.
+    """
+    batch = []
+    for i in order:
+        # Sorted ascending, so the current row is the longest one in the batch
+        if batch and ((len(batch) + 1) * lengths[i] > max_batch_tokens or len(batch) == max_rows):
+            yield batch
+            batch = []
+        batch.append(i)
+    if batch:
+        yield batch
+
+
+def mean_pool(hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Average token vectors over the attention mask, (batch, tokens, dim) → (batch, dim)."""
+    mask = mask[:, :, None].astype(np.float32)
+    return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+class RCALocalModel(abc.ABC):
+    """
+    In-process CPU embedding model. Texts are tokenized once, sorted by token
+    length and run in batches capped by a padded token budget, so a stack
+    trace doesn't make hundreds of short lines pad to its length. Rows come
+    back in input order as one float32 matrix.
+    """
+
+    def __init__(self, path: str, threads: int, max_length: int, max_batch_tokens: int, normalize: bool):
+        self.logger = setup_logger("Embeddings")
+        self.path = path
+        self.threads = threads
+        self.max_length = max_length
+        self.max_batch_tokens = max_batch_tokens
+        self.normalize = normalize
+        # Sessions/models are safe to share, but parallel calls would only fight over the same cores
+        self.lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _encode(self, texts):
+        """The tokenized texts, truncated to max_length, one encoding per text."""
+
+    def _length(self, encoding) -> int:
+        """Token count of one encoding."""
+        return len(encoding)
+
+    @abc.abstractmethod
+    def _forward(self, encodings) -> np.ndarray:
+        """Pooled float32 embeddings of one length-sorted batch of encodings."""
+
+    def embed(self, texts) -> np.ndarray:
+        encodings = self._encode(texts)
+        lengths = [self._length(e) for e in encodings]
+        order = np.argsort(lengths, kind="stable")
+
+        out = None
+        with self.lock:
+            for batch in token_batches(order, lengths, self.max_batch_tokens):
+                vectors = self._forward([encodings[i] for i in batch])
+                if out is None:
+                    out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                out[batch] = vectors
+
+        if out is None:
+            return np.empty((0, 0), dtype=np.float32)
+        if self.normalize:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out
+
+
+class RCAOnnxModel(RCALocalModel):
+    """
+    ONNX Runtime backend for a sentence-transformers style export: a directory
+    with `model.onnx` (or `onnx/model.onnx`) and `tokenizer.json`. Token
+    vectors are mean pooled unless the model already returns pooled ones.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("❌ [Embedding] backend = onnx needs `onnxruntime` and `tokenizers` installed") from e
+
+        root = Path(path)
+        model_file = next((p for p in (root / "model.onnx", root / "onnx" / "model.onnx") if p.is_file()), None)
+        if model_file is None or not (root / "tokenizer.json").is_file():
+            raise ValueError(f"❌ Expected model.onnx and tokenizer.json under {root}")
+
+        self.tokenizer = Tokenizer.from_file(str(root / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        self.tokenizer.no_padding()
+
+        options = onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode(self, texts):
+        return self.tokenizer.encode_batch(list(texts))
+
+    def _forward(self, encodings) -> np.ndarray:
+        width = max(len(e) for e in encodings)
+        ids = np.zeros((len(encodings), width), dtype=np.int64)
+        mask = np.zeros_like(ids)
+        types = np.zeros_like(ids)
+        for row, e in enumerate(encodings):
+            ids[row, :len(e)] = e.ids
+            mask[row, :len(e)] = 1
+            types[row, :len(e)] = e.type_ids
+
+        feeds = {"input_ids": ids, "attention_mask": mask, "token_type_ids": types}
+        output = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        output = np.asarray(output, dtype=np.float32)
+        return mean_pool(output, mask) if output.ndim == 3 else output
+
+
+class RCATransformersModel(RCALocalModel):
+    """Hugging Face transformers backend (PyTorch on CPU), mean pooled over the attention mask."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        try:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+        except ImportError as e:
+            raise ImportError("❌ [Embedding] backend = transformers needs `torch` and `transformers` installed") from e
+
+        self.torch = torch
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.model = AutoModel.from_pretrained(path).eval()
+
+    def _encode(self, texts):
+        encoded = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        return [
+            {key: encoded[key][i] for key in encoded.keys()}
+            for i in range(len(texts))
+        ]
+
+    def _length(self, encoding) -> int:
+        # One dict of input_ids/attention_mask/... per text, its len() would count the keys
+        return len(encoding["input_ids"])
+
+    def _forward(self, encodings) -> np.ndarray:
+        batch = self.tokenizer.pad(encodings, return_tensors="pt")
+        with self.torch.inference_mode():
+            hidden = self.model(**batch).last_hidden_state
+        return mean_pool(hidden.float().numpy(), batch["attention_mask"].numpy())
+
+
+def local_model_path(config: configparser.ConfigParser):
+    return config.get("Embedding", "model_path", fallback="").strip() or \
+        config.get("Embedding", "model", fallback="").strip()
+
+
+def embedding_model_id(config: configparser.ConfigParser):
+    """
+    Which model the [Embedding] settings produce vectors with: the Ollama
+    model name, or `<backend>:<path>` for a local one. Collections record it.
+    """
+    backend = config.get("Embedding", "backend", fallback="ollama").strip().lower()
+    if backend == "ollama":
+        return config.get("Embedding", "model", fallback="").strip()
+    return f"{backend}:{local_model_path(config)}"
+
+
+def load_local_model(config: configparser.ConfigParser) -> RCALocalModel:
+    """The process-wide model for the [Embedding] settings, loaded on first use."""
+    backend = config.get("Embedding", "backend", fallback="ollama").strip().lower()
+    if backend not in LOCAL_BACKENDS:
+        raise ValueError(f"❌ [Embedding] backend must be ollama or one of {list(LOCAL_BACKENDS)}, got {backend}")
+
+    path = local_model_path(config)
+    settings = {
+        "threads": int(config.get("Embedding", "threads", fallback="0").strip()),
+        "max_length": int(config.get("Embedding", "max_length", fallback="512").strip()),
+        "max_batch_tokens": int(config.get("Embedding", "max_batch_tokens", fallback="16384").strip()),
+        "normalize": config.getboolean("Embedding", "normalize", fallback=True),
+    }
+
+    key = (backend, path, *settings.values())
+    with _MODELS_LOCK:
+        model = _MODELS.get(key)
+        if model is None:
+            logger = setup_logger("Embeddings")
+            logger.info(f"📦 Loading {backend} embedding model from {path}")
+            cls = RCAOnnxModel if backend == "onnx" else RCATransformersModel
+            model = _MODELS[key] = cls(path, **settings)
+        return model
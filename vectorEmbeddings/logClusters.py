@@ -0,0 +1,304 @@
+import configparser
+import io
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from utils import setup_logger, parse_timestamp
+from vectorEmbeddings.createDB import TIMESTAMP_FIELD
+
+# Upper bound on floats in one batch × centroids similarity block
+SIMILARITY_BLOCK = 1 << 24
+
+
+def normalize(x: np.ndarray):
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+
+def iso(ts: float):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat() if np.isfinite(ts) else None
+
+
+class RCALogClusterer:
+    """
+    Incremental near-duplicate clustering of a collection's stored embeddings.
+
+    Embeddings are paged out of Chroma `batch_size` at a time and grouped
+    with a cosine-threshold leader algorithm: each vector joins the closest
+    centroid with similarity >= `threshold`, and the ones that match nothing
+    lead new clusters among themselves. Each step is a matrix product, so
+    memory stays at one batch plus the centroids however large the collection.
+
+    Centroids, counts, first/last seen and representatives are saved to
+    `<state_dir>/<collection>.npz` with how many rows of each source
+    collection (partition) were consumed. The next update only reads rows
+    written since then, so new logs fold into the existing clusters.
+
+    Resuming at a row offset relies on `get(limit, offset)` paging in a
+    stable order, which Chroma's insertion order is while rows are only
+    added or upserted. Deleting rows shifts the offsets; the id of the last
+    consumed row is saved with each offset, and when it no longer sits
+    there the clusters are rebuilt rather than skipping or recounting rows.
+    """
+
+    def __init__(self, config: configparser.ConfigParser, db):
+        self.logger = setup_logger("Clusters")
+        self.db = db
+        self.threshold = float(config.get("Cluster", "threshold", fallback="0.9").strip())
+        self.batch_size = int(config.get("Cluster", "batch_size", fallback="5000").strip())
+        self.max_clusters = int(config.get("Cluster", "max_clusters", fallback="20000").strip())
+        self.save_every = int(config.get("Cluster", "save_every", fallback="50").strip())
+        self.timestamp_field = config.get("Partition", "timestamp_field", fallback="timestamp").strip()
+        self.model = db.model
+
+        state_dir = Path(config.get("Cluster", "state_dir", fallback=".clusters").strip())
+        self.path = state_dir / f"{db.collection_name}.npz"
+        self.reset()
+        self.load()
+
+    def reset(self, since: float = None):
+        self.since = since
+        self.offsets = {}
+        self.marks = {}
+        self.sums = None
+        self.centroids = None
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.first = np.zeros(0)
+        self.last = np.zeros(0)
+        self.rep_vectors = None
+        self.rep_ids = []
+        self.rep_documents = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as state:
+                meta = json.loads(str(state["meta"]))
+                if meta["threshold"] != self.threshold:
+                    self.logger.info(f"🔁 Cluster threshold changed ({meta['threshold']} → {self.threshold}), starting over")
+                    return
+                if meta.get("model", self.model) != self.model:
+                    # Centroids of another model's vectors mean nothing to the re-embedded rows
+                    self.logger.info(f"🔁 Embedding model changed ({meta['model']} → {self.model}), starting over")
+                    return
+                self.since = meta["since"]
+                self.offsets = meta["offsets"]
+                self.marks = meta.get("marks", {})
+                self.rep_ids = meta["rep_ids"]
+                self.rep_documents = meta["rep_documents"]
+                self.sums = state["sums"]
+                self.centroids = normalize(self.sums)
+                self.counts = state["counts"]
+                self.first = state["first"]
+                self.last = state["last"]
+                self.rep_vectors = state["rep_vectors"]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f"⚠️ Ignoring unreadable cluster state {self.path}: {e}")
+            self.reset()
+
+    def save(self):
+        if self.sums is None:
+            return
+        meta = {
+            "threshold": self.threshold,
+            "model": self.model,
+            "since": self.since,
+            "offsets": self.offsets,
+            "marks": self.marks,
+            "rep_ids": self.rep_ids,
+            "rep_documents": self.rep_documents,
+        }
+        buffer = io.BytesIO()
+        np.savez(buffer, meta=np.array(json.dumps(meta)), sums=self.sums, counts=self.counts,
+                 first=self.first, last=self.last, rep_vectors=self.rep_vectors)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_bytes(buffer.getvalue())
+        os.replace(tmp, self.path)
+
+    def nearest(self, x: np.ndarray, centroids: np.ndarray):
+        """(index, cosine) of the closest centroid for each row of `x`, in blocks."""
+        labels = np.empty(len(x), dtype=np.int64)
+        sims = np.empty(len(x), dtype=np.float32)
+        rows = max(1, SIMILARITY_BLOCK // max(1, len(centroids)))
+        for i in range(0, len(x), rows):
+            block = x[i:i + rows] @ centroids.T
+            labels[i:i + rows] = block.argmax(axis=1)
+            sims[i:i + rows] = block[np.arange(len(block)), labels[i:i + rows]]
+        return labels, sims
+
+    def assign(self, x: np.ndarray):
+        """Cluster index per row of normalized `x`, creating clusters for rows that match none."""
+        labels = np.full(len(x), -1, dtype=np.int64)
+        if len(self):
+            nearest, sims = self.nearest(x, self.centroids)
+            matched = sims >= self.threshold
+            labels[matched] = nearest[matched]
+
+        leaders = []
+        rest = np.flatnonzero(labels < 0)
+        while rest.size:
+            if len(self) + len(leaders) >= self.max_clusters:
+                # Full: what is left joins the closest cluster it has
+                centroids = np.vstack(([self.centroids] if len(self) else []) + leaders)
+                labels[rest] = self.nearest(x[rest], centroids)[0]
+                self.logger.warning(f"⚠️ {self.max_clusters} clusters reached, {rest.size} rows forced into the nearest one")
+                break
+            sims = x[rest] @ x[rest[0]]
+            members = sims >= self.threshold
+            # An all-zero embedding matches nothing, not even itself
+            members[0] = True
+            labels[rest[members]] = len(self) + len(leaders)
+            leaders.append(x[rest[0]])
+            rest = rest[~members]
+
+        return labels, len(leaders)
+
+    def grow(self, new: int, dim: int):
+        if self.sums is None:
+            self.sums = np.zeros((0, dim), dtype=np.float32)
+            self.centroids = np.zeros((0, dim), dtype=np.float32)
+            self.rep_vectors = np.zeros((0, dim), dtype=np.float32)
+        if not new:
+            return
+        self.sums = np.vstack([self.sums, np.zeros((new, dim), dtype=np.float32)])
+        self.centroids = np.vstack([self.centroids, np.zeros((new, dim), dtype=np.float32)])
+        self.rep_vectors = np.vstack([self.rep_vectors, np.zeros((new, dim), dtype=np.float32)])
+        self.counts = np.concatenate([self.counts, np.zeros(new, dtype=np.int64)])
+        self.first = np.concatenate([self.first, np.full(new, np.inf)])
+        self.last = np.concatenate([self.last, np.full(new, -np.inf)])
+        self.rep_ids.extend([None] * new)
+        self.rep_documents.extend([None] * new)
+
+    def add(self, ids, embeddings, documents, timestamps):
+        """Fold one batch into the clusters."""
+        x = normalize(embeddings)
+        if self.sums is not None and self.sums.shape[1] != x.shape[1]:
+            raise ValueError(f"❌ Embedding dimension {x.shape[1]} doesn't match the {self.sums.shape[1]} of saved clusters {self.path}")
+
+        labels, new = self.assign(x)
+        self.grow(new, x.shape[1])
+
+        # Group rows by cluster once, then reduce each group in one call
+        order = np.argsort(labels, kind="stable")
+        touched, starts = np.unique(labels[order], return_index=True)
+        self.sums[touched] += np.add.reduceat(x[order], starts, axis=0)
+        self.counts[touched] += np.diff(np.append(starts, len(order)))
+        self.first[touched] = np.fmin(self.first[touched], np.fmin.reduceat(timestamps[order], starts))
+        self.last[touched] = np.fmax(self.last[touched], np.fmax.reduceat(timestamps[order], starts))
+        self.centroids[touched] = normalize(self.sums[touched])
+
+        # Representative: the member closest to its centroid so far
+        closeness = np.einsum("ij,ij->i", x, self.centroids[labels])
+        order = np.lexsort((-closeness, labels))
+        clusters, first_rows = np.unique(labels[order], return_index=True)
+        best = order[first_rows]
+        current = np.einsum("ij,ij->i", self.rep_vectors[clusters], self.centroids[clusters])
+        better = closeness[best] > current
+        for cluster, row in zip(clusters[better], best[better]):
+            self.rep_vectors[cluster] = x[row]
+            self.rep_ids[cluster] = ids[row]
+            self.rep_documents[cluster] = documents[row]
+
+        return new
+
+    def in_place(self, name: str, collection):
+        """Whether the row the saved offset of `name` ends at is still the one consumed last."""
+        offset, mark = self.offsets.get(name, 0), self.marks.get(name)
+        if not offset or mark is None:
+            return True
+        return collection.get(limit=1, offset=offset - 1, include=[])["ids"] == [mark]
+
+    def timestamps(self, metadatas):
+        out = np.full(len(metadatas), np.nan)
+        for i, meta in enumerate(metadatas):
+            meta = meta or {}
+            ts = meta.get(TIMESTAMP_FIELD)
+            out[i] = ts if isinstance(ts, (int, float)) else (parse_timestamp(meta.get(self.timestamp_field)) or np.nan)
+        return out
+
+    def update(self, since: float = None):
+        """
+        Read rows written since the last update and cluster those newer than
+        `since`. Asking for an earlier start than the saved clusters cover
+        rebuilds them. Returns the number of rows clustered.
+        """
+        if len(self) and self.since is not None and (since is None or since < self.since):
+            self.logger.info("🔁 Requested window starts before the saved clusters, rebuilding")
+            self.reset(since)
+        elif not len(self):
+            self.reset(since)
+
+        sources = self.db.source_collections(self.since)
+        # Retention dropped these partitions, their offsets are meaningless now
+        names = {name for name, _ in sources}
+        self.offsets = {k: v for k, v in self.offsets.items() if k in names}
+        self.marks = {k: v for k, v in self.marks.items() if k in names}
+        moved = [name for name, collection in sources if not self.in_place(name, collection)]
+        if moved:
+            self.logger.info(f"🔁 Rows of {moved[0]} were deleted since the last update, rebuilding")
+            self.reset(self.since)
+
+        clustered = batches = 0
+        for name, collection in sources:
+            offset = self.offsets.get(name, 0)
+            while True:
+                got = collection.get(limit=self.batch_size, offset=offset,
+                                     include=["embeddings", "documents", "metadatas"])
+                if not got["ids"]:
+                    break
+                offset += len(got["ids"])
+                self.marks[name] = got["ids"][-1]
+
+                ts = self.timestamps(got["metadatas"])
+                keep = np.ones(len(ts), dtype=bool) if self.since is None else ts >= self.since
+                if keep.any():
+                    rows = np.flatnonzero(keep)
+                    new = self.add([got["ids"][i] for i in rows], np.asarray(got["embeddings"])[rows],
+                                   [got["documents"][i] for i in rows], ts[rows])
+                    clustered += len(rows)
+                    self.logger.debug(f"🧩 {name}: +{len(rows)} rows, {new} new clusters, {len(self)} total")
+
+                self.offsets[name] = offset
+                batches += 1
+                if batches % self.save_every == 0:
+                    self.save()
+            self.offsets[name] = offset
+
+        self.save()
+        self.logger.info(f"🧩 Clustered {clustered} new rows into {len(self)} clusters")
+        return clustered
+
+    def top(self, n: int = 20, start: float = None, end: float = None):
+        """Clusters seen within [start, end), largest first."""
+        if not len(self):
+            return []
+        keep = np.ones(len(self), dtype=bool)
+        if start is not None:
+            keep &= self.last >= start
+        if end is not None:
+            keep &= self.first < end
+        candidates = np.flatnonzero(keep)
+        ranked = candidates[np.argsort(-self.counts[candidates], kind="stable")][:n]
+
+        return [
+            {
+                "rank": rank,
+                "cluster": int(c),
+                "count": int(self.counts[c]),
+                "first_seen": iso(self.first[c]),
+                "last_seen": iso(self.last[c]),
+                "representative": {"id": self.rep_ids[c], "document": self.rep_documents[c]},
+            }
+            for rank, c in enumerate(ranked, start=1)
+        ]
@@ -0,0 +1,44 @@
+import hashlib
+import re
+from functools import lru_cache
+
+# Drain-style variable masks, most specific first so e.g. a timestamp is not
+# chopped into numbers before it can match as a whole
+MASKS = [
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?\b"), "<TS>"),
+    (re.compile(r"\b\d{1,2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2}(?: [+-]\d{4})?"), "<TS>"),
+    (re.compile(r"\b\w{3} +\d{1,2} \d{2}:\d{2}:\d{2}\b"), "<TS>"),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}\b"), "<DATE>"),
+    (re.compile(r"\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b"), "<TIME>"),
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<UUID>"),
+    (re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}(?::\d{1,5})?\b"), "<IP>"),
+    (re.compile(r"\b(?:[0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}\b"), "<IP>"),
+    (re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.-]+\b"), "<EMAIL>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b"), "<HEX>"),
+    (re.compile(r"\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{12,}\b"), "<HEX>"),
+    (re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?![\w.])"), "<NUM>"),
+]
+
+
+class RCALogTemplater:
+    """
+    Collapses log lines that only differ in variable tokens (timestamps, UUIDs,
+    IPs, hex ids, numbers) into one template. Template ids are a hash of the
+    masked text, so the same template gets the same id in every run.
+    """
+
+    def __init__(self, cache_size: int = 65536):
+        self.template = lru_cache(maxsize=cache_size)(self._template)
+
+    @staticmethod
+    def _template(text: str) -> str:
+        for pattern, mask in MASKS:
+            text = pattern.sub(mask, text)
+        return " ".join(text.split())
+
+    @staticmethod
+    def template_id(template: str) -> str:
+        return hashlib.sha1(template.encode("utf-8")).hexdigest()[:16]
+
+    def template_ids(self, texts):
+        return [self.template_id(self.template(t if isinstance(t, str) else "")) for t in texts]
@@ -0,0 +1,294 @@
+import configparser
+import sqlite3
+import threading
+from pathlib import Path
+
+from utils import setup_logger, parse_timestamp
+from utils.RCAMetrics import count
+from vectorEmbeddings.quantStore import where_sql
+
+# Level spellings seen in the wild, each mapped to one canonical name
+LEVELS = {
+    "critical": ("critical", "crit", "fatal", "emerg", "emergency", "alert", "panic"),
+    "error": ("error", "err", "e", "severe"),
+    "warning": ("warning", "warn", "w"),
+    "info": ("info", "information", "informational", "notice", "i"),
+    "debug": ("debug", "dbg", "d", "fine"),
+    "trace": ("trace", "t", "verbose", "finer", "finest"),
+}
+LEVEL_NAMES = {alias: level for level, aliases in LEVELS.items() for alias in aliases}
+# Syslog severities 0 (emergency) to 7 (debug)
+SYSLOG_LEVELS = ("critical", "critical", "critical", "error", "warning", "info", "info", "debug")
+INDEXED_OPS = {"$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin"}
+DEFAULT_FIELDS = "timestamp:time, level:level, service:lower"
+DEFAULT_ALIASES = "level=severity|lvl|loglevel, service=app|service_name"
+
+
+def coerce_level(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return SYSLOG_LEVELS[int(value)] if 0 <= value < len(SYSLOG_LEVELS) else None
+    text = str(value).strip().lower()
+    return LEVEL_NAMES.get(text, text) or None
+
+
+def coerce_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes", "on"):
+        return True
+    if text in ("0", "false", "no", "off"):
+        return False
+    return None
+
+
+# type: (coercion, SQLite column type); a coercion returning None drops the value
+TYPES = {
+    "str": (str, "TEXT"),
+    "lower": (lambda v: str(v).strip().lower(), "TEXT"),
+    "int": (lambda v: int(float(v)), "INTEGER"),
+    "float": (float, "REAL"),
+    "bool": (coerce_bool, "INTEGER"),
+    "time": (parse_timestamp, "REAL"),
+    "level": (coerce_level, "TEXT"),
+}
+
+
+def sections(collection_name: str):
+    """[Metadata], then [Metadata.<base>] and [Metadata.<collection>]; partitions use their base name's."""
+    return ("Metadata", f"Metadata.{collection_name.split('__')[0]}", f"Metadata.{collection_name}")
+
+
+class RCAMetadataSchema:
+    """
+    Typed metadata fields of one collection.
+
+    `fields = timestamp:time, level:level, service:lower` declares each
+    field's type; `aliases = level=severity|lvl` names other keys a field is
+    read from when it is missing. Coercion normalizes the values written
+    (ISO or millisecond timestamps to epoch seconds, ERR/E/3 to "error") and
+    the operands of where filters, so both compare the same way.
+    """
+
+    def __init__(self, config: configparser.ConfigParser, collection_name: str):
+        self.logger = setup_logger("MetadataIndex")
+        fields, aliases = DEFAULT_FIELDS, DEFAULT_ALIASES
+        for section in sections(collection_name):
+            if config.has_section(section):
+                fields = config.get(section, "fields", fallback=fields).strip()
+                aliases = config.get(section, "aliases", fallback=aliases).strip()
+
+        self.fields = {}
+        for spec in filter(None, (s.strip() for s in fields.split(","))):
+            name, _, kind = spec.partition(":")
+            kind = kind.strip().lower() or "str"
+            if kind not in TYPES:
+                raise ValueError(f"❌ [Metadata] type of {name.strip()} must be one of {list(TYPES)}, got {kind}")
+            self.fields[name.strip()] = kind
+
+        self.aliases = {}
+        for spec in filter(None, (s.strip() for s in aliases.split(","))):
+            name, _, keys = spec.partition("=")
+            self.aliases[name.strip()] = [k.strip() for k in keys.split("|") if k.strip()]
+
+    def coerce_value(self, name: str, value):
+        try:
+            return TYPES[self.fields[name]][0](value)
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+    def coerce(self, metadata: dict):
+        """A copy of `metadata` with the declared fields typed; values that don't parse are dropped."""
+        if not metadata:
+            return metadata
+        out = dict(metadata)
+        for name in self.fields:
+            value = out.get(name)
+            if value is None:
+                value = next((out[k] for k in self.aliases.get(name, ()) if out.get(k) is not None), None)
+                if value is None:
+                    continue
+            typed = self.coerce_value(name, value)
+            if typed is None:
+                out.pop(name, None)
+                count("metadata.invalid", field=name)
+            else:
+                out[name] = typed
+        # Chroma refuses empty metadata dicts
+        return out or None
+
+    def coerce_all(self, metadatas):
+        return [self.coerce(m) for m in metadatas] if metadatas is not None else None
+
+    def coerce_where(self, where: dict):
+        """`where` with the operands of declared fields coerced like the stored values."""
+        if not where:
+            return where
+        out = {}
+        for key, value in where.items():
+            if key in ("$and", "$or"):
+                out[key] = [self.coerce_where(w) for w in value]
+            elif key not in self.fields:
+                out[key] = value
+            elif isinstance(value, dict):
+                out[key] = {op: [self._operand(key, v) for v in operand] if op in ("$in", "$nin")
+                            else self._operand(key, operand) for op, operand in value.items()}
+            else:
+                out[key] = self._operand(key, value)
+        return out
+
+    def _operand(self, name: str, value):
+        # An operand that doesn't parse is kept and simply matches nothing
+        typed = self.coerce_value(name, value)
+        return value if typed is None else typed
+
+
+class RCAMetadataIndex:
+    """
+    SQLite secondary index over a collection's typed metadata fields.
+
+    One row per stored id with a column (and a B-tree index) per declared
+    field, kept in step by the collection's write hooks. `candidates` turns
+    the indexed part of a where filter into the matching ids, so a selective
+    filter such as service=payment AND level=error in the last 15 minutes is
+    answered by the index and the vector search only scores those ids.
+    Filters matching more than `prefilter_max` rows are left to Chroma.
+
+    A field declared after rows were indexed is marked incomplete and never
+    used for pre-filtering, since the earlier rows have no value in it.
+    """
+
+    def __init__(self, config: configparser.ConfigParser, collection_name: str):
+        self.logger = setup_logger("MetadataIndex")
+        self.schema = RCAMetadataSchema(config, collection_name)
+        self.prefilter_max = int(config.get("Metadata", "prefilter_max", fallback="20000").strip())
+        self.timestamp_field = config.get("Partition", "timestamp_field", fallback="timestamp").strip()
+
+        index_dir = Path(config.get("Metadata", "index_dir", fallback="MetadataIndex").strip())
+        index_dir = index_dir if index_dir.is_absolute() else Path.cwd() / index_dir
+        index_dir.mkdir(parents=True, exist_ok=True)
+        self.path = index_dir / f"{collection_name}.sqlite"
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS rows (id TEXT PRIMARY KEY, ts REAL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS rows_ts ON rows(ts)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS fields (name TEXT PRIMARY KEY, kind TEXT, complete INTEGER)")
+            self.complete = self._sync_fields()
+
+    @staticmethod
+    def column(name: str):
+        return '"' + f"f_{name}".replace('"', '""') + '"'
+
+    def _sync_fields(self):
+        """Add columns for newly declared fields; returns the fields that cover every row."""
+        declared = {name: (kind, complete) for name, kind, complete in self.conn.execute("SELECT * FROM fields")}
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(rows)")}
+        empty = self.conn.execute("SELECT 1 FROM rows LIMIT 1").fetchone() is None
+
+        for name, kind in self.schema.fields.items():
+            if f"f_{name}" not in columns:
+                self.conn.execute(f"ALTER TABLE rows ADD COLUMN {self.column(name)} {TYPES[kind][1]}")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {self.column('ix_' + name)} ON rows({self.column(name)})")
+            if name not in declared or declared[name][0] != kind:
+                if not empty:
+                    self.logger.warning(f"⚠️ Metadata field {name} ({kind}) declared after rows were indexed, "
+                                        f"filters on it are left to Chroma")
+                self.conn.execute("INSERT OR REPLACE INTO fields VALUES (?, ?, ?)", (name, kind, int(empty)))
+
+        return {name for name, complete in self.conn.execute("SELECT name, complete FROM fields")
+                if complete and name in self.schema.fields}
+
+    def add(self, ids, metadatas):
+        """Write hook: index (or re-index) one written batch of already coerced metadata."""
+        names = list(self.schema.fields)
+        sql = f"INSERT OR REPLACE INTO rows (id, ts{''.join(', ' + self.column(n) for n in names)}) " \
+              f"VALUES ({','.join('?' * (len(names) + 2))})"
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+        rows = (
+            [id_, parse_timestamp(meta.get(self.timestamp_field))] + [meta.get(n) for n in names]
+            for id_, meta in zip(ids, ((m or {}) for m in metadatas))
+        )
+        with self.lock, self.conn:
+            self.conn.executemany(sql, rows)
+
+    def delete(self, ids):
+        ids = list(ids)
+        with self.lock, self.conn:
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                self.conn.execute(f"DELETE FROM rows WHERE id IN ({','.join('?' * len(part))})", part)
+
+    def delete_before(self, ts: float):
+        """Drop rows older than `ts`, e.g. after partition retention."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM rows WHERE ts < ?", (ts,))
+
+    def indexable(self, where: dict):
+        """Whether the index alone can evaluate `where`."""
+        for key, value in where.items():
+            if key in ("$and", "$or"):
+                if not all(self.indexable(w) for w in value):
+                    return False
+            elif key not in self.complete:
+                return False
+            elif isinstance(value, dict) and not set(value) <= INDEXED_OPS:
+                return False
+        return True
+
+    def split(self, where: dict):
+        """(the AND terms of `where` the index can answer, the rest for Chroma), either None when empty."""
+        if not where:
+            return None, None
+        terms = list(where["$and"]) if set(where) == {"$and"} else [{k: v} for k, v in where.items()]
+        mine = [t for t in terms if self.indexable(t)]
+        rest = [t for t in terms if not self.indexable(t)]
+
+        def join(clauses):
+            return None if not clauses else clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+        return join(mine), join(rest)
+
+    def candidates(self, where: dict, start: float = None, end: float = None):
+        """
+        ([(id, ts)], rest) when the indexed part of `where` and the time range
+        match at most `prefilter_max` rows, `rest` being what Chroma still has
+        to check. (None, where) when nothing is indexable or it isn't selective.
+        """
+        mine, rest = self.split(where)
+        if mine is None:
+            return None, where
+
+        params = []
+        sql = f"SELECT id, ts FROM rows WHERE {where_sql(mine, params, lambda key, _: self.column(key))}"
+        if start is not None:
+            sql += " AND ts >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND ts < ?"
+            params.append(end)
+        sql += " LIMIT ?"
+        params.append(self.prefilter_max + 1)
+
+        with self.lock:
+            found = self.conn.execute(sql, params).fetchall()
+        if len(found) > self.prefilter_max:
+            return None, where
+        return found, rest
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_metadata_index(config: configparser.ConfigParser, collection_name: str):
+    """The collection's metadata index when [Metadata] is enabled, else None."""
+    if not config.getboolean("Metadata", "enabled", fallback=False):
+        return None
+    return RCAMetadataIndex(config, collection_name)
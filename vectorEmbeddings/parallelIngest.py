@@ -0,0 +1,208 @@
+import configparser
+import glob
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from utils import setup_logger
+from vectorEmbeddings.ingestDB import StreamingRecordReader, iter_chunks, ndjson_shards
+from vectorEmbeddings.ingestJob import last_wins
+from vectorEmbeddings.logTemplate import RCALogTemplater
+
+DATA_SUFFIXES = (".csv", ".json", ".ndjson", ".jsonl")
+
+_DONE = None
+# Seconds an embed thread waits for parsed chunks before checking the parse workers are still alive
+WORKER_POLL = 1.0
+
+
+def expand_sources(patterns):
+    """Data files named by `patterns`: files, directories (searched recursively) or globs."""
+    files = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            files.extend(p for p in sorted(path.rglob("*")) if p.suffix.lower() in DATA_SUFFIXES and p.is_file())
+        elif path.is_file():
+            files.append(path)
+        else:
+            files.extend(Path(p) for p in sorted(glob.glob(pattern, recursive=True))
+                         if Path(p).suffix.lower() in DATA_SUFFIXES and Path(p).is_file())
+    return list(dict.fromkeys(p.resolve() for p in files))
+
+
+def plan_shards(files, shard_bytes: int):
+    """(path, start, end) work items; NDJSON is split into line-aligned byte ranges, other formats go whole."""
+    shards = []
+    for path in files:
+        if StreamingRecordReader.detect_format(path) == "ndjson":
+            shards.extend((str(path), start, end) for start, end in ndjson_shards(path, shard_bytes))
+        else:
+            shards.append((str(path), 0, None))
+    # Biggest first so one large file doesn't start last and hold up the end of the run
+    return sorted(shards, key=lambda s: -((s[2] or Path(s[0]).stat().st_size) - s[1]))
+
+
+def parse_worker(tasks, results, chunk_size: int, templates: bool):
+    """
+    Process pool side: read shards, mask templates and send ready chunks as
+    (ids, documents, metadatas, templates). Repeated ids within a chunk keep
+    their last row, as in RCAIngestJob. A full results queue blocks the
+    worker, which keeps parsing from running ahead of embedding.
+    """
+    templater = RCALogTemplater() if templates else None
+    task = None
+    try:
+        while (task := tasks.get()) is not _DONE:
+            path, start, end = task
+            reader = StreamingRecordReader(path, start_offset=start, end_offset=end)
+            for ids, documents, metadatas in iter_chunks(reader, chunk_size):
+                ids, documents, metadatas = last_wins(ids, documents, metadatas)
+                masks = [templater.template(d if isinstance(d, str) else "") for d in documents] if templater else None
+                results.put((ids, documents, metadatas, masks))
+    except Exception as e:
+        where = f" on {task[0]}" if isinstance(task, tuple) and task else ""
+        results.put(ValueError(f"❌ Parse worker failed{where}: {e}"))
+    finally:
+        results.put(_DONE)
+
+
+class RCAParallelIngest:
+    """
+    Multi-process ingest of many log files into one collection.
+
+    Files are cut into shards (line-aligned byte ranges for NDJSON, whole files
+    otherwise) and parsed and template-masked by a pool of processes. Their
+    chunks flow through bounded queues into `embed_tasks` embedding threads
+    and one writer thread in this process, so the single embedder keeps its
+    pooled HTTP concurrency and cache, and Chroma sees one upserting client.
+    """
+
+    def __init__(self, config: configparser.ConfigParser, db, embedder):
+        self.logger = setup_logger("ParallelIngest")
+        self.db = db
+        self.embedder = embedder
+        self.chunk_size = int(config.get("Ingest", "chunk_size", fallback="2000").strip())
+        self.workers = int(config.get("Ingest", "parallel_workers", fallback="0").strip()) or os.cpu_count() or 1
+        self.shard_bytes = int(float(config.get("Ingest", "parallel_shard_mb", fallback="64").strip()) * (1 << 20))
+        self.queue_size = int(config.get("Ingest", "parallel_queue_size", fallback="8").strip())
+        self.embed_tasks = int(config.get("Ingest", "parallel_embed_tasks", fallback="2").strip())
+
+    def run(self, patterns, on_written=None):
+        """Ingest every data file matched by `patterns`; returns a summary dict."""
+        files = expand_sources(patterns)
+        if not files:
+            raise ValueError(f"❌ No {'/'.join(DATA_SUFFIXES)} files found in {list(patterns)}")
+        shards = plan_shards(files, self.shard_bytes)
+        workers = max(1, min(self.workers, len(shards)))
+        self.logger.info(f"🚀 {len(files)} files, {len(shards)} shards, {workers} parse workers")
+
+        # spawn: the parent holds HTTP pools and Chroma threads that must not be forked
+        ctx = multiprocessing.get_context("spawn")
+        tasks = ctx.Queue()
+        parsed = ctx.Queue(maxsize=self.queue_size)
+        embedded = queue.Queue(maxsize=self.queue_size)
+        for shard in shards:
+            tasks.put(shard)
+        for _ in range(workers):
+            tasks.put(_DONE)
+
+        procs = [
+            ctx.Process(target=parse_worker, args=(tasks, parsed, self.chunk_size, self.embedder.templater is not None),
+                        daemon=True)
+            for _ in range(workers)
+        ]
+        for p in procs:
+            p.start()
+
+        state = {"workers_left": workers, "written": 0, "chunks": 0}
+        errors = []
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def embed_loop():
+            while not stop.is_set():
+                with lock:
+                    if state["workers_left"] == 0:
+                        return
+                    # One thread at a time takes from the process queue so the
+                    # sentinel count stays exact
+                    try:
+                        item = parsed.get(timeout=WORKER_POLL)
+                    except queue.Empty:
+                        # A worker killed by a signal (OOM killer, segfault) never sends its sentinel
+                        dead = [p for p in procs if p.exitcode is not None and p.exitcode < 0]
+                        if dead or not any(p.is_alive() for p in procs):
+                            code = dead[0].exitcode if dead else None
+                            errors.append(RuntimeError(f"❌ A parse worker died (exit code {code}) "
+                                                       f"before finishing its shards"))
+                            stop.set()
+                            return
+                        continue
+                    if item is _DONE:
+                        state["workers_left"] -= 1
+                        continue
+                if isinstance(item, Exception):
+                    errors.append(item)
+                    stop.set()
+                    return
+                ids, documents, metadatas, masks = item
+                try:
+                    embeddings = self.embedder.embed_texts(documents, templates=masks)
+                    metadatas = self.embedder.annotate_templates(documents, metadatas, templates=masks)
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+                    return
+                embedded.put((ids, documents, metadatas, embeddings))
+
+        def write_loop():
+            while (item := embedded.get()) is not _DONE:
+                if stop.is_set():
+                    continue
+                try:
+                    self.db.upsert_batch(*item)
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+                    continue
+                state["written"] += len(item[0])
+                state["chunks"] += 1
+                if on_written:
+                    on_written(len(item[0]), state["written"])
+
+        started = time.perf_counter()
+        writer = threading.Thread(target=write_loop, name="ingest-writer")
+        writer.start()
+        embedders = [threading.Thread(target=embed_loop, name=f"ingest-embed-{i}") for i in range(self.embed_tasks)]
+        for t in embedders:
+            t.start()
+        for t in embedders:
+            t.join()
+        embedded.put(_DONE)
+        writer.join()
+
+        if errors:
+            for p in procs:
+                p.terminate()
+        for p in procs:
+            p.join()
+
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            "files": len(files),
+            "shards": len(shards),
+            "workers": workers,
+            "chunks": state["chunks"],
+            "written": state["written"],
+            "seconds": round(elapsed, 3),
+            "docs_per_sec": round(state["written"] / elapsed, 1) if elapsed else None,
+        }
+        self.logger.info(f"✅ Parallel ingest wrote {summary['written']} documents in {summary['seconds']}s")
+        return summary
@@ -0,0 +1,301 @@
+import configparser
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from utils import setup_logger, parse_timestamp
+from utils.RCAMetrics import count, span
+from vectorEmbeddings.createDB import (CreateVectorDB, SERVED_BY_KEY, TIMESTAMP_FIELD, QUERY_INCLUDE, empty_result,
+                                       time_where)
+from vectorEmbeddings.lexicalIndex import open_lexical_index
+from vectorEmbeddings.metadataIndex import open_metadata_index
+
+GRANULARITY = {
+    "hourly": ("h", "%Y%m%d%H", 3600),
+    "daily": ("d", "%Y%m%d", 86400),
+}
+UNDATED = "undated"
+
+
+class PartitionedVectorDB(CreateVectorDB):
+    """
+    Time-partitioned collections on top of an already connected CreateVectorDB.
+
+    Documents are routed by the timestamp field in their metadata into one
+    collection per hour or day, named `<base>__h2025010112` / `<base>__d20250101`.
+    Documents without a parseable timestamp go to `<base>__undated`. A query
+    with a time range only touches the partitions overlapping it and merges
+    their top-k; retention drops whole partitions.
+    """
+
+    def __init__(self, config: configparser.ConfigParser, db: CreateVectorDB):
+        super().__init__(config)
+        self.logger = setup_logger("Partitions")
+        self.client = db.client
+        self.max_batch_size = db.max_batch_size
+
+        granularity = config.get("Partition", "granularity", fallback="hourly").strip().lower()
+        if granularity not in GRANULARITY:
+            raise ValueError(f"❌ [Partition] granularity must be one of {list(GRANULARITY)}, got {granularity}")
+        self.prefix, self.fmt, self.span = GRANULARITY[granularity]
+        self.timestamp_field = config.get("Partition", "timestamp_field", fallback="timestamp").strip()
+        self.retention_days = float(config.get("Partition", "retention_days", fallback="0").strip())
+        self.query_workers = int(config.get("Partition", "query_workers", fallback="8").strip())
+
+        self.base = None
+        self.partitions = {}
+
+    def get_collection(self, name: str):
+        self.base = name
+        self.partitions = {}
+        # One lexical and one metadata index across all partitions, pruned along with them
+        self.lexical = open_lexical_index(self.config, name)
+        self.metadata_index = open_metadata_index(self.config, name)
+
+    @property
+    def collection_name(self):
+        return self.base
+
+    def partition_name(self, ts):
+        if ts is None:
+            return f"{self.base}__{UNDATED}"
+        bucket = datetime.fromtimestamp(ts, tz=timezone.utc).strftime(self.fmt)
+        return f"{self.base}__{self.prefix}{bucket}"
+
+    def partition_start(self, name: str):
+        """Epoch start of a partition's bucket, None for undated or foreign collections."""
+        if not name.startswith(f"{self.base}__{self.prefix}"):
+            return None
+        try:
+            return datetime.strptime(name[len(self.base) + 3:], self.fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            return None
+
+    def _partition(self, name: str):
+        collection = self.partitions.get(name)
+        if collection is None:
+            collection = self.resolve(self.client.get_or_create_collection(
+                name=name,
+                configuration=self.collection_configuration(name)
+            ))
+            self.followed[name] = time.monotonic()
+        else:
+            collection = self.follow(name, collection)
+        self.partitions[name] = collection
+        return collection
+
+    def list_partitions(self):
+        names = [c if isinstance(c, str) else c.name for c in self.client.list_collections()]
+        return sorted(n for n in names if n.startswith(f"{self.base}__"))
+
+    def add_batch(self, ids, documents, metadatas, embeddings):
+        """Route rows to their time partitions; the normalized time is stored as `ts_epoch`."""
+        return self._route_batch("add", ids, documents, metadatas, embeddings)
+
+    def upsert_batch(self, ids, documents, metadatas, embeddings):
+        return self._route_batch("upsert", ids, documents, metadatas, embeddings)
+
+    def stamp(self, metadata):
+        """(partition name, metadata with `ts_epoch` added when the row has a parseable timestamp)."""
+        ts = parse_timestamp((metadata or {}).get(self.timestamp_field))
+        if ts is not None:
+            metadata = dict(metadata, **{TIMESTAMP_FIELD: ts})
+        return self.partition_name(ts), metadata
+
+    def insert(self, log_id, message, metadata):
+        """One document, embedded by Chroma, added to its time partition."""
+        [metadata] = self.coerce_metadata([metadata])
+        name, metadata = self.stamp(metadata)
+        self._partition(name).add(ids=[log_id], documents=[message], metadatas=[metadata])
+        self.index_lexical([log_id], [message], [metadata])
+        self.index_metadata([log_id], [metadata])
+        self.generation += 1
+
+        return [log_id]
+
+    def _route_batch(self, method: str, ids, documents, metadatas, embeddings):
+        groups = {}
+        metadatas = list(self.coerce_metadata(metadatas))
+        for i, meta in enumerate(metadatas):
+            name, metadatas[i] = self.stamp(meta)
+            groups.setdefault(name, []).append(i)
+
+        step = self.get_max_batch_size()
+        for name, rows in groups.items():
+            collection = self._partition(name)
+            self.ensure_model(collection, embeddings)
+            write = getattr(collection, method)
+            with span("db.write"):
+                for j in range(0, len(rows), step):
+                    part = rows[j:j + step]
+                    write(
+                        ids=[ids[i] for i in part],
+                        documents=[documents[i] for i in part],
+                        metadatas=[metadatas[i] for i in part],
+                        embeddings=embeddings[np.asarray(part)] if isinstance(embeddings, np.ndarray)
+                        else [embeddings[i] for i in part]
+                    )
+        count("db.rows", len(ids))
+        self.index_lexical(ids, documents, metadatas)
+        self.index_metadata(ids, metadatas)
+        self.generation += 1
+
+        return ids
+
+    def existing_ids(self, ids):
+        """Ids already stored in any partition; a row's partition can't be known without its metadata."""
+        remaining = list(ids)
+        found = set()
+        step = self.get_max_batch_size()
+        for name in self.list_partitions():
+            if not remaining:
+                break
+            collection = self._partition(name)
+            for i in range(0, len(remaining), step):
+                found.update(collection.get(ids=remaining[i:i + step], include=[])["ids"])
+            remaining = [i for i in remaining if i not in found]
+        return found
+
+    def partitions_between(self, start=None, end=None):
+        """Partitions whose bucket overlaps [start, end)."""
+        names = []
+        for name in self.list_partitions():
+            bucket = self.partition_start(name)
+            if bucket is None:
+                # Undated documents can't satisfy a time bound
+                if start is None and end is None and name == f"{self.base}__{UNDATED}":
+                    names.append(name)
+                continue
+            if (end is None or bucket < end) and (start is None or bucket + self.span > start):
+                names.append(name)
+        return names
+
+    def source_collections(self, start=None):
+        return [(name, self._partition(name)) for name in self.partitions_between(start)]
+
+    def replace_collection(self, name: str, collection):
+        self.partitions[name] = collection
+        self.followed[name] = time.monotonic()
+        self.generation += 1
+
+    def get_records(self, ids, where: dict = None, start=None, end=None, payloads: bool = True):
+        """
+        {id: (document, metadata)} looked up in the partitions overlapping [start, end).
+        Without `payloads` only which ids pass is fetched, as {id: None}.
+        """
+        if self.metadata_index is not None:
+            where = self.metadata_index.schema.coerce_where(where)
+        include = ["documents", "metadatas"] if payloads else []
+        remaining = list(ids)
+        records = {}
+        step = self.get_max_batch_size()
+        for name in self.partitions_between(start, end):
+            if not remaining:
+                break
+            collection = self._partition(name)
+            for i in range(0, len(remaining), step):
+                got = collection.get(ids=remaining[i:i + step], where=time_where(where, start, end), include=include)
+                records.update(zip(got["ids"], zip(got["documents"], got["metadatas"])) if payloads
+                               else dict.fromkeys(got["ids"]))
+            remaining = [i for i in remaining if i not in records]
+        return records
+
+    def query(self, queryText: list, n_results: int = 10, where: dict = None):
+        """Text query over every partition, embedded by Chroma, merged like `query_embeddings`."""
+        return self._query_partitions({"query_texts": queryText}, len(queryText), n_results, where)
+
+    def query_embeddings(self, embeddings, n_results: int = 10, where: dict = None, start=None, end=None,
+                         include=QUERY_INCLUDE):
+        """Query the partitions overlapping [start, end) and merge their per-query top-k by distance."""
+        return self._query_partitions({"query_embeddings": embeddings}, len(embeddings), n_results, where, start,
+                                      end, include)
+
+    def _query_partitions(self, queries: dict, num_queries: int, n_results: int, where: dict = None, start=None,
+                          end=None, include=QUERY_INCLUDE):
+        # Merging needs the distances even when the caller only wants ids
+        include = list(dict.fromkeys(list(include) + ["distances"]))
+        names = self.partitions_between(start, end)
+
+        # Pre-filtered ids also tell which partitions can hold a hit at all
+        candidates, where = self.prefilter(where, start, end)
+        wanted = {}
+        if candidates is not None:
+            for id_, ts in candidates:
+                wanted.setdefault(self.partition_name(ts), []).append(id_)
+            names = [name for name in names if name in wanted]
+            if not names:
+                return empty_result(num_queries, include)
+
+        self.logger.debug(f"🗂️ Query touches {len(names)} partitions")
+        if "query_embeddings" in queries:
+            for name in names:
+                self.check_model(self._partition(name), queries["query_embeddings"])
+        merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if not names:
+            for field in merged:
+                merged[field] = [[] for _ in range(num_queries)]
+            return merged
+
+        def run(name):
+            bucket = self.partition_start(name)
+            # Partitions fully inside the range need no extra time filter
+            inside = bucket is not None and (start is None or bucket >= start) and \
+                (end is None or bucket + self.span <= end)
+            return self._partition(name).query(
+                **queries,
+                ids=wanted.get(name) if candidates is not None else None,
+                n_results=n_results,
+                where=(where or None) if inside else time_where(where, start, end),
+                include=include
+            )
+
+        with ThreadPoolExecutor(max_workers=min(self.query_workers, len(names))) as pool:
+            results = list(pool.map(run, names))
+
+        for q in range(num_queries):
+            rows = []
+            for result in results:
+                ids = result["ids"][q]
+                # Fields left out of `include` come back as None, keep them None per row
+                documents = result["documents"][q] if result.get("documents") else [None] * len(ids)
+                metadatas = result["metadatas"][q] if result.get("metadatas") else [None] * len(ids)
+                rows.extend(zip(ids, documents, metadatas, result["distances"][q]))
+            rows.sort(key=lambda row: row[3])
+            rows = rows[:n_results]
+            merged["ids"].append([r[0] for r in rows])
+            merged["documents"].append([r[1] for r in rows])
+            merged["metadatas"].append([r[2] for r in rows])
+            merged["distances"].append([r[3] for r in rows])
+
+        return merged
+
+    def drop_before(self, ts):
+        """Delete every partition whose bucket ends at or before `ts`; one collection drop each."""
+        dropped = []
+        for name in self.list_partitions():
+            bucket = self.partition_start(name)
+            if bucket is not None and bucket + self.span <= ts:
+                # A re-embedded partition's rows live in the collection its name points at
+                served_by = (self.client.get_collection(name).metadata or {}).get(SERVED_BY_KEY)
+                self.client.delete_collection(name=name)
+                if served_by:
+                    self.client.delete_collection(name=served_by)
+                self.partitions.pop(name, None)
+                dropped.append(name)
+
+        if dropped:
+            cutoff = max(self.partition_start(n) + self.span for n in dropped)
+            if self.lexical is not None:
+                self.lexical.delete_before(cutoff)
+            if self.metadata_index is not None:
+                self.metadata_index.delete_before(cutoff)
+            self.generation += 1
+            self.logger.info(f"🧹 Dropped {len(dropped)} partitions older than {datetime.fromtimestamp(ts, tz=timezone.utc)}")
+        return dropped
+
+    def apply_retention(self):
+        if self.retention_days > 0:
+            return self.drop_before(time.time() - self.retention_days * 86400)
+        return []
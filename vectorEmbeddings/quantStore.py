@@ -0,0 +1,486 @@
+import configparser
+import json
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils import setup_logger
+
+SPACES = ("l2", "cosine", "ip")
+FULL_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+# Chroma where operators and their SQL comparisons
+WHERE_OPS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def json_column(key: str, params: list):
+    params.append(f'$."{key}"')
+    return "json_extract(metadata, ?)"
+
+
+def where_sql(where: dict, params: list, column=json_column):
+    """
+    Translate a Chroma metadata `where` filter into SQL. `column(key, params)`
+    gives the SQL expression of a metadata key, by default a lookup in the
+    JSON metadata column.
+    """
+    if not where:
+        return "1"
+    clauses = []
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            joined = f" {key[1:].upper()} ".join(where_sql(w, params, column) for w in value)
+            clauses.append(f"({joined})")
+            continue
+
+        conditions = value if isinstance(value, dict) else {"$eq": value}
+        for op, operand in conditions.items():
+            field = column(key, params)
+            if op in ("$in", "$nin"):
+                params.extend(operand)
+                marks = ",".join("?" * len(operand))
+                clauses.append(f"{field} {'NOT ' if op == '$nin' else ''}IN ({marks})")
+            elif op in WHERE_OPS:
+                params.append(operand)
+                clauses.append(f"{field} {WHERE_OPS[op]} ?")
+            else:
+                raise ValueError(f"❌ Unsupported where operator {op} in a SQL filter")
+    return " AND ".join(clauses)
+
+
+def quantize(x: np.ndarray):
+    """Symmetric per-row int8 codes: x ≈ codes * scale."""
+    scales = np.abs(x).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.rint(x / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class MappedArray:
+    """Growable (rows, width) array in a memory-mapped file, capacity doubled as it fills."""
+
+    def __init__(self, path: Path, dtype, width: int):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.row_bytes = self.dtype.itemsize * max(1, width)
+        self.path.touch(exist_ok=True)
+        self.map()
+
+    def map(self):
+        capacity = self.path.stat().st_size // self.row_bytes
+        shape = (capacity, self.width) if self.width else (capacity,)
+        self.data = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=shape) if capacity else \
+            np.zeros(shape, dtype=self.dtype)
+
+    def ensure(self, rows: int):
+        if rows <= len(self.data):
+            return
+        capacity = max(rows, 2 * len(self.data), 1024)
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+        with open(self.path, "r+b") as f:
+            f.truncate(capacity * self.row_bytes)
+        self.map()
+
+    def flush(self):
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+
+
+class RCAQuantizedCollection:
+    """
+    Chroma collection look-alike that keeps vectors as int8 codes.
+
+    The codes (one byte per dimension plus a scale per row) are what a search
+    scans, in blocks, so only they need to stay in RAM: 4x less than float32.
+    The full-precision vectors live in a second memory-mapped file and are
+    read only for the `rerank_factor * n_results` best candidates, whose
+    exact distances decide the final order. Ids, documents and metadata are
+    in SQLite next to the vectors, row number = vector row.
+    """
+
+    def __init__(self, path: Path, name: str, configuration=None, metadata=None,
+                 rerank_factor: int = 8, scan_block: int = 16384, full_dtype: str = "float32"):
+        self.logger = setup_logger("QuantStore")
+        self.path = path
+        self.name = name
+        self.rerank_factor = max(1, rerank_factor)
+        self.scan_block = scan_block
+        self.full_dtype = full_dtype
+        self.lock = threading.RLock()
+        # Set by the client so a rename moves its cache entry
+        self.on_rename = getattr(self, "on_rename", None)
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path / "rows.sqlite"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS rows (row INTEGER PRIMARY KEY, id TEXT UNIQUE, document TEXT, metadata TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+        info = dict(self.conn.execute("SELECT key, value FROM info"))
+        self.configuration = json.loads(info["configuration"]) if "configuration" in info else (configuration or {})
+        self.metadata = json.loads(info["metadata"]) if "metadata" in info else metadata
+        self.space = ((self.configuration or {}).get("hnsw") or {}).get("space", "l2")
+        if self.space not in SPACES:
+            raise ValueError(f"❌ Quantized store supports spaces {SPACES}, got {self.space}")
+        self.dim = int(info["dim"]) if "dim" in info else None
+        self.full_dtype = info.get("full_dtype", full_dtype)
+        self.rows = self.conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM rows").fetchone()[0]
+        # Fewer than `rows` once rows were deleted, their vector slots stay allocated
+        self.live = self.conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        if "configuration" not in info:
+            self.save_info(configuration=json.dumps(self.configuration), metadata=json.dumps(self.metadata))
+        if self.dim:
+            self.open_arrays()
+
+    def reload_metadata(self):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM info WHERE key = 'metadata'").fetchone()
+        self.metadata = json.loads(row[0]) if row else self.metadata
+
+    def save_info(self, **values):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", values.items())
+
+    def open_arrays(self):
+        self.codes = MappedArray(self.path / "codes.i8", np.int8, self.dim)
+        self.scales = MappedArray(self.path / "scales.f32", np.float32, 0)
+        self.sqnorms = MappedArray(self.path / "sqnorms.f32", np.float32, 0)
+        self.full = MappedArray(self.path / f"vectors.{self.full_dtype}", FULL_DTYPES[self.full_dtype], self.dim)
+
+    def count(self):
+        return self.live
+
+    def modify(self, name: str = None, configuration: dict = None, metadata: dict = None):
+        """ef_search has no meaning without a graph; name and metadata changes are kept."""
+        with self.lock:
+            if configuration:
+                hnsw = dict((self.configuration or {}).get("hnsw") or {}, **(configuration.get("hnsw") or {}))
+                self.configuration = dict(self.configuration or {}, hnsw=hnsw)
+                self.save_info(configuration=json.dumps(self.configuration))
+            if metadata is not None:
+                self.metadata = metadata
+                self.save_info(metadata=json.dumps(metadata))
+            if name and name != self.name:
+                target = self.path.parent / name
+                if target.exists():
+                    raise ValueError(f"❌ Collection {name} already exists")
+                self.close()
+                self.path.rename(target)
+                old = self.name
+                self.__init__(target, name, rerank_factor=self.rerank_factor, scan_block=self.scan_block,
+                              full_dtype=self.full_dtype)
+                if self.on_rename is not None:
+                    self.on_rename(old, self)
+
+    def prepare(self, embeddings):
+        x = np.asarray(embeddings, dtype=np.float32)
+        if x.ndim != 2:
+            raise ValueError("❌ Embeddings must be a 2-D array")
+        if self.dim is None:
+            self.dim = x.shape[1]
+            self.save_info(dim=str(self.dim), full_dtype=self.full_dtype)
+            self.open_arrays()
+        elif x.shape[1] != self.dim:
+            raise ValueError(f"❌ Embedding dimension {x.shape[1]} doesn't match collection {self.name} ({self.dim})")
+        if self.space == "cosine":
+            norms = np.linalg.norm(x, axis=1, keepdims=True)
+            x = x / np.where(norms == 0, 1, norms)
+        return x
+
+    def write_rows(self, rows: np.ndarray, x: np.ndarray):
+        end = int(rows.max()) + 1
+        for column in (self.codes, self.scales, self.sqnorms, self.full):
+            column.ensure(end)
+        codes, scales = quantize(x)
+        self.codes.data[rows] = codes
+        self.scales.data[rows] = scales
+        self.sqnorms.data[rows] = (x * x).sum(axis=1)
+        self.full.data[rows] = x.astype(self.full.dtype)
+        for column in (self.codes, self.scales, self.sqnorms, self.full):
+            column.flush()
+
+    def _write(self, ids, documents, metadatas, embeddings, overwrite: bool):
+        ids = list(ids)
+        documents = list(documents) if documents is not None else [None] * len(ids)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(ids)
+        with self.lock:
+            x = self.prepare(embeddings)
+            existing = {}
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                existing.update(self.conn.execute(
+                    f"SELECT id, row FROM rows WHERE id IN ({','.join('?' * len(part))})", part))
+
+            rows, keep = [], []
+            for i, id_ in enumerate(ids):
+                if id_ in existing:
+                    if not overwrite:
+                        # Like Chroma: adding an id that exists is ignored
+                        continue
+                    rows.append(existing[id_])
+                else:
+                    rows.append(self.rows)
+                    existing[id_] = self.rows
+                    self.rows += 1
+                    self.live += 1
+                keep.append(i)
+            if not keep:
+                return
+
+            self.write_rows(np.asarray(rows), x[keep])
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO rows (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(row, ids[i], documents[i], json.dumps(metadatas[i]) if metadatas[i] else None)
+                     for row, i in zip(rows, keep)]
+                )
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None):
+        if embeddings is None:
+            raise ValueError("❌ The quantized store needs embeddings, it has no embedding function")
+        self._write(ids, documents, metadatas, embeddings, overwrite=False)
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None):
+        if embeddings is None:
+            raise ValueError("❌ The quantized store needs embeddings, it has no embedding function")
+        self._write(ids, documents, metadatas, embeddings, overwrite=True)
+
+    def delete(self, ids=None, where=None):
+        """Drop the rows matching `ids` and `where`, like Chroma; searches skip their vector slots from then on."""
+        with self.lock:
+            rows = [(r[0],) for r in self.select(ids, where)]
+            with self.conn:
+                self.conn.executemany("DELETE FROM rows WHERE row = ?", rows)
+            self.live -= len(rows)
+
+    def select(self, ids=None, where=None, limit=None, offset=None):
+        params = []
+        sql = f"SELECT row, id, document, metadata FROM rows WHERE {where_sql(where, params)}"
+        if ids is not None:
+            ids = list(ids)
+            sql += f" AND id IN ({','.join('?' * len(ids))})"
+            params.extend(ids)
+        sql += " ORDER BY row"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset or 0])
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        found = self.select(ids, where, limit, offset)
+        result = {"ids": [r[1] for r in found]}
+        if "documents" in include:
+            result["documents"] = [r[2] for r in found]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(r[3]) if r[3] else None for r in found]
+        if "embeddings" in include:
+            rows = np.asarray([r[0] for r in found], dtype=np.int64)
+            result["embeddings"] = np.asarray(self.full.data[rows], dtype=np.float32) if len(rows) and self.dim \
+                else np.zeros((0, self.dim or 0), dtype=np.float32)
+        return result
+
+    def candidate_rows(self, where, ids=None):
+        """Rows passing `where` (and among `ids`) as a sorted array, None when every vector row does."""
+        if not where and ids is None and self.live == self.rows:
+            return None
+        sql = "SELECT row FROM rows WHERE "
+        with self.lock:
+            if ids is None:
+                params = []
+                found = self.conn.execute(sql + where_sql(where, params), params)
+                return np.sort(np.fromiter((r for (r,) in found), dtype=np.int64))
+
+            ids = list(ids)
+            rows = []
+            for i in range(0, len(ids), 10000):
+                part = ids[i:i + 10000]
+                params = []
+                clause = where_sql(where, params)
+                found = self.conn.execute(sql + f"{clause} AND id IN ({','.join('?' * len(part))})", params + part)
+                rows.extend(r for (r,) in found)
+            return np.sort(np.asarray(rows, dtype=np.int64))
+
+    def exact_distances(self, x: np.ndarray, q: np.ndarray):
+        if self.space == "l2":
+            diff = x - q
+            return (diff * diff).sum(axis=1)
+        return 1 - x @ q
+
+    def search(self, queries: np.ndarray, n_results: int, rows: np.ndarray = None, rerank: bool = True,
+               exact: bool = False):
+        """
+        Best `n_results` rows and distances per query. Codes are scanned
+        block by block keeping the best `rerank_factor * n_results`, which are
+        re-scored with the full vectors. `exact` scans the full vectors
+        instead (ground truth for recall reports).
+        """
+        q = queries.astype(np.float32)
+        total = self.rows if rows is None else len(rows)
+        keep = min(total, n_results * (self.rerank_factor if rerank else 1))
+        if keep == 0 or not self.dim:
+            return [([], []) for _ in range(len(q))]
+        qn = (q * q).sum(axis=1)
+
+        best_scores = np.full((0, len(q)), np.inf, dtype=np.float32)
+        best_rows = np.zeros((0, len(q)), dtype=np.int64)
+        for start in range(0, total, self.scan_block):
+            block = np.arange(start, min(start + self.scan_block, total)) if rows is None else \
+                rows[start:start + self.scan_block]
+            if exact:
+                dots = np.asarray(self.full.data[block], dtype=np.float32) @ q.T
+            else:
+                dots = (self.codes.data[block].astype(np.float32) @ q.T) * self.scales.data[block][:, None]
+            scores = self.sqnorms.data[block][:, None] - 2 * dots + qn[None, :] if self.space == "l2" else 1 - dots
+
+            scores = np.vstack([best_scores, scores])
+            block_rows = np.vstack([best_rows, np.broadcast_to(block[:, None], (len(block), len(q)))])
+            if len(scores) > keep:
+                top = np.argpartition(scores, keep - 1, axis=0)[:keep]
+                scores = np.take_along_axis(scores, top, axis=0)
+                block_rows = np.take_along_axis(block_rows, top, axis=0)
+            best_scores, best_rows = scores, block_rows
+
+        results = []
+        for j in range(len(q)):
+            candidates = np.unique(best_rows[:, j])
+            if rerank and not exact:
+                distances = self.exact_distances(np.asarray(self.full.data[candidates], dtype=np.float32), q[j])
+            else:
+                distances = best_scores[:, j][np.argsort(best_rows[:, j])]
+            order = np.argsort(distances, kind="stable")[:n_results]
+            results.append((candidates[order], distances[order]))
+        return results
+
+    def query(self, query_embeddings=None, query_texts=None, ids=None, n_results: int = 10, where=None,
+              include=("documents", "metadatas", "distances")):
+        if query_embeddings is None:
+            raise ValueError("❌ The quantized store needs query embeddings, it has no embedding function")
+        with self.lock:
+            q = self.prepare(query_embeddings) if self.dim else np.asarray(query_embeddings, dtype=np.float32)
+            found = self.search(q, n_results, self.candidate_rows(where, ids))
+
+            # Payload columns are only read when asked for, like Chroma's include
+            columns = "row, id, " + ("document" if "documents" in include else "NULL") + ", " + \
+                ("metadata" if "metadatas" in include else "NULL")
+            by_row = {}
+            wanted = sorted({int(r) for rows, _ in found for r in rows})
+            for i in range(0, len(wanted), 500):
+                part = wanted[i:i + 500]
+                for row, id_, document, metadata in self.conn.execute(
+                        f"SELECT {columns} FROM rows WHERE row IN ({','.join('?' * len(part))})", part):
+                    by_row[row] = (id_, document, json.loads(metadata) if metadata else None)
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for rows, distances in found:
+            result["ids"].append([by_row[int(r)][0] for r in rows])
+            result["documents"].append([by_row[int(r)][1] for r in rows])
+            result["metadatas"].append([by_row[int(r)][2] for r in rows])
+            result["distances"].append([float(d) for d in distances])
+        for field in ("documents", "metadatas", "distances"):
+            if field not in include:
+                result[field] = None
+        return result
+
+    def footprint(self):
+        """Bytes a search keeps hot (codes, scales, norms) against the full-precision vectors."""
+        rows = self.rows
+        return {
+            "rows": rows,
+            "dim": self.dim,
+            "index_bytes": rows * ((self.dim or 0) + 8),
+            "float32_bytes": rows * (self.dim or 0) * 4,
+            "full_bytes": rows * (self.dim or 0) * np.dtype(FULL_DTYPES[self.full_dtype]).itemsize,
+        }
+
+    def recall_report(self, queries, k: int = 10):
+        """recall@k of codes-only and re-ranked search against an exact scan of the full vectors."""
+        with self.lock:
+            q = self.prepare(queries)
+            truth = [set(rows.tolist()) for rows, _ in self.search(q, k, exact=True)]
+            codes = [set(rows.tolist()) for rows, _ in self.search(q, k, rerank=False)]
+            reranked = [set(rows.tolist()) for rows, _ in self.search(q, k)]
+
+        def recall(found):
+            return round(sum(len(f & t) for f, t in zip(found, truth)) / max(1, sum(len(t) for t in truth)), 4)
+
+        footprint = self.footprint()
+        return {
+            f"recall@{k}_codes": recall(codes),
+            f"recall@{k}_reranked": recall(reranked),
+            "rerank_factor": self.rerank_factor,
+            "compression": round(footprint["float32_bytes"] / footprint["index_bytes"], 2) if footprint["index_bytes"] else None,
+            **footprint,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+            if self.dim:
+                for column in (self.codes, self.scales, self.sqnorms, self.full):
+                    column.flush()
+
+
+class RCAQuantizedClient:
+    """
+    Chroma client look-alike for the quantized store: one directory per
+    collection under [Quantized] path, so CreateVectorDB, time partitions and
+    the query engine work on it unchanged.
+    """
+
+    def __init__(self, config: configparser.ConfigParser):
+        self.logger = setup_logger("QuantStore")
+        root = Path(config.get("Quantized", "path", fallback="QuantizedEmbeddings").strip())
+        self.root = root if root.is_absolute() else Path.cwd() / root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.rerank_factor = int(config.get("Quantized", "rerank_factor", fallback="8").strip())
+        self.scan_block = int(config.get("Quantized", "scan_block", fallback="16384").strip())
+        self.full_dtype = config.get("Quantized", "full_dtype", fallback="float32").strip()
+        if self.full_dtype not in FULL_DTYPES:
+            raise ValueError(f"❌ [Quantized] full_dtype must be one of {list(FULL_DTYPES)}, got {self.full_dtype}")
+        self.max_batch_size = int(config.get("Quantized", "max_batch_size", fallback="5000").strip())
+        self.collections = {}
+        self.logger.info(f"🗜️ Using quantized int8 store at: {self.root}")
+
+    def get_max_batch_size(self):
+        return self.max_batch_size
+
+    def get_or_create_collection(self, name: str, configuration=None, metadata=None):
+        collection = self.collections.get(name)
+        if collection is None:
+            collection = RCAQuantizedCollection(
+                self.root / name, name, configuration=configuration, metadata=metadata,
+                rerank_factor=self.rerank_factor, scan_block=self.scan_block, full_dtype=self.full_dtype
+            )
+            collection.on_rename = self.renamed
+            self.collections[name] = collection
+        return collection
+
+    def renamed(self, old: str, collection: RCAQuantizedCollection):
+        if self.collections.get(old) is collection:
+            del self.collections[old]
+        self.collections[collection.name] = collection
+
+    def get_collection(self, name: str):
+        if name not in self.collections and not (self.root / name / "rows.sqlite").exists():
+            raise ValueError(f"❌ Collection {name} does not exist")
+        collection = self.get_or_create_collection(name)
+        # Another process may have changed it, e.g. a re-embedding pointing it elsewhere
+        collection.reload_metadata()
+        return collection
+
+    def list_collections(self):
+        return sorted(p.name for p in self.root.iterdir() if (p / "rows.sqlite").exists())
+
+    def delete_collection(self, name: str):
+        collection = self.collections.pop(name, None)
+        if collection is not None:
+            collection.close()
+        shutil.rmtree(self.root / name, ignore_errors=True)
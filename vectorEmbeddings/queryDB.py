@@ -0,0 +1,207 @@
+import configparser
+import copy
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utils import setup_logger
+from utils.RCAMetrics import count, span
+from vectorEmbeddings.lexicalIndex import reciprocal_rank_fusion
+
+RESULT_FIELDS = ("ids", "documents", "metadatas", "distances")
+# Lazy results leave the payloads in the DB until a page of them is shown
+LAZY_FIELDS = ("ids", "distances")
+
+
+class TTLCache:
+    """LRU cache whose entries also expire `ttl` seconds after being stored."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self.entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RCAQueryEngine:
+    """
+    Programmatic multi-query search over a CreateVectorDB collection.
+
+    All queries are embedded in one call, answered from a TTL/LRU result
+    cache where possible and the rest go to Chroma as a single query. Cache
+    keys are (collection, embedding hash, where filter, n_results) plus the
+    collection's write generation, so any write made through `db` invalidates
+    earlier results.
+
+    Hybrid queries also search the collection's BM25 index (`db.lexical`) and
+    fuse both rankings with reciprocal rank fusion, so exact tokens such as
+    error codes rank well even when their embeddings sit far from the query.
+    Hybrid results carry a `scores` list (the fused scores); `distances` is
+    None for documents found only lexically.
+
+    Lazy queries project the search down to ids and distances; the documents
+    and metadata are fetched a page at a time by `RCAResultPages`.
+    """
+
+    def __init__(self, config: configparser.ConfigParser, db, embedder):
+        self.logger = setup_logger("Query")
+        self.db = db
+        self.embedder = embedder
+        self.n_results = int(config.get("Query", "n_results", fallback="10").strip())
+        self.cache = TTLCache(
+            max_entries=int(config.get("Query", "cache_entries", fallback="1024").strip()),
+            ttl=float(config.get("Query", "cache_ttl", fallback="300").strip()),
+        )
+        self.window_bucket = float(config.get("Query", "window_bucket", fallback="60").strip())
+        self.hybrid = config.getboolean("Hybrid", "enabled", fallback=False)
+        self.candidates = int(config.get("Hybrid", "candidates", fallback="50").strip())
+        self.rrf_k = int(config.get("Hybrid", "rrf_k", fallback="60").strip())
+        self.weights = [
+            float(config.get("Hybrid", "vector_weight", fallback="1.0").strip()),
+            float(config.get("Hybrid", "lexical_weight", fallback="1.0").strip()),
+        ]
+
+    def bucketed(self, start, end):
+        """[start, end) widened to multiples of window_bucket, so a sliding window keeps its cache key."""
+        if self.window_bucket <= 0:
+            return start, end
+        if start is not None:
+            start = math.floor(start / self.window_bucket) * self.window_bucket
+        if end is not None:
+            end = math.ceil(end / self.window_bucket) * self.window_bucket
+        return start, end
+
+    def _key(self, embedding: np.ndarray, where, n_results: int, start, end, hybrid: bool, lazy: bool):
+        return (
+            hybrid,
+            lazy,
+            self.db.collection_name,
+            self.db.generation,
+            hashlib.sha1(np.ascontiguousarray(embedding, dtype=np.float32).tobytes()).hexdigest(),
+            json.dumps(where, sort_keys=True, default=str),
+            n_results,
+            start,
+            end,
+        )
+
+    def query(self, texts, n_results: int = None, where: dict = None, start: float = None, end: float = None,
+              hybrid: bool = None, lazy: bool = False):
+        """
+        Search for every text in `texts` and return one result per query:
+        {"query", "ids", "documents", "metadatas", "distances"} with flat lists.
+        `start`/`end` bound the documents' timestamps in epoch seconds, widened
+        to whole `window_bucket`s.
+        `hybrid` overrides [Hybrid] enabled for this call.
+        `lazy` leaves out "documents" and "metadatas", see `RCAResultPages`.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        n_results = n_results or self.n_results
+        hybrid = self.hybrid if hybrid is None else hybrid
+        start, end = self.bucketed(start, end)
+        if hybrid and self.db.lexical is None:
+            raise ValueError("❌ Hybrid search needs a lexical index, set [Hybrid] enabled = true before ingesting")
+
+        with span("query.embed"):
+            embeddings = self.embedder.embed_texts(texts)
+        keys = [self._key(e, where, n_results, start, end, hybrid, lazy) for e in embeddings]
+
+        results = [self.cache.get(k) for k in keys]
+        missing = [i for i, r in enumerate(results) if r is None]
+        count("query.cache_hits", len(texts) - len(missing))
+        count("query.cache_misses", len(missing))
+
+        if missing:
+            fetch = max(n_results, self.candidates) if hybrid else n_results
+            fields = LAZY_FIELDS if lazy else RESULT_FIELDS
+            with span("query.search"):
+                fresh = self.db.query_embeddings(embeddings[missing], n_results=fetch, where=where, start=start, end=end,
+                                                 include=fields[1:])
+            rows = [{field: (fresh.get(field) or [[]] * len(missing))[row] for field in fields}
+                    for row in range(len(missing))]
+            if hybrid:
+                with span("query.fuse"):
+                    rows = self._fuse([texts[i] for i in missing], rows, n_results, where, start, end)
+            for i, result in zip(missing, rows):
+                self.cache.put(keys[i], result)
+                results[i] = result
+
+        self.logger.debug(f"🔎 {len(texts)} queries, {len(texts) - len(missing)} served from cache")
+
+        # Callers get their own copies so they can't corrupt cached entries
+        return [dict(copy.deepcopy(r), query=t) for t, r in zip(texts, results)]
+
+    def _fuse(self, texts, vector_rows, n_results: int, where, start, end):
+        """RRF of each query's vector hits with its BM25 hits, cut to `n_results`."""
+        lexical = [[id_ for id_, _ in self.db.lexical.search(t, self.candidates, start, end)] for t in texts]
+
+        # Lexical hits the vector side didn't return are fetched in one lookup,
+        # which also applies the metadata filter the BM25 index doesn't know.
+        # Lazy rows carry no payloads, so only which ids pass is fetched.
+        lazy = bool(vector_rows) and "documents" not in vector_rows[0]
+        records = {}
+        for row in vector_rows:
+            records.update(zip(row["ids"], [None] * len(row["ids"]) if lazy else zip(row["documents"], row["metadatas"])))
+        unknown = {id_ for ids in lexical for id_ in ids if id_ not in records}
+        if unknown:
+            records.update(self.db.get_records(unknown, where, start, end, payloads=not lazy))
+
+        fused_rows = []
+        for row, ids in zip(vector_rows, lexical):
+            distances = dict(zip(row["ids"], row["distances"]))
+            ids = [id_ for id_ in ids if id_ in records]
+            fused = reciprocal_rank_fusion([row["ids"], ids], k=self.rrf_k, weights=self.weights)[:n_results]
+            fused_row = {
+                "ids": [id_ for id_, _ in fused],
+                "distances": [distances.get(id_) for id_, _ in fused],
+                "scores": [score for _, score in fused],
+            }
+            if not lazy:
+                fused_row["documents"] = [records[id_][0] for id_, _ in fused]
+                fused_row["metadatas"] = [records[id_][1] for id_, _ in fused]
+            fused_rows.append(fused_row)
+
+        self.logger.debug(f"🔀 Fused {len(texts)} queries with {sum(map(len, lexical))} lexical hits")
+        return fused_rows
+
+    def invalidate(self):
+        self.cache.clear()
+
+
+def to_chroma_result(results):
+    """Pack per-query results back into Chroma's list-per-query QueryResult shape."""
+    fields = RESULT_FIELDS + (("scores",) if results and all("scores" in r for r in results) else ())
+    return {field: [r[field] for r in results] for field in fields}
@@ -0,0 +1,267 @@
+import configparser
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from utils import setup_logger
+from utils.RCAMetrics import count, span
+from vectorEmbeddings.createDB import FOLLOW_INTERVAL, HNSW_KEYS, MODEL_KEY, SERVED_BY_KEY
+
+SHADOW_PREFIX = "reembed."
+
+
+class RCAReembedJob:
+    """
+    Moves a collection to the configured embedding model while it keeps serving.
+
+    Every source collection (each time partition of a partitioned one) whose
+    model isn't `db.model` is copied page by page into a shadow collection
+    `reembed.<name>.<model hash>`, its documents re-embedded with the new
+    model at no more than `max_rate` documents per second. Queries keep
+    using the old vectors meanwhile.
+
+    Once the shadow has caught up, the swap is one metadata write: the
+    collection holding the name gets a `served_by` pointer to the shadow.
+    The name never goes missing, so nothing can recreate it empty. Open
+    handles, in this process or others, look the pointer up again at least
+    every FOLLOW_INTERVAL seconds. After `swap_grace` seconds the rows they
+    wrote to the old collection in the meantime are copied over, and the
+    old vectors are deleted unless `keep_old` is set.
+
+    Processes still configured with the old model are refused by the
+    re-embedded collection after the swap and must be restarted with the
+    new one. Progress is checkpointed per source, so an interrupted run
+    resumes at the page it stopped at, or finishes a swap it started.
+    """
+
+    def __init__(self, config: configparser.ConfigParser, db, embedder):
+        self.logger = setup_logger("ReembedJob")
+        self.db = db
+        self.embedder = embedder
+        self.page_size = max(1, int(config.get("Reembed", "page_size", fallback="500").strip()))
+        self.max_rate = float(config.get("Reembed", "max_rate", fallback="200").strip())
+        self.keep_old = config.getboolean("Reembed", "keep_old", fallback=False)
+        self.swap_grace = float(config.get("Reembed", "swap_grace", fallback="5").strip())
+        if self.swap_grace <= FOLLOW_INTERVAL:
+            raise ValueError(f"❌ [Reembed] swap_grace must be longer than the {FOLLOW_INTERVAL}s writers take "
+                             f"to follow a swap, got {self.swap_grace}")
+
+        state_dir = Path(config.get("Reembed", "state_dir", fallback=".reembed").strip())
+        self.state_path = state_dir / f"{db.collection_name}.json"
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.error = None
+
+    @staticmethod
+    def shadow_name(name: str, model: str):
+        return f"{SHADOW_PREFIX}{name}.{hashlib.sha1(model.encode('utf-8')).hexdigest()[:12]}"
+
+    def exists(self, name: str):
+        return name in {c if isinstance(c, str) else c.name for c in self.db.client.list_collections()}
+
+    def load_state(self):
+        """Progress of an earlier run towards the same model, or a fresh start."""
+        fresh = {"collection": self.db.collection_name, "model": self.db.model, "sources": {}, "done": False}
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return fresh
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"⚠️ Ignoring unreadable re-embedding state {self.state_path}: {e}")
+            return fresh
+
+        if state.get("model") != self.db.model:
+            self.logger.warning(f"⚠️ Last run migrated towards {state.get('model')}, starting over for {self.db.model}")
+            for name, progress in state.get("sources", {}).items():
+                abandoned = self.shadow_name(name, state.get("model", ""))
+                if not progress.get("switched") and self.exists(abandoned):
+                    self.db.client.delete_collection(abandoned)
+            return fresh
+        return dict(fresh, **state)
+
+    def save_state(self, state: dict):
+        state["updated"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def pending(self):
+        """Source collections whose vectors aren't from the target model yet."""
+        return [(name, collection) for name, collection in self.db.source_collections()
+                if (collection.metadata or {}).get(MODEL_KEY) != self.db.model]
+
+    def shadow_configuration(self, name: str, source):
+        """The source's HNSW settings, so the swap doesn't change the distance space under the queries."""
+        hnsw = ((getattr(source, "configuration", None) or {}).get("hnsw") or {})
+        kept = {key: hnsw[key] for key in HNSW_KEYS if hnsw.get(key) is not None}
+        return {"hnsw": kept} if kept else self.db.collection_configuration(name)
+
+    def shadow(self, name: str, source, progress: dict):
+        shadow_name = self.shadow_name(name, self.db.model)
+        if not progress["offset"] and self.exists(shadow_name):
+            # Kept from an earlier migration to this model, its rows may be stale
+            self.logger.info(f"🧹 Discarding {shadow_name} left from an earlier run")
+            self.db.client.delete_collection(shadow_name)
+        shadow = self.db.client.get_or_create_collection(
+            name=shadow_name,
+            configuration=self.shadow_configuration(name, source)
+        )
+        if progress["offset"] and not shadow.count():
+            # The shadow is gone, its checkpoint with it
+            progress.update(offset=0, copied=0, skipped=0)
+        return shadow
+
+    def throttle(self, rows: int, started: float):
+        if self.max_rate > 0:
+            self.stop_event.wait(max(0.0, rows / self.max_rate - (time.monotonic() - started)))
+
+    def copy(self, state: dict, name: str, source, shadow, on_page=None, final: bool = False):
+        """
+        Re-embed `source` into `shadow` from the checkpointed offset to its
+        current end. The `final` catch-up after a swap runs even when stopping.
+        """
+        progress = state["sources"][name]
+        step = self.db.get_max_batch_size()
+        while final or not self.stop_event.is_set():
+            started = time.monotonic()
+            got = source.get(limit=self.page_size, offset=progress["offset"], include=["documents", "metadatas"])
+            if not got["ids"]:
+                break
+
+            # Rows stored without a document can't be re-embedded
+            rows = [i for i, document in enumerate(got["documents"]) if document is not None]
+            if len(rows) < len(got["ids"]):
+                self.logger.warning(f"⚠️ {len(got['ids']) - len(rows)} rows of {name} have no document, skipped")
+            if rows:
+                ids = [got["ids"][i] for i in rows]
+                documents = [got["documents"][i] for i in rows]
+                metadatas = [got["metadatas"][i] for i in rows]
+                with span("reembed.embed"):
+                    embeddings = self.embedder.embed_texts(documents)
+                self.db.ensure_model(shadow, embeddings)
+                with span("reembed.write"):
+                    for i in range(0, len(ids), step):
+                        shadow.upsert(
+                            ids=ids[i:i + step],
+                            documents=documents[i:i + step],
+                            metadatas=metadatas[i:i + step],
+                            embeddings=embeddings[i:i + step]
+                        )
+                count("reembed.rows", len(ids))
+
+            progress["offset"] += len(got["ids"])
+            progress["copied"] += len(rows)
+            progress["skipped"] += len(got["ids"]) - len(rows)
+            self.save_state(state)
+            if on_page is not None:
+                on_page(dict(progress, source=name, total=source.count()))
+            if not final:
+                self.throttle(len(got["ids"]), started)
+
+    def switch(self, state: dict, name: str, shadow):
+        """Point `name` at `shadow` with one metadata write on the collection holding the name."""
+        if MODEL_KEY not in (shadow.metadata or {}):
+            # Nothing was re-embedded (an empty source), record the model all the same
+            shadow.modify(metadata=dict(shadow.metadata or {}, **{MODEL_KEY: self.db.model}))
+
+        holder = self.db.client.get_collection(name)
+        with span("reembed.swap"):
+            holder.modify(metadata=dict(holder.metadata or {}, **{SERVED_BY_KEY: shadow.name}))
+        self.db.replace_collection(name, shadow)
+        state["sources"][name]["switched"] = True
+        self.save_state(state)
+        self.logger.info(f"🔀 {name} now serves {self.db.model} vectors from {shadow.name}")
+
+    def finish(self, state: dict, name: str, source, shadow, on_page=None):
+        """Carry over what writers added to `source` before they followed the switch, then retire it."""
+        self.copy(state, name, source, shadow, on_page, final=True)
+        if self.keep_old:
+            self.logger.info(f"📦 Kept the old vectors of {name} in {source.name}")
+        elif source.name == name:
+            # Its first migration: the collection holding the name had the rows and stays as the pointer
+            step = self.db.get_max_batch_size()
+            while ids := source.get(limit=step, include=[])["ids"]:
+                source.delete(ids=ids)
+        else:
+            self.db.client.delete_collection(source.name)
+        state["sources"][name]["swapped"] = True
+        self.save_state(state)
+
+    def migrate(self, state: dict, name: str, source, on_page=None):
+        progress = state["sources"].get(name)
+        if progress is None or progress.get("swapped") or progress.get("source") != source.name:
+            progress = state["sources"][name] = {"source": source.name, "offset": 0, "copied": 0, "skipped": 0,
+                                                 "switched": False, "swapped": False}
+        shadow = self.shadow(name, source, progress)
+        if progress["offset"]:
+            self.logger.info(f"⏩ Resuming {name} at row {progress['offset']}")
+
+        self.copy(state, name, source, shadow, on_page)
+        if self.stop_event.is_set():
+            return
+        self.switch(state, name, shadow)
+        # Handles that looked the name up just before the switch may still write to `source`
+        time.sleep(self.swap_grace)
+        self.finish(state, name, source, shadow, on_page)
+
+    def run(self, on_page=None):
+        """
+        Migrate every pending source collection and return the state.
+        `on_page(progress)` is called after every re-embedded page.
+        """
+        state = self.load_state()
+        state["done"] = False
+
+        # Swaps an interrupted run switched but didn't finish
+        for name, progress in state["sources"].items():
+            if progress.get("switched") and not progress.get("swapped"):
+                if not self.exists(progress["source"]):
+                    # Stopped after deleting the old collection
+                    progress["swapped"] = True
+                    continue
+                self.logger.info(f"⏩ Finishing the swap of {name}")
+                self.finish(state, name, self.db.client.get_collection(progress["source"]),
+                            self.db.client.get_collection(self.shadow_name(name, self.db.model)), on_page)
+
+        migrated = set()
+        while not self.stop_event.is_set():
+            # Listed again after each pass, partitions created meanwhile are migrated too
+            pending = [(name, source) for name, source in self.pending() if name not in migrated]
+            if not pending:
+                break
+            for name, source in pending:
+                if self.stop_event.is_set():
+                    break
+                self.migrate(state, name, source, on_page)
+                migrated.add(name)
+
+        if self.stop_event.is_set():
+            self.logger.info(f"⏸️ Re-embedding of {state['collection']} stopped, run again to resume")
+        else:
+            state["done"] = True
+            self.logger.info(f"✅ {state['collection']} is embedded with {self.db.model}")
+        self.save_state(state)
+        return state
+
+    def start(self, on_page=None):
+        """Run in a background thread; `stop()` ends it after the current page."""
+        def target():
+            try:
+                self.run(on_page)
+            except Exception as e:
+                self.error = e
+                self.logger.error(f"❌ Re-embedding of {self.db.collection_name} failed: {e}")
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=target, name="reembed", daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,120 @@
+import configparser
+import math
+import re
+from collections import OrderedDict
+
+from utils import setup_logger
+from utils.RCAMetrics import span
+from vectorEmbeddings.lexicalIndex import TOKEN
+
+
+def query_terms(text: str):
+    """Distinct lower-cased tokens of a query, longest first so overlapping matches prefer the longer one."""
+    return sorted({t.lower() for t in TOKEN.findall(text or "") if len(t) > 1}, key=len, reverse=True)
+
+
+def term_pattern(terms):
+    if not terms:
+        return None
+    return re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+
+
+def snippet(document, pattern=None, width: int = 240):
+    """
+    (text, [(start, end), ...]) - at most `width` characters of `document`
+    around the first query term, with the spans of every term inside it.
+    `width` 0 keeps the whole document.
+    """
+    if document is None:
+        return None, []
+    text = " ".join(str(document).split())
+    if width and len(text) > width:
+        first = pattern.search(text) if pattern is not None else None
+        # Start a little before the first match so it reads in context
+        begin = max(0, min(len(text) - width, (first.start() - width // 4) if first else 0))
+        end = begin + width
+        text = ("…" if begin else "") + text[begin:end] + ("…" if end < len(text) else "")
+    spans = [m.span() for m in pattern.finditer(text)] if pattern is not None else []
+    return text, spans
+
+
+class RCAResultPages:
+    """
+    One query's ranked hits, with documents and metadata fetched a page at a
+    time.
+
+    The search only returns ids and distances (`RCAQueryEngine.query(lazy=True)`);
+    each page is one `get` by id against the collection, so showing page 1
+    of k=1000 hits costs `page_size` payloads, not a thousand. Fetched pages
+    are kept for `cached_pages` so paging back and forth doesn't refetch.
+    Documents are cut to `snippet_chars` around the first query term.
+    """
+
+    def __init__(self, config: configparser.ConfigParser, db, result: dict):
+        self.logger = setup_logger("Results")
+        self.db = db
+        self.query = result.get("query", "")
+        self.ids = result["ids"]
+        self.distances = result.get("distances") or [None] * len(self.ids)
+        self.scores = result.get("scores")
+        # Results that already carry their payloads (e.g. the async path) page without fetching
+        self.payloads = dict(zip(self.ids, zip(result["documents"], result["metadatas"]))) \
+            if result.get("documents") is not None else None
+
+        self.page_size = max(1, int(config.get("Results", "page_size", fallback="20").strip()))
+        self.snippet_chars = int(config.get("Results", "snippet_chars", fallback="240").strip())
+        self.cached_pages = int(config.get("Results", "cached_pages", fallback="8").strip())
+        self.pattern = term_pattern(query_terms(self.query))
+        self.pages = OrderedDict()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def page_count(self):
+        return math.ceil(len(self.ids) / self.page_size)
+
+    def fetch(self, ids):
+        if self.payloads is not None:
+            return {id_: self.payloads[id_] for id_ in ids}
+        with span("results.fetch"):
+            return self.db.get_records(ids)
+
+    def page(self, number: int):
+        """Rows of page `number` (0-based): rank, id, distance, score, snippet, highlights, metadata."""
+        if number in self.pages:
+            self.pages.move_to_end(number)
+            return self.pages[number]
+
+        begin = number * self.page_size
+        ids = self.ids[begin:begin + self.page_size]
+        records = self.fetch(ids)
+        if len(records) < len(ids):
+            # Deleted or expired (retention) between the search and now
+            self.logger.debug(f"⚠️ {len(ids) - len(records)} hits on page {number + 1} are no longer stored")
+
+        rows = []
+        for offset, id_ in enumerate(ids):
+            document, metadata = records.get(id_, (None, None))
+            text, highlights = snippet(document, self.pattern, self.snippet_chars)
+            row = {
+                "rank": begin + offset + 1,
+                "id": id_,
+                "distance": self.distances[begin + offset],
+                "snippet": text,
+                "highlights": highlights,
+                "metadata": metadata,
+            }
+            if self.scores is not None:
+                row["score"] = self.scores[begin + offset]
+            rows.append(row)
+
+        self.pages[number] = rows
+        while len(self.pages) > self.cached_pages:
+            self.pages.popitem(last=False)
+        return rows
+
+    def rows(self):
+        """Every row, best first, one page fetched at a time."""
+        for number in range(self.page_count):
+            yield from self.page(number)
@@ -24,7 +24,8 @@ class RCAChromaPersistent(RCAChroma):
     def __init__(self, config: configparser.ConfigParser):
         super().__init__(config)
 
-        self.PersistenPATH = Path.cwd() / "Embeddings"
+        persist_path = Path(self.config.get("Chroma", "Persistent_Path", fallback="Embeddings").strip() or "Embeddings")
+        self.PersistenPATH = persist_path if persist_path.is_absolute() else Path.cwd() / persist_path
         self.PersistenPATH.mkdir(parents=True, exist_ok=True)
 
         self.logger.info(f"💾 Using Chroma persistent client at: {self.PersistenPATH}")
@@ -72,7 +73,7 @@ HttpClient_Port = 8000""")
 
 
 class RCAChromaHttpAsync(RCAChroma):
-    """HTTP (Client-Server) mode — requires both host and port."""
+    """Async HTTP (Client-Server) mode — requires both host and port."""
 
     def __init__(self, config: configparser.ConfigParser):
         super().__init__(config)
@@ -86,8 +87,9 @@ class RCAChromaHttpAsync(RCAChroma):
                 # ✅ Client-Server mode
                 self.HTTPConnectHOST = host
                 self.HTTPConnectPORT = port
-                self.logger.info(f"🌐 Using remote Chroma server at {host}:{port}")
-                self.client = chromadb.AsyncHttpClient(host=host, port=port)
+                self.logger.info(f"🌐 Using remote async Chroma server at {host}:{port}")
+                # AsyncHttpClient is a coroutine, it is awaited in get_client()
+                self.client = None
             else:
                 # ❌ Strict mode: no fallback
                 self.HTTPConnectHOST = None
@@ -110,6 +112,12 @@ class RCAChromaHttpAsync(RCAChroma):
             self.logger.error(f"❌ Config parsing error: {e}")
             self.client = None
 
+    async def get_client(self):
+        """Connect on first use and return the async Chroma client instance."""
+        if self.client is None and getattr(self, "HTTPConnectHOST", None):
+            self.client = await chromadb.AsyncHttpClient(host=self.HTTPConnectHOST, port=self.HTTPConnectPORT)
+        return self.client
+
 
 # --- Script Entry Point ---
 if __name__ == "__main__":